@@ -0,0 +1,148 @@
+"""QuecPython 主机侧仿真运行时
+
+把应用依赖的固件模块替换为主机实现后, 以设备上的 ``usr`` 包名导入 src/ 下的代码:
+
+    import simulator
+    simulator.install(mic="question.alaw", speaker="answer.alaw")
+    from usr._main import create_application
+    create_application().run()
+
+- 声卡: 麦克风/扬声器为 8kHz A-law 裸数据文件, 按实时节奏读写, 见 modules/audio.py
+- 网络: uwebsocket、request 为基于 socket 的真实客户端, 支持 TLS
+- 文件系统: ql_fs、uos 以及 usr 包中 open 的设备绝对路径(/usr、/bak)映射到主机上的设备根目录, 首次安装时
+  放入 default.json
+- 线程与定时器: _thread 补充 threadIsRunning, osTimer 由单个调度线程驱动
+- 外设: machine、pm、modem、net、sim、dataCall、checkNet、misc 等只记录状态, Qth 不连接云端
+
+目前只支持 CPython 3。
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = ROOT + "/src"
+
+# 主机标准库中与 u 前缀模块对应的实现
+_ALIASES = {
+    "ubinascii": "binascii",
+    "uio": "io",
+    "usocket": "socket",
+    "urandom": "random",
+    "ustruct": "struct",
+    "ussl": "ssl",
+    "uselect": "select",
+    "uerrno": "errno",
+    "uzlib": "zlib",
+    "ucollections": "collections",
+}
+
+# simulator.modules 中的替身
+_STANDINS = (
+    "utime", "_thread", "ujson", "uhashlib", "uos", "ql_fs", "audio", "uwebsocket", "request", "modem", "pm", "machine",
+    "checkNet", "dataCall", "net", "sim", "misc", "ntptime",
+)
+
+# 设备上本身即为类的"模块", 以类注册
+_CLASS_MODULES = ("osTimer", "G711")
+
+_installed = None
+
+
+def _print_exception(e, file=None):
+    import traceback
+    traceback.print_exception(type(e), e, e.__traceback__, file=file)
+
+
+def _module(name, **attrs):
+    mod = type(sys)(name)
+    for k, v in attrs.items():
+        setattr(mod, k, v)
+    sys.modules[name] = mod
+    return mod
+
+
+# 设备文件系统分区, usr 包中以这些前缀 open 的路径映射到设备根目录
+_DEVICE_PARTITIONS = ("/usr/", "/bak/")
+
+
+def _device_open(host_open, device_path):
+    def open(file, *args, **kwargs):
+        if isinstance(file, str) and file.startswith(_DEVICE_PARTITIONS) \
+                and sys._getframe(1).f_globals.get("__name__", "").startswith("usr."):
+            file = device_path(file)
+        return host_open(file, *args, **kwargs)
+    return open
+
+
+def install(device_root=None, mic=None, speaker=None, music=None, mic_loop=False, imei=None):
+    """注册替身模块并把 usr 包映射到 src/, 返回设备根目录; 重复调用直接返回"""
+    global _installed
+    if _installed is not None:
+        return _installed
+    if sys.implementation.name != "cpython":
+        raise RuntimeError("host simulator requires CPython 3")
+    import threading  # 先让标准库 threading 绑定真实 _thread
+    from . import modules
+
+    device_root = device_root or tempfile.mkdtemp(prefix="quecpython-")
+    if not os.path.isdir(device_root + "/usr"):
+        os.makedirs(device_root + "/usr")
+    if not os.path.exists(device_root + "/usr/default.json"):
+        with open(SRC + "/default.json", "rb") as fs, open(device_root + "/usr/default.json", "wb") as fd:
+            fd.write(fs.read())
+
+    for name, host in _ALIASES.items():
+        sys.modules[name] = __import__(host)
+    for name in _STANDINS:
+        sys.modules[name] = __import__("simulator.modules." + name, None, None, [name])
+    for name in _CLASS_MODULES:
+        mod = __import__("simulator.modules." + name, None, None, [name])
+        sys.modules[name] = getattr(mod, name)
+    sys.print_exception = _print_exception
+
+    sys.modules["uos"].ROOT = device_root
+    import builtins
+    builtins.open = _device_open(builtins.open, sys.modules["uos"].device_path)
+    if imei:
+        sys.modules["modem"].IMEI = imei
+    sys.modules["audio"].card.configure(mic=mic, speaker=speaker, music=music, mic_loop=mic_loop)
+
+    # usr 包即设备上的 /usr, 云平台 SDK 为 .mpy, 以替身代替
+    _module("usr", __path__=[SRC])
+    sys.modules["usr.components.Qth"] = __import__("simulator.modules.Qth", None, None, ["Qth"])
+    _installed = device_root
+    return device_root
+
+
+def configure(**overrides):
+    """覆盖 Settings 配置常量, 需在导入 usr.components 之前调用; 设备配置文件中已有的键同时写入"""
+    from usr.configure import Settings, settings
+    for key, value in overrides.items():
+        setattr(Settings, key, value)
+        if settings.get(key) is not None:
+            settings.set(key, value)
+
+
+def wake():
+    """模拟说出唤醒词"""
+    return sys.modules["audio"].keyword_spotted()
+
+
+def press(gpio=41):
+    """模拟按下 gpio 上的按键, 默认为唤醒键"""
+    return sys.modules["machine"].ExtInt.trigger(gpio)
+
+
+def push_tsl(value):
+    """模拟云端下发物模型, 如 {10: 音乐 url}"""
+    return sys.modules["usr.components.Qth"].push_tsl(value)
+
+
+def feed_mic(data):
+    """向麦克风追加 A-law 数据"""
+    return sys.modules["audio"].card.feed_mic(data)
+
+
+def audio_stats():
+    return dict(sys.modules["audio"].card.stats)
@@ -0,0 +1,81 @@
+"""在主机上启动完整应用
+
+    python -m simulator --mic question.alaw --speaker answer.alaw --duration 30 \\
+        --set AIGC_API_URL=http://127.0.0.1:8080/createSession
+
+--set 的值按 JSON 解析, 解析失败按字符串处理。应用启动即开始一轮对话, 与设备上电行为一致;
+--wake-every 秒数大于 0 时周期性模拟唤醒词。--mock 在进程内启动 simulator.server 并把
+AIGC_API_URL 指向它, 配合 --replay 回放录制的轨迹。
+"""
+import sys
+import json
+import time
+import argparse
+import simulator
+
+
+def _parse_overrides(items):
+    overrides = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulator", description="run the ChatGPT app on host")
+    parser.add_argument("--mic", help="8kHz A-law raw file played into the microphone")
+    parser.add_argument("--mic-loop", action="store_true", help="loop the microphone file")
+    parser.add_argument("--speaker", help="file that receives A-law written to the speaker")
+    parser.add_argument("--music", help="file that receives playStream data")
+    parser.add_argument("--device-root", help="host directory used as the device file system")
+    parser.add_argument("--imei", help="device IMEI, used as DEVICE_KEY")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="override a Settings constant")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 runs until interrupted")
+    parser.add_argument("--wake-every", type=float, default=0, help="simulate the wake word every N seconds")
+    parser.add_argument("--mock", action="store_true", help="serve createSession and realtime from a local mock")
+    parser.add_argument("--replay", help="JSONL trace for the mock server to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="mock server speed factor")
+    args = parser.parse_args(argv)
+
+    root = simulator.install(device_root=args.device_root, mic=args.mic, speaker=args.speaker, music=args.music,
+                             mic_loop=args.mic_loop, imei=args.imei)
+    print("device root: {}".format(root))
+    overrides = _parse_overrides(args.set)
+    server = None
+    if args.mock or args.replay:
+        from simulator.server import MockRealtimeServer
+        server = MockRealtimeServer(trace=args.replay, speed=args.speed)
+        overrides.setdefault("AIGC_API_URL", server.start())
+    simulator.configure(**overrides)
+
+    from usr._main import create_application
+    app = create_application()
+    app.run()
+
+    start = time.monotonic()
+    last_wake = start
+    try:
+        while not args.duration or time.monotonic() - start < args.duration:
+            time.sleep(0.1)
+            if args.wake_every and time.monotonic() - last_wake >= args.wake_every:
+                last_wake = time.monotonic()
+                simulator.wake()
+    except KeyboardInterrupt:
+        pass
+    app.ai_manager.stop_chat()
+    print("audio stats: {}".format(simulator.audio_stats()))
+    print("latency summary: {}".format(app.ai_manager.timeline.summary()))
+    from usr.libs.metrics import registry
+    print("metrics: {}".format(registry.snapshot()))
+    if server is not None:
+        print("mock server stats: {}".format(server.stats))
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
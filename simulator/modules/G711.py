@@ -0,0 +1,21 @@
+"""G711 替身: 在虚拟声卡上直接读写 A-law, read 以 20ms 为一帧"""
+from .audio import card, BYTES_PER_MS
+
+FRAME_MS = 20
+
+
+class G711(object):
+
+    def __init__(self, pcm):
+        self.pcm = pcm
+
+    def read(self, mode, frames):
+        return card.read_alaw(frames * FRAME_MS * BYTES_PER_MS)
+
+    def read_v3(self, buf, length):
+        data = card.read_alaw(length)
+        buf[:length] = data
+        return length
+
+    def write(self, data, mode):
+        return card.write_alaw(data)
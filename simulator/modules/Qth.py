@@ -0,0 +1,75 @@
+"""Qth 云平台 SDK 替身: 不连接云端, 下行物模型由 simulator.push_tsl() 注入"""
+
+_callbacks = {}
+_info = {}
+sent = []  # 上行的 (方法, 参数) 记录
+
+
+def init():
+    return True
+
+
+def setProductInfo(product_key, product_secret):
+    _info["product"] = (product_key, product_secret)
+    return True
+
+
+def setServer(url):
+    _info["server"] = url
+    return True
+
+
+def setAppVer(version, callback):
+    _info["app_ver"] = version
+    return True
+
+
+def setEventCb(callbacks):
+    _callbacks.update(callbacks)
+    return True
+
+
+def start():
+    cb = _callbacks.get("devEvent")
+    if cb is not None:
+        cb(1, 0)
+    return True
+
+
+def stop():
+    return True
+
+
+def state():
+    return True
+
+
+def sendTrans(mode, value):
+    sent.append(("sendTrans", value))
+    return True
+
+
+def sendTsl(mode, value):
+    sent.append(("sendTsl", value))
+    return True
+
+
+def ackTsl(mode, value, pkg_id):
+    sent.append(("ackTsl", value))
+    return True
+
+
+def ackTslServer(mode, server_id, value, pkg_id):
+    sent.append(("ackTslServer", value))
+    return True
+
+
+def otaAction(action):
+    return True
+
+
+def push_tsl(value):
+    """模拟云端下发物模型, value 为 {cmdId: 值}"""
+    cb = _callbacks.get("recvTsl")
+    if cb is not None:
+        cb(value)
@@ -0,0 +1 @@
+"""QuecPython 固件模块的主机侧替身, 由 simulator.install() 按模块名注册进 sys.modules"""
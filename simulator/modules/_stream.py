@@ -0,0 +1,85 @@
+"""uwebsocket/request 替身共用的 TCP/TLS 连接"""
+import socket
+
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+
+def parse_url(url):
+    """返回 (scheme, host, port, path)"""
+    scheme, rest = url.split("://", 1)
+    if "/" in rest:
+        netloc, path = rest.split("/", 1)
+        path = "/" + path
+    else:
+        netloc, path = rest, "/"
+    secure = scheme in ("https", "wss")
+    if ":" in netloc:
+        host, port = netloc.rsplit(":", 1)
+        port = int(port)
+    else:
+        host, port = netloc, 443 if secure else 80
+    return scheme, host, port, path
+
+
+class Stream(object):
+    """阻塞式字节流, 提供按行/定长读取"""
+
+    def __init__(self, host, port, secure=False, timeout=None):
+        sock = socket.create_connection((host, port), timeout)
+        if secure:
+            if ssl is None:
+                raise OSError("TLS not available on this host")
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        sock.settimeout(None)
+        self.sock = sock
+        self.__buf = b""
+        self.closed = False
+
+    def write(self, data):
+        self.sock.sendall(data)
+        return len(data)
+
+    def __fill(self):
+        chunk = self.sock.recv(4096)
+        if not chunk:
+            return False
+        self.__buf += chunk
+        return True
+
+    def readline(self):
+        while b"\n" not in self.__buf:
+            if not self.__fill():
+                line, self.__buf = self.__buf, b""
+                return line
+        line, self.__buf = self.__buf.split(b"\n", 1)
+        return line + b"\n"
+
+    def read_exact(self, n):
+        while len(self.__buf) < n:
+            if not self.__fill():
+                raise OSError("connection closed")
+        data, self.__buf = self.__buf[:n], self.__buf[n:]
+        return data
+
+    def read_some(self, n):
+        """读取至多 n 字节, 连接关闭返回 b\"\""""
+        if not self.__buf and not self.__fill():
+            return b""
+        data, self.__buf = self.__buf[:n], self.__buf[n:]
+        return data
+
+    def shutdown(self):
+        # 唤醒阻塞在 recv 的线程
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.shutdown()
+            self.sock.close()
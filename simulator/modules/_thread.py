@@ -0,0 +1,61 @@
+"""_thread 替身: 补充 threadIsRunning/stop_thread, stack_size 按主机最小栈放宽"""
+import _thread as _real
+
+allocate_lock = _real.allocate_lock
+get_ident = _real.get_ident
+LockType = getattr(_real, "LockType", None)
+error = getattr(_real, "error", RuntimeError)
+
+_MIN_STACK = 32 * 1024
+_running = set()
+_running_lock = _real.allocate_lock()
+_stack_size = 0
+
+
+def stack_size(size=None):
+    """设备上以字节为单位设置新线程栈, 主机上小于 32KB 的取 32KB, 0 恢复默认"""
+    global _stack_size
+    old = _stack_size
+    if size is not None:
+        _stack_size = size
+        try:
+            _real.stack_size(max(size, _MIN_STACK) if size else 0)
+        except (ValueError, _real.error):
+            pass
+    return old
+
+
+def start_new_thread(function, args, kwargs=None):
+    # 先登记再返回, 避免调用方立即 threadIsRunning 时线程尚未开始运行
+    started = _real.allocate_lock()
+    started.acquire()
+    box = []
+
+    def run():
+        ident = get_ident()
+        with _running_lock:
+            _running.add(ident)
+        box.append(ident)
+        started.release()
+        try:
+            function(*args, **(kwargs or {}))
+        finally:
+            with _running_lock:
+                _running.discard(ident)
+
+    _real.start_new_thread(run, ())
+    started.acquire()
+    return box[0]
+
+
+def threadIsRunning(ident):
+    with _running_lock:
+        return ident in _running
+
+
+def stop_thread(ident):
+    raise NotImplementedError("stop_thread is not supported on host")
+
+
+def get_heap_size():
+    return 1024 * 1024
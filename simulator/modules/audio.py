@@ -0,0 +1,238 @@
+"""audio 替身: 虚拟声卡
+
+麦克风从 8kHz A-law 裸数据文件按实时节奏读出, 读完后输出静音; 扬声器写入的 A-law 追加到文件,
+并按实时节奏阻塞, 模拟设备 PCM 缓冲写满后的背压。playStream 的音乐数据单独落盘, 按 MUSIC_BYTES_PER_MS
+码率同样阻塞。
+"""
+import _thread
+import utime
+
+BYTES_PER_MS = 8  # G711 8kHz 单声道
+PLAYBACK_BUFFER_MS = 100  # 模拟 PCM 设备缓冲深度
+ALAW_SILENCE = 0xD5
+MUSIC_BYTES_PER_MS = 16  # playStream 音乐流按 128kbps 消耗
+
+
+class _Card(object):
+
+    def __init__(self):
+        self.lock = _thread.allocate_lock()
+        self.mic = None  # 麦克风数据 bytes
+        self.mic_pos = 0
+        self.mic_loop = False
+        self.speaker = None  # 扬声器输出文件
+        self.music = None  # 音乐流输出文件
+        self.capture_start = None
+        self.captured = 0
+        self.playback_start = None
+        self.played = 0
+        self.music_start = None
+        self.music_played = 0
+        self.stats = {"mic_bytes": 0, "speaker_bytes": 0, "music_bytes": 0}
+
+    def configure(self, mic=None, speaker=None, music=None, mic_loop=False):
+        if mic is not None:
+            with open(mic, "rb") as f:
+                self.mic = f.read()
+        self.mic_pos = 0
+        self.mic_loop = mic_loop
+        self.speaker = open(speaker, "ab") if speaker else None
+        self.music = open(music, "ab") if music else None
+
+    def feed_mic(self, data):
+        """追加麦克风数据, 例如在对话进行中再说一句"""
+        with self.lock:
+            rest = self.mic[self.mic_pos:] if self.mic else b""
+            self.mic = bytes(rest) + bytes(data)
+            self.mic_pos = 0
+
+    def read_alaw(self, size):
+        """按实时节奏读出 size 字节, 与设备上 BLOCK 模式读取一样等到数据采满才返回"""
+        if self.capture_start is None:
+            self.capture_start = utime.ticks_ms()
+            self.captured = 0
+        due = utime.ticks_add(self.capture_start, (self.captured + size) // BYTES_PER_MS)
+        wait = utime.ticks_diff(due, utime.ticks_ms())
+        if wait > 0:
+            utime.sleep_ms(wait)
+        self.captured += size
+        with self.lock:
+            out = bytearray([ALAW_SILENCE]) * size
+            if self.mic:
+                n = min(size, len(self.mic) - self.mic_pos)
+                out[:n] = self.mic[self.mic_pos:self.mic_pos + n]
+                self.mic_pos += n
+                if self.mic_loop and self.mic_pos >= len(self.mic):
+                    self.mic_pos = 0
+            self.stats["mic_bytes"] += size
+        return bytes(out)
+
+    def stop_capture(self):
+        self.capture_start = None
+
+    def write_alaw(self, data):
+        size = len(data)
+        now = utime.ticks_ms()
+        if self.playback_start is None or utime.ticks_diff(now, utime.ticks_add(self.playback_start, self.played // BYTES_PER_MS)) > 0:
+            # 设备缓冲已播空, 重新计时
+            self.playback_start = now
+            self.played = 0
+        self.played += size
+        with self.lock:
+            if self.speaker is not None:
+                self.speaker.write(data)
+                self.speaker.flush()
+            self.stats["speaker_bytes"] += size
+        ahead = utime.ticks_diff(utime.ticks_add(self.playback_start, self.played // BYTES_PER_MS), utime.ticks_ms())
+        if ahead > PLAYBACK_BUFFER_MS:
+            utime.sleep_ms(ahead - PLAYBACK_BUFFER_MS)
+        return size
+
+    def write_music(self, data):
+        with self.lock:
+            if self.music is not None:
+                self.music.write(data)
+                self.music.flush()
+            self.stats["music_bytes"] += len(data)
+        now = utime.ticks_ms()
+        if self.music_start is None or utime.ticks_diff(now, utime.ticks_add(self.music_start, self.music_played // MUSIC_BYTES_PER_MS)) > 0:
+            self.music_start = now
+            self.music_played = 0
+        self.music_played += len(data)
+        ahead = utime.ticks_diff(utime.ticks_add(self.music_start, self.music_played // MUSIC_BYTES_PER_MS), utime.ticks_ms())
+        if ahead > PLAYBACK_BUFFER_MS:
+            utime.sleep_ms(ahead - PLAYBACK_BUFFER_MS)
+        return 0
+
+
+card = _Card()
+
+
+def _alaw_to_linear(a):
+    a ^= 0x55
+    t = (a & 0x0F) << 4
+    seg = (a & 0x70) >> 4
+    if seg == 0:
+        t += 8
+    elif seg == 1:
+        t += 0x108
+    else:
+        t = (t + 0x108) << (seg - 1)
+    return t if a & 0x80 else -t
+
+
+class Audio(object):
+
+    def __init__(self, device=0):
+        self.device = device
+        self.volume = 4
+        self.__stream_open = False
+
+    def setVolume(self, volume):
+        self.volume = volume
+        return 0
+
+    def getVolume(self):
+        return self.volume
+
+    def set_pa(self, gpio, num=1):
+        return 1
+
+    def set_open_pa_delay(self, ms):
+        return 0
+
+    def setCallback(self, callback):
+        return 0
+
+    def play(self, priority, breakin, filename):
+        return 0
+
+    def playStream(self, fmt, data):
+        self.__stream_open = True
+        return card.write_music(data)
+
+    def stopPlayStream(self):
+        self.__stream_open = False
+        return 0
+
+    def stop(self):
+        return 0
+
+    def getState(self):
+        return 1 if self.__stream_open else 0
+
+    class PCM(object):
+        MONO = 1
+        STEREO = 2
+        READONLY = 0
+        WRITEONLY = 1
+        WRITEREAD = 2
+        BLOCK = 0
+        NOBLOCK = 1
+
+        def __init__(self, device, channels, samplerate, flag, mode=0, periodcnt=25):
+            self.samplerate = samplerate
+            self.closed = False
+
+        def read(self, size):
+            """返回 size 字节 16bit 小端线性 PCM"""
+            alaw = card.read_alaw(size // 2)
+            out = bytearray(size)
+            for i in range(len(alaw)):
+                v = _alaw_to_linear(alaw[i]) & 0xFFFF
+                out[2 * i] = v & 0xFF
+                out[2 * i + 1] = v >> 8
+            return bytes(out)
+
+        def write(self, data):
+            return card.write_alaw(bytes(len(data) // 2))
+
+        def setVolume(self, volume):
+            return 0
+
+        def close(self):
+            self.closed = True
+            card.stop_capture()
+            return 0
+
+
+class Record(object):
+
+    callbacks = []  # 所有开启唤醒词检测的 Record 回调
+
+    def __init__(self, device=0):
+        self.device = device
+        self.__kws_cb = None
+        self.__kws_on = False
+
+    def ovkws_set_callback(self, callback):
+        self.__kws_cb = callback
+        return 0
+
+    def ovkws_start(self, keyword, threshold=0.7):
+        self.keyword = keyword
+        self.__kws_on = True
+        if self not in Record.callbacks:
+            Record.callbacks.append(self)
+        return 0
+
+    def ovkws_stop(self):
+        self.__kws_on = False
+        return 0
+
+    def stream_start(self, fmt, samplerate, duration):
+        return 0
+
+    def stream_stop(self):
+        return 0
+
+    def spot(self):
+        if self.__kws_on and self.__kws_cb is not None:
+            self.__kws_cb((1, 0))
+            return True
+        return False
+
+
+def keyword_spotted():
+    """模拟说出唤醒词"""
+    return any([r.spot() for r in Record.callbacks])
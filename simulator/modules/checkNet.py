@@ -0,0 +1,5 @@
+"""checkNet 替身: 主机网络视为已就绪"""
+
+
+def waitNetworkReady(timeout=60):
+    return 3, 1
@@ -0,0 +1,23 @@
+"""dataCall 替身"""
+
+_callback = None
+_pdp = [0, "sim.apn", "", "", 0]
+
+
+def setCallback(fn):
+    global _callback
+    _callback = fn
+    return 0
+
+
+def getPDPContext(profile):
+    return tuple(_pdp)
+
+
+def setPDPContext(profile, ip_type, apn, username, password, auth):
+    _pdp[:] = [ip_type, apn, username, password, auth]
+    return 0
+
+
+def getInfo(profile, ip_type):
+    return profile, ip_type, [1, 0, "127.0.0.1", "127.0.0.1", "127.0.0.1"]
@@ -0,0 +1,71 @@
+"""machine 替身: Pin 记录电平, ExtInt 登记回调, 由 simulator.press() 触发中断"""
+
+
+class _GPIO(object):
+    pass
+
+
+for _n in range(1, 100):
+    setattr(_GPIO, "GPIO{}".format(_n), _n)
+
+
+class Pin(_GPIO):
+    IN = 0
+    OUT = 1
+    PULL_DISABLE = 0
+    PULL_PU = 1
+    PULL_PD = 2
+
+    levels = {}  # gpio -> 当前电平
+
+    def __init__(self, gpio, direction=IN, pull=PULL_DISABLE, level=0):
+        self.gpio = gpio
+        self.direction = direction
+        Pin.levels[gpio] = level
+
+    def write(self, value):
+        Pin.levels[self.gpio] = value
+        return 0
+
+    def read(self):
+        return Pin.levels.get(self.gpio, 0)
+
+
+class ExtInt(_GPIO):
+    IRQ_RISING = 0
+    IRQ_FALLING = 1
+    IRQ_RISING_FALLING = 2
+    PULL_DISABLE = 0
+    PULL_PU = 1
+    PULL_PD = 2
+
+    registry = {}  # gpio -> ExtInt
+
+    def __init__(self, gpio, mode, pull, callback, filter_time=None):
+        self.gpio = gpio
+        self.callback = callback
+        self.enabled = False
+        ExtInt.registry[gpio] = self
+
+    def enable(self):
+        self.enabled = True
+        return 0
+
+    def disable(self):
+        self.enabled = False
+        return 0
+
+    def line(self):
+        return self.gpio
+
+    def read_count(self, is_reset=0):
+        return [0, 0]
+
+    @classmethod
+    def trigger(cls, gpio):
+        """模拟 gpio 上的一次中断, 回调参数与设备一致为 (gpio, 电平)"""
+        ext = cls.registry.get(gpio)
+        if ext is None or not ext.enabled:
+            return False
+        ext.callback((gpio, 0))
+        return True
@@ -0,0 +1,18 @@
+"""misc 替身"""
+import sys
+
+
+class Power(object):
+
+    @staticmethod
+    def powerOnReason():
+        return 1
+
+    @staticmethod
+    def powerDown():
+        sys.exit(0)
+
+    @staticmethod
+    def powerRestart():
+        # 主机上无法重启, 直接退出仿真
+        sys.exit(1)
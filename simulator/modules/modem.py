@@ -0,0 +1,19 @@
+"""modem 替身"""
+
+IMEI = "860000000000001"  # simulator.install(imei=...) 可覆盖
+
+
+def getDevImei():
+    return IMEI
+
+
+def getDevFwVersion():
+    return "HOST_SIMULATOR"
+
+
+def getDevModel():
+    return "SIMULATOR"
+
+
+def getDevSN():
+    return "SIM" + IMEI[-8:]
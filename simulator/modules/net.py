@@ -0,0 +1,23 @@
+"""net 替身: 固定为已注册网络, 信号强度取 CSQ"""
+
+CSQ = 31
+
+
+def getState():
+    return [0, 0, 0, 0, 0, 0], [1, 0, 0, 0, 0, 7, 0, 0, 0, 0, 0]
+
+
+def getCsq():
+    return CSQ
+
+
+def csqQueryPoll():
+    return CSQ
+
+
+def setModemFun(fun, rst=0):
+    return 0
+
+
+def getModemFun():
+    return 1
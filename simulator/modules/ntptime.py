@@ -0,0 +1,5 @@
+"""ntptime 替身: 主机时钟已同步"""
+
+
+def settime(timezone=0):
+    return 0
@@ -0,0 +1,65 @@
+"""osTimer 替身: 所有定时器共用一个调度线程, 回调在调度线程中执行, 与设备上一样不应阻塞"""
+import _thread
+import utime
+
+TICK_MS = 2
+
+
+class _Service(object):
+
+    def __init__(self):
+        self.__lock = _thread.allocate_lock()
+        self.__timers = {}  # timer -> [到期时刻, 周期, 是否重复, 回调]
+        self.__started = False
+
+    def add(self, timer, period, repeat, callback):
+        with self.__lock:
+            self.__timers[timer] = [utime.ticks_add(utime.ticks_ms(), period), period, repeat, callback]
+            if not self.__started:
+                self.__started = True
+                _thread.start_new_thread(self.__run, ())
+
+    def remove(self, timer):
+        with self.__lock:
+            self.__timers.pop(timer, None)
+
+    def __due(self):
+        now = utime.ticks_ms()
+        due = []
+        with self.__lock:
+            for timer, entry in list(self.__timers.items()):
+                if utime.ticks_diff(now, entry[0]) < 0:
+                    continue
+                due.append((timer, entry[3]))
+                if entry[2]:
+                    entry[0] = utime.ticks_add(entry[0], entry[1])
+                else:
+                    del self.__timers[timer]
+        return due
+
+    def __run(self):
+        while True:
+            for timer, callback in self.__due():
+                try:
+                    callback(timer)
+                except Exception as e:
+                    print("osTimer callback got {}".format(repr(e)))
+            utime.sleep_ms(TICK_MS)
+
+
+_service = _Service()
+
+
+class osTimer(object):
+
+    def start(self, period, repeat, callback):
+        """period 毫秒后回调 callback(timer), repeat 非 0 时周期执行"""
+        _service.add(self, period, repeat, callback)
+        return 0
+
+    def stop(self):
+        _service.remove(self)
+        return 0
+
+    def delete_timer(self):
+        return self.stop()
@@ -0,0 +1,44 @@
+"""pm 替身: 睡眠与唤醒锁只计数, 不影响主机"""
+
+_wakelocks = {}
+_autosleep = 0
+_psm = [0, 0, 0, 0, 0]
+
+
+def create_wakelock(name, length):
+    ident = len(_wakelocks) + 1
+    _wakelocks[ident] = [name, 0]
+    return ident
+
+
+def delete_wakelock(ident):
+    return 0 if _wakelocks.pop(ident, None) is not None else -1
+
+
+def wakelock_lock(ident):
+    _wakelocks[ident][1] = 1
+    return 0
+
+
+def wakelock_unlock(ident):
+    _wakelocks[ident][1] = 0
+    return 0
+
+
+def get_wakelock_num():
+    return len(_wakelocks)
+
+
+def autosleep(flag):
+    global _autosleep
+    _autosleep = flag
+    return 0
+
+
+def set_psm_time(*args):
+    _psm[:len(args)] = args
+    return True
+
+
+def get_psm_time():
+    return list(_psm)
@@ -0,0 +1,55 @@
+"""ql_fs 替身, 路径经 uos.device_path 映射"""
+import os
+import json
+from .uos import device_path
+
+
+def path_exists(path):
+    return os.path.exists(device_path(path))
+
+
+def path_getsize(path):
+    return os.path.getsize(device_path(path))
+
+
+def path_dirname(path):
+    return path.rsplit("/", 1)[0] or "/"
+
+
+def mkdirs(path):
+    host = device_path(path)
+    if not os.path.isdir(host):
+        os.makedirs(host)
+
+
+def rmdirs(path):
+    host = device_path(path)
+    for name in os.listdir(host):
+        full = host + "/" + name
+        if os.path.isdir(full):
+            rmdirs(path + "/" + name)
+        else:
+            os.remove(full)
+    os.rmdir(host)
+
+
+def touch(path, data):
+    mkdirs(path_dirname(path))
+    with open(device_path(path), "w") as f:
+        json.dump(data, f)
+    return 0
+
+
+def read_json(path):
+    host = device_path(path)
+    if not os.path.exists(host):
+        return None
+    with open(host) as f:
+        text = f.read()
+    return json.loads(text) if text.strip() else None
+
+
+def file_copy(dst, src):
+    with open(device_path(src), "rb") as fs, open(device_path(dst), "wb") as fd:
+        fd.write(fs.read())
+    return True
@@ -0,0 +1,125 @@
+"""request 替身: HTTP/1.1 客户端, 支持 Content-Length、chunked 与读到连接关闭三种响应体"""
+import json as _json
+from ._stream import Stream, parse_url
+
+
+def _text(chunk):
+    try:
+        return chunk.decode()
+    except UnicodeError:
+        return chunk.decode("latin-1")
+
+
+class Response(object):
+
+    def __init__(self, stream, sizeof=255, decode=True):
+        self.__stream = stream
+        self.__sizeof = sizeof
+        self.__decode = decode
+        status = stream.readline().decode().split(" ", 2)
+        self.status_code = int(status[1])
+        self.reason = status[2].strip() if len(status) > 2 else ""
+        self.headers = {}
+        while True:
+            line = stream.readline().decode().strip()
+            if not line:
+                break
+            k, v = line.split(":", 1)
+            self.headers[k.strip().lower()] = v.strip()
+        self.__length = int(self.headers["content-length"]) if "content-length" in self.headers else None
+        self.__chunked = self.headers.get("transfer-encoding", "").lower() == "chunked"
+        self.__chunk_left = 0
+        self.__done = False
+
+    def __read(self, n):
+        if self.__done:
+            return b""
+        if self.__chunked:
+            if not self.__chunk_left:
+                size = int(self.__stream.readline().strip().split(b";")[0], 16)
+                if size == 0:
+                    self.__stream.readline()
+                    self.__done = True
+                    return b""
+                self.__chunk_left = size
+            data = self.__stream.read_some(min(n, self.__chunk_left))
+            if not data:
+                # 结束块之前连接断开
+                raise OSError("connection closed inside chunked body")
+            self.__chunk_left -= len(data)
+            if not self.__chunk_left:
+                self.__stream.readline()
+        elif self.__length is not None:
+            data = self.__stream.read_some(min(n, self.__length)) if self.__length else b""
+            self.__length -= len(data)
+        else:
+            data = self.__stream.read_some(n)
+        if not data:
+            self.__done = True
+        return data
+
+    def __iter_body(self, decode):
+        try:
+            while True:
+                chunk = self.__read(self.__sizeof)
+                if not chunk:
+                    break
+                yield _text(chunk) if decode else chunk
+        finally:
+            self.close()
+
+    @property
+    def content(self):
+        """按 sizeof 分块的生成器, decode 为 True 时为 str"""
+        return self.__iter_body(self.__decode)
+
+    @property
+    def text(self):
+        return self.__iter_body(True)
+
+    def json(self):
+        return _json.loads("".join(self.__iter_body(True)))
+
+    def close(self):
+        self.__done = True
+        self.__stream.close()
+
+
+def request(method, url, data=None, json=None, headers=None, decode=True, sizeof=255, timeout=None, ssl_params=None):
+    scheme, host, port, path = parse_url(url)
+    stream = Stream(host, port, secure=scheme == "https", timeout=timeout)
+    if json is not None:
+        data = _json.dumps(json)
+    if isinstance(data, str):
+        data = data.encode()
+    lines = ["{} {} HTTP/1.1".format(method, path), "Host: {}".format(host), "Connection: close"]
+    for k, v in (headers or {}).items():
+        lines.append("{}: {}".format(k, v))
+    if data is not None:
+        lines.append("Content-Length: {}".format(len(data)))
+    stream.write(("\r\n".join(lines) + "\r\n\r\n").encode() + (data or b""))
+    return Response(stream, sizeof=sizeof, decode=decode)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
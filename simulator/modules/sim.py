@@ -0,0 +1,17 @@
+"""sim 替身: SIM 卡固定为就绪"""
+
+
+def getStatus():
+    return 1
+
+
+def setSimDet(switch, trigger_level):
+    return 0
+
+
+def setCallback(fn):
+    return 0
+
+
+def getIccid():
+    return "89860000000000000001"
@@ -0,0 +1,28 @@
+"""uhashlib 替身: update 与设备一样接受 str"""
+import hashlib as _hashlib
+
+
+class _Hash(object):
+
+    def __init__(self, name, data=None):
+        self.__h = _hashlib.new(name)
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        self.__h.update(data.encode() if isinstance(data, str) else data)
+
+    def digest(self):
+        return self.__h.digest()
+
+
+def sha1(data=None):
+    return _Hash("sha1", data)
+
+
+def sha256(data=None):
+    return _Hash("sha256", data)
+
+
+def md5(data=None):
+    return _Hash("md5", data)
@@ -0,0 +1,26 @@
+"""ujson 替身: bytes/bytearray/memoryview 按 ujson 的行为序列化为字符串"""
+import json as _json
+
+
+def _default(obj):
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode()
+    raise TypeError("{} is not JSON serializable".format(type(obj).__name__))
+
+
+def dumps(obj):
+    return _json.dumps(obj, default=_default)
+
+
+def loads(s):
+    if isinstance(s, (bytes, bytearray, memoryview)):
+        s = bytes(s).decode()
+    return _json.loads(s)
+
+
+def dump(obj, stream):
+    stream.write(dumps(obj))
+
+
+def load(stream):
+    return loads(stream.read())
@@ -0,0 +1,56 @@
+"""uos 替身与设备路径映射: 设备绝对路径映射到主机上的设备根目录"""
+import os
+
+ROOT = None  # 由 simulator.install() 设置
+
+
+def device_path(path):
+    """设备绝对路径 -> 主机路径, 相对路径保持不变"""
+    if ROOT is not None and isinstance(path, str) and path.startswith("/"):
+        return ROOT + path
+    return path
+
+
+def listdir(path="/usr"):
+    return os.listdir(device_path(path))
+
+
+def ilistdir(path="/usr"):
+    host = device_path(path)
+    for name in os.listdir(host):
+        full = host + "/" + name
+        yield (name, 0x4000 if os.path.isdir(full) else 0x8000, 0, os.path.getsize(full))
+
+
+def stat(path):
+    return tuple(os.stat(device_path(path)))
+
+
+def statvfs(path):
+    st = os.statvfs(device_path(path))
+    return (st.f_bsize, st.f_frsize, st.f_blocks, st.f_bfree, st.f_bavail, st.f_files, st.f_ffree, st.f_favail,
+            st.f_flag, st.f_namemax)
+
+
+def mkdir(path):
+    os.mkdir(device_path(path))
+
+
+def remove(path):
+    os.remove(device_path(path))
+
+
+def rmdir(path):
+    os.rmdir(device_path(path))
+
+
+def rename(old, new):
+    os.rename(device_path(old), device_path(new))
+
+
+def getcwd():
+    return "/usr"
+
+
+def urandom(n):
+    return os.urandom(n)
@@ -0,0 +1,57 @@
+"""utime 替身: 基于主机 time, ticks 不回绕"""
+import time as _time
+
+_EPOCH = _time.monotonic()
+
+
+def sleep(seconds):
+    _time.sleep(seconds)
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
+
+
+def ticks_ms():
+    return int((_time.monotonic() - _EPOCH) * 1000)
+
+
+def ticks_us():
+    return int((_time.monotonic() - _EPOCH) * 1000000)
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def time():
+    return int(_time.time())
+
+
+def localtime(secs=None):
+    return tuple(_time.localtime(secs))[:8]
+
+
+def mktime(t):
+    t = tuple(t)
+    return int(_time.mktime(t[:8] + (0,) * (8 - len(t[:8])) + (-1,)))
+
+
+def getTimeZone():
+    return 0
+
+
+def setTimeZone(offset):
+    return 0
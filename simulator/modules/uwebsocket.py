@@ -0,0 +1,134 @@
+"""uwebsocket 替身: RFC 6455 客户端, 文本帧以 str 返回
+
+与固件一致, 收到对端关闭帧时 recv 返回 None, TCP 断开或读出错时返回空串。
+"""
+import os
+import base64
+import _thread
+from ._stream import Stream, parse_url
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class _SocketState(object):
+
+    def __init__(self, client):
+        self.__client = client
+
+    def getsocketsta(self):
+        # 4 为 TCP ESTABLISHED
+        return 0 if self.__client.closed else 4
+
+
+class Client(object):
+
+    def __init__(self, stream, debug=False):
+        self.stream = stream
+        self.debug = debug
+        self.closed = False
+        self.sock = _SocketState(self)
+        self.__send_lock = _thread.allocate_lock()
+
+    @classmethod
+    def connect(cls, uri, headers=None, debug=False):
+        scheme, host, port, path = parse_url(uri)
+        stream = Stream(host, port, secure=scheme == "wss")
+        key = base64.b64encode(os.urandom(16)).decode()
+        lines = [
+            "GET {} HTTP/1.1".format(path),
+            "Host: {}:{}".format(host, port),
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            "Sec-WebSocket-Key: {}".format(key),
+            "Sec-WebSocket-Version: 13",
+        ]
+        for k, v in (headers or {}).items():
+            lines.append("{}: {}".format(k, v))
+        stream.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        status = stream.readline()
+        if b" 101 " not in status:
+            stream.close()
+            raise OSError("websocket handshake failed: {}".format(status.strip()))
+        while stream.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return cls(stream, debug=debug)
+
+    def __write_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        n = len(payload)
+        if n < 126:
+            header.append(0x80 | n)
+        elif n < 65536:
+            header.append(0x80 | 126)
+            header.extend(n.to_bytes(2, "big"))
+        else:
+            header.append(0x80 | 127)
+            header.extend(n.to_bytes(8, "big"))
+        mask = os.urandom(4)
+        header.extend(mask)
+        masked = bytearray(payload)
+        for i in range(n):
+            masked[i] ^= mask[i & 3]
+        with self.__send_lock:
+            self.stream.write(bytes(header) + bytes(masked))
+
+    def send(self, data):
+        if self.closed:
+            raise OSError("websocket closed")
+        if isinstance(data, str):
+            data = data.encode()
+        self.__write_frame(OP_TEXT, bytes(data))
+        return len(data)
+
+    def __read_frame(self):
+        b0, b1 = self.stream.read_exact(2)
+        n = b1 & 0x7F
+        if n == 126:
+            n = int.from_bytes(self.stream.read_exact(2), "big")
+        elif n == 127:
+            n = int.from_bytes(self.stream.read_exact(8), "big")
+        mask = self.stream.read_exact(4) if b1 & 0x80 else None
+        payload = self.stream.read_exact(n) if n else b""
+        if mask:
+            payload = bytes(payload[i] ^ mask[i & 3] for i in range(n))
+        return b0 & 0x80, b0 & 0x0F, payload
+
+    def recv(self, size=None):
+        """返回一条完整消息, 文本帧为 str; 对端关闭返回 None, 断开或出错返回空串"""
+        message = b""
+        message_op = None
+        try:
+            while True:
+                fin, opcode, payload = self.__read_frame()
+                if opcode == OP_PING:
+                    self.__write_frame(OP_PONG, payload)
+                    continue
+                if opcode == OP_PONG:
+                    continue
+                if opcode == OP_CLOSE:
+                    self.close()
+                    return None
+                if opcode != OP_CONT:
+                    message_op = opcode
+                message += payload
+                if fin:
+                    break
+        except OSError:
+            self.closed = True
+            return ""
+        return message.decode() if message_op == OP_TEXT else message
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.__write_frame(OP_CLOSE, b"\x03\xe8")
+        except OSError:
+            pass
+        self.stream.close()
@@ -0,0 +1,557 @@
+"""本地 realtime 服务端替身
+
+同一端口上同时提供 AIGC createSession 接口与 realtime websocket:
+
+    python -m simulator.server --port 8080
+    python -m simulator.server --port 8080 --replay trace.jsonl --speed 4
+
+默认为脚本模式: 按 createSession 请求中的 turnDetection 模拟服务端 VAD (server_vad), 或等待设备
+提交输入后回复 (turnDetection 为 null); 回复为一段单音 A-law 音频, 支持 response.cancel、
+conversation.item.truncate 与说话打断。回放模式按 TraceRecorder 录制的 JSONL 轨迹把其中
+"recv" 方向的 event 按原时间间隔 (除以 speed) 发给设备, 第 n 个连接回放第 n 段轨迹。
+session_ms 大于 0 时每个连接在该时长后由服务端结束: 默认发送关闭帧正常关闭, abort 为 True 时不发关闭帧
+直接断开 TCP, 模拟异常断线。测试中可用 drop_connections 随时断开现有连接, refuse 为 True 时拒绝新的
+websocket 连接, appends 按连接序号实时记录收到的 input_audio_buffer.append 数。
+"""
+import sys
+import json
+import time
+import base64
+import struct
+import socket
+import hashlib
+import argparse
+import threading
+import socketserver
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B65"
+BYTES_PER_MS = 8
+
+
+def linear_to_alaw(sample):
+    """16bit 线性采样 -> A-law"""
+    sign = 0x80 if sample >= 0 else 0
+    if sample < 0:
+        sample = -sample - 1
+    sample = min(sample, 0x7FFF)
+    if sample < 256:
+        code = sample >> 4
+    else:
+        seg = 1
+        while sample >= (256 << seg) and seg < 7:
+            seg += 1
+        code = (seg << 4) | ((sample >> (seg + 3)) & 0x0F)
+    return (code | sign) ^ 0x55
+
+
+def _alaw_magnitude(a):
+    a ^= 0x55
+    t = (a & 0x0F) << 4
+    seg = (a & 0x70) >> 4
+    if seg == 0:
+        return t + 8
+    if seg == 1:
+        return t + 0x108
+    return (t + 0x108) << (seg - 1)
+
+
+_MAGNITUDE = [_alaw_magnitude(a) for a in range(256)]
+
+
+def tone(duration_ms, freq=440, amplitude=8000):
+    """8kHz 方波单音的 A-law 数据"""
+    period = 8000 // freq
+    high, low = linear_to_alaw(amplitude), linear_to_alaw(-amplitude)
+    return bytes(high if (i % period) < period // 2 else low for i in range(duration_ms * BYTES_PER_MS))
+
+
+def load_trace(path):
+    """读取 JSONL 轨迹, 按 "open" 记录切分为每个连接一段"""
+    segments = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("dir") == "open" or not segments:
+                segments.append([])
+            if record.get("dir") == "recv":
+                segments[-1].append(record)
+    return [s for s in segments if s]
+
+
+class _WebSocket(object):
+    """服务端 websocket 帧读写, 写操作加锁以便回复线程与读线程并发发送"""
+
+    def __init__(self, rfile, wfile):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send_text(self, text):
+        data = text.encode()
+        header = bytearray([0x81])
+        n = len(data)
+        if n < 126:
+            header.append(n)
+        elif n < 65536:
+            header.append(126)
+            header += struct.pack(">H", n)
+        else:
+            header.append(127)
+            header += struct.pack(">Q", n)
+        with self.lock:
+            if self.closed:
+                return False
+            try:
+                self.wfile.write(bytes(header) + data)
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+                return False
+        return True
+
+    def send_event(self, event):
+        return self.send_text(json.dumps(event))
+
+    def send_close(self, code=1000):
+        with self.lock:
+            if self.closed:
+                return False
+            try:
+                self.wfile.write(bytes([0x88, 2]) + struct.pack(">H", code))
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+                return False
+        return True
+
+    def recv(self):
+        """返回一条文本消息, 连接关闭返回 None"""
+        while True:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return None
+            opcode, n = head[0] & 0x0F, head[1] & 0x7F
+            if n == 126:
+                n = struct.unpack(">H", self.rfile.read(2))[0]
+            elif n == 127:
+                n = struct.unpack(">Q", self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytearray(self.rfile.read(n))
+            for i in range(n):
+                payload[i] ^= mask[i & 3]
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                with self.lock:
+                    self.wfile.write(bytes([0x8A, len(payload)]) + bytes(payload))
+                    self.wfile.flush()
+                continue
+            if opcode in (0x1, 0x2, 0x0):
+                return payload.decode()
+
+
+class _Session(object):
+    """一个 websocket 连接上的脚本会话"""
+
+    def __init__(self, server, ws, turn_detection):
+        self.server = server
+        self.ws = ws
+        self.turn_detection = turn_detection
+        self.__seq = 0
+        self.__lock = threading.Lock()
+        self.__response = None  # (response id, item id, 取消标志)
+        self.__speaking = False
+        self.__speech_ms = 0
+        self.__silence_ms = 0
+        self.__audio_ms = 0  # 已收到的输入音频时长
+        self.__speech_start_ms = 0
+        self.__buffered_ms = 0  # 未提交的输入音频时长
+        self.stats = {"appends": 0, "audio_bytes": 0, "responses": 0, "cancelled": 0, "truncates": 0, "errors": 0}
+
+    def next_id(self, prefix):
+        with self.__lock:
+            self.__seq += 1
+            return "{}_{:04d}".format(prefix, self.__seq)
+
+    def emit(self, event_type, **fields):
+        # 与线上一致, type 与 event_id 排在最前
+        event = {"type": event_type, "event_id": self.next_id("event")}
+        event.update(fields)
+        return self.ws.send_event(event)
+
+    def start(self):
+        self.emit("session.created", session={
+            "id": self.next_id("sess"),
+            "object": "realtime.session",
+            "input_audio_format": "g711_alaw",
+            "output_audio_format": "g711_alaw",
+            "turn_detection": self.turn_detection,
+        })
+
+    # ---- 设备上行 ----
+
+    def on_event(self, event):
+        handler = getattr(self, "on_" + event.get("type", "").replace(".", "_"), None)
+        if handler is None:
+            self.stats["errors"] += 1
+            self.emit("error", error={
+                "type": "invalid_request_error",
+                "code": "unknown_event",
+                "message": "unsupported event type {}".format(event.get("type")),
+                "event_id": event.get("event_id"),
+            })
+            return
+        handler(event)
+
+    def on_input_audio_buffer_append(self, event):
+        audio = base64.b64decode(event.get("audio", ""))
+        self.stats["appends"] += 1
+        self.stats["audio_bytes"] += len(audio)
+        duration = len(audio) // BYTES_PER_MS
+        self.__audio_ms += duration
+        self.__buffered_ms += duration
+        if self.turn_detection is None or not audio:
+            return
+        level = sum(_MAGNITUDE[a] for a in audio[::2]) // max(1, len(audio[::2]))
+        cfg = self.turn_detection
+        if level >= self.server.vad_threshold:
+            self.__silence_ms = 0
+            self.__speech_ms += duration
+            if not self.__speaking and self.__speech_ms >= self.server.min_speech_ms:
+                self.__speaking = True
+                self.__speech_start_ms = max(0, self.__audio_ms - self.__speech_ms - cfg.get("prefixPaddingMs", 300))
+                item_id = self.next_id("item")
+                self.emit("input_audio_buffer.speech_started", audio_start_ms=self.__speech_start_ms, item_id=item_id)
+                if cfg.get("interruptResponse", True):
+                    self.cancel_response()
+            return
+        self.__speech_ms = 0 if not self.__speaking else self.__speech_ms
+        if self.__speaking:
+            self.__silence_ms += duration
+            if self.__silence_ms >= cfg.get("silenceDurationMs", 500):
+                self.__speaking = False
+                self.__speech_ms = 0
+                self.__silence_ms = 0
+                self.emit("input_audio_buffer.speech_stopped", audio_end_ms=self.__audio_ms, item_id=self.next_id("item"))
+                self.commit()
+                if cfg.get("createResponse", True):
+                    self.create_response()
+
+    def on_input_audio_buffer_commit(self, event):
+        self.commit()
+
+    def on_input_audio_buffer_clear(self, event):
+        self.__buffered_ms = 0
+        self.__speaking = False
+        self.__speech_ms = 0
+        self.__silence_ms = 0
+        self.emit("input_audio_buffer.cleared")
+
+    def on_response_create(self, event):
+        self.create_response()
+
+    def on_response_cancel(self, event):
+        if not self.cancel_response():
+            self.emit("error", error={"type": "invalid_request_error", "code": "response_cancel_not_active",
+                                      "message": "no active response", "event_id": event.get("event_id")})
+
+    def on_conversation_item_truncate(self, event):
+        self.stats["truncates"] += 1
+        self.server.truncates.append((event.get("item_id"), event.get("audio_end_ms")))
+        self.emit("conversation.item.truncated", item_id=event.get("item_id"),
+                  content_index=event.get("content_index", 0), audio_end_ms=event.get("audio_end_ms", 0))
+
+    def on_session_update(self, event):
+        self.emit("session.updated", session=event.get("session", {}))
+
+    # ---- 服务端下行 ----
+
+    def commit(self):
+        if self.__buffered_ms < 100:
+            self.emit("error", error={"type": "invalid_request_error", "code": "input_audio_buffer_commit_empty",
+                                      "message": "buffer too small, {}ms".format(self.__buffered_ms)})
+            return False
+        self.__buffered_ms = 0
+        item_id = self.next_id("item")
+        self.emit("input_audio_buffer.committed", item_id=item_id, previous_item_id=None)
+        self.emit("conversation.item.created", previous_item_id=None, item={
+            "id": item_id, "object": "realtime.item", "type": "message", "status": "completed", "role": "user",
+            "content": [{"type": "input_audio", "transcript": None}],
+        })
+        return True
+
+    def create_response(self):
+        self.cancel_response()
+        response = [self.next_id("resp"), self.next_id("item"), threading.Event()]
+        with self.__lock:
+            self.__response = response
+        self.stats["responses"] += 1
+        threading.Thread(target=self.__stream_response, args=(response,), daemon=True).start()
+
+    def cancel_response(self):
+        with self.__lock:
+            response, self.__response = self.__response, None
+        if response is None:
+            return False
+        response[2].set()
+        return True
+
+    def __stream_response(self, response):
+        response_id, item_id, cancelled = response
+        server = self.server
+        if cancelled.wait(server.response_delay_ms / 1000 / server.speed):
+            return self.__response_done(response_id, item_id, "cancelled")
+        self.emit("response.created", response={"id": response_id, "object": "realtime.response", "status": "in_progress"})
+        item = {"id": item_id, "object": "realtime.item", "type": "message", "status": "in_progress",
+                "role": "assistant", "content": []}
+        self.emit("response.output_item.added", response_id=response_id, output_index=0, item=item)
+        self.emit("conversation.item.created", previous_item_id=None, item=item)
+        self.emit("response.content_part.added", response_id=response_id, item_id=item_id, output_index=0,
+                  content_index=0, part={"type": "audio", "transcript": ""})
+        audio = server.reply_audio
+        chunk = server.chunk_ms * BYTES_PER_MS
+        start = time.monotonic()
+        for offset in range(0, len(audio), chunk):
+            # 服务端生成速度快于实时, 按 burst 倍速下发
+            due = start + offset / BYTES_PER_MS / 1000 / server.burst / server.speed
+            if cancelled.wait(max(0, due - time.monotonic())):
+                return self.__response_done(response_id, item_id, "cancelled")
+            self.emit("response.audio.delta", response_id=response_id, item_id=item_id, output_index=0,
+                      content_index=0, delta=base64.b64encode(audio[offset:offset + chunk]).decode())
+        self.emit("response.audio.done", response_id=response_id, item_id=item_id, output_index=0, content_index=0)
+        self.emit("response.content_part.done", response_id=response_id, item_id=item_id, output_index=0,
+                  content_index=0, part={"type": "audio", "transcript": ""})
+        item["status"] = "completed"
+        self.emit("response.output_item.done", response_id=response_id, output_index=0, item=item)
+        with self.__lock:
+            if self.__response is response:
+                self.__response = None
+        self.__response_done(response_id, item_id, "completed")
+
+    def __response_done(self, response_id, item_id, status):
+        if status == "cancelled":
+            self.stats["cancelled"] += 1
+        self.emit("response.done", response={"id": response_id, "object": "realtime.response", "status": status,
+                                             "output": [{"id": item_id}]})
+
+
+class MockRealtimeServer(socketserver.ThreadingTCPServer):
+    """createSession 与 realtime websocket 的本地替身"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, trace=None, speed=1.0, reply_ms=2000, chunk_ms=100, burst=4.0,
+                 response_delay_ms=300, vad_threshold=300, min_speech_ms=200, token_ttl=600, session_ms=0, abort=False,
+                 verbose=False):
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), _Handler)
+        self.speed = speed
+        self.chunk_ms = chunk_ms
+        self.burst = burst
+        self.response_delay_ms = response_delay_ms
+        self.vad_threshold = vad_threshold
+        self.min_speech_ms = min_speech_ms
+        self.token_ttl = token_ttl
+        self.session_ms = session_ms
+        self.abort = abort
+        self.verbose = verbose
+        self.reply_audio = tone(reply_ms)
+        self.segments = load_trace(trace) if trace else None
+        self.sessions = {}  # token -> createSession 请求中的 turnDetection
+        self.connections = 0
+        self.appends = []  # 按连接序号, 每个连接已收到的 append 数
+        self.refuse = False  # 为 True 时拒绝新的 websocket 连接
+        self.__live = {}  # 连接序号 -> (handler, ws)
+        self.__live_lock = threading.Lock()
+        self.truncates = []  # 收到的 (item_id, audio_end_ms)
+        self.stats = []  # 每个已结束连接的统计
+        self.__thread = None
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address[:2])
+
+    @property
+    def session_url(self):
+        return self.url + "/v2/aibiz/openapi/v1/chatgpt/createSession"
+
+    def start(self):
+        """在后台线程中运行, 返回 createSession 地址"""
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self.session_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def drop_connections(self):
+        """不发关闭帧直接断开现有的 websocket 连接, 模拟异常断线"""
+        with self.__live_lock:
+            live = list(self.__live.values())
+        for handler, ws in live:
+            handler.abort_connection(ws)
+
+    def track(self, index, handler=None, ws=None):
+        with self.__live_lock:
+            if handler is None:
+                self.__live.pop(index, None)
+            else:
+                self.__live[index] = (handler, ws)
+
+    def log(self, *args):
+        if self.verbose:
+            print("[mock]", *args)
+
+    def create_session(self, body):
+        token = "mock_token_{}".format(len(self.sessions) + 1)
+        self.sessions[token] = body.get("turnDetection")
+        return {
+            "code": 200,
+            "msg": "success",
+            "data": {
+                "url": "ws://{}:{}".format(*self.server_address[:2]),
+                "path": "/v1/realtime?model=mock",
+                "ephemeralToken": token,
+                "expireAt": int(time.time() + self.token_ttl) * 1000,
+            }
+        }
+
+    def replay(self, ws, index):
+        segment = self.segments[index % len(self.segments)]
+        start = time.monotonic()
+        for record in segment:
+            delay = start + record["t"] / 1000 / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            event = record["event"]
+            if "audio_bytes" in record and not event.get("delta"):
+                event["delta"] = base64.b64encode(self.reply_audio[:record["audio_bytes"]].ljust(record["audio_bytes"], b"\xd5")).decode()
+            if not ws.send_event(event):
+                break
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        request_line = self.rfile.readline().decode().strip()
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                break
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+        if headers.get("upgrade", "").lower() == "websocket":
+            return self.handle_websocket(headers)
+        body = self.rfile.read(int(headers.get("content-length", 0)))
+        server.log(request_line)
+        if request_line.startswith("POST") and "createSession" in request_line:
+            status, payload = "200 OK", server.create_session(json.loads(body or b"{}"))
+        else:
+            status, payload = "404 Not Found", {"code": 404, "msg": "not found"}
+        data = json.dumps(payload).encode()
+        self.wfile.write("HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                         .format(status, len(data)).encode() + data)
+
+    def handle_websocket(self, headers):
+        server = self.server
+        token = headers.get("authorization", "").replace("Bearer ", "")
+        if server.refuse:
+            self.wfile.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            return
+        if server.segments is None and token not in server.sessions:
+            self.wfile.write(b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 0\r\n\r\n")
+            return
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+        self.wfile.write("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept).encode())
+        self.wfile.flush()
+        ws = _WebSocket(self.rfile, self.wfile)
+        index = server.connections
+        server.connections += 1
+        server.appends.append(0)
+        server.track(index, self, ws)
+        if server.segments is not None:
+            threading.Thread(target=server.replay, args=(ws, index), daemon=True).start()
+            session = None
+        else:
+            session = _Session(server, ws, server.sessions.get(token))
+            session.start()
+        if server.session_ms > 0:
+            timer = threading.Timer(server.session_ms / 1000 / server.speed, self.end_session, args=(ws,))
+            timer.daemon = True
+            timer.start()
+        while True:
+            try:
+                text = ws.recv()
+            except OSError:
+                text = None
+            if text is None:
+                break
+            event = json.loads(text)
+            if event.get("type") == "input_audio_buffer.append":
+                server.appends[index] += 1
+            else:
+                server.log("recv", event.get("type"))
+            if session is not None:
+                session.on_event(event)
+        ws.closed = True
+        server.track(index)
+        if server.session_ms > 0:
+            timer.cancel()
+        if session is not None:
+            session.cancel_response()
+            server.stats.append(session.stats)
+            server.log("connection closed, stats: {}".format(session.stats))
+        else:
+            server.stats.append({"appends": server.appends[index]})
+            server.log("connection closed after {} appends".format(server.appends[index]))
+
+    def abort_connection(self, ws):
+        self.server.log("abort connection")
+        with ws.lock:
+            ws.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def end_session(self, ws):
+        if self.server.abort:
+            self.abort_connection(ws)
+        else:
+            self.server.log("close session")
+            ws.send_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulator.server", description="local realtime endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--replay", help="JSONL trace recorded by TraceRecorder")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay/response speed factor")
+    parser.add_argument("--reply-ms", type=int, default=2000, help="scripted reply audio length")
+    parser.add_argument("--response-delay-ms", type=int, default=300, help="delay before a scripted response starts")
+    parser.add_argument("--session-ms", type=int, default=0, help="end each connection after this long, 0 keeps it open")
+    parser.add_argument("--abort", action="store_true", help="end sessions by dropping TCP instead of a close frame")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    server = MockRealtimeServer(args.host, args.port, trace=args.replay, speed=args.speed, reply_ms=args.reply_ms,
+                                response_delay_ms=args.response_delay_ms, session_ms=args.session_ms, abort=args.abort,
+                                verbose=not args.quiet)
+    print("createSession: {}".format(server.session_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
-import gc
+import net
 import utime
-import base64
 from machine import ExtInt
 from usr.libs import CurrentApp
 from usr.libs.lpm import auto_sleep
-from usr.libs.threading import EventSet, Thread
+from usr.libs.threading import EventSet, Event, Thread
+from usr.libs.ringbuf import RingBuffer
+from usr.libs.gain import GainStage
+from usr.libs.vad import EnergyVAD, UplinkGate, TurnDetector
+from usr.libs.backoff import Backoff
+from usr.libs import timeline as tl
+from usr.libs.metrics import registry
+from usr.libs.heap import HeapMonitor
+from usr.libs.link_policy import LinkPolicy
 from usr.libs.logging import getLogger
-from .protocol import OpenAIRealTimeConnection
+from usr.configure import settings
+from .protocol import OpenAIRealTimeConnection, OutboundScheduler, TokenCache, TraceRecorder, get_openai_realtime_token, LOCAL_VAD, CLOSE_ERROR
 
 
 logger = getLogger(__name__)
@@ -14,14 +22,184 @@ logger = getLogger(__name__)
 
 SESSION_CREATED_EVENT = 1 << 0
 
+# G711 8kHz 单声道每毫秒字节数
+G711_BYTES_PER_MS = 8
+
+
+# 服务端 event type, handler 名为 type 中 "." 替换为 "_"
+SERVER_EVENT_TYPES = (
+    "error",
+    "session.created",
+    "session.updated",
+    "transcription_session.created",
+    "transcription_session.updated",
+    "conversation.item.created",
+    "conversation.item.retrieved",
+    "conversation.item.input_audio_transcription.completed",
+    "conversation.item.input_audio_transcription.delta",
+    "conversation.item.input_audio_transcription.segment",
+    "conversation.item.input_audio_transcription.failed",
+    "conversation.item.truncated",
+    "conversation.item.deleted",
+    "input_audio_buffer.committed",
+    "input_audio_buffer.cleared",
+    "input_audio_buffer.speech_started",
+    "input_audio_buffer.speech_stopped",
+    "input_audio_buffer.speech_committed",
+    "input_audio_buffer.timeout_triggered",
+    "response.created",
+    "response.done",
+    "response.output_item.added",
+    "response.output_item.done",
+    "response.content_part.added",
+    "response.content_part.done",
+    "response.output_text.delta",
+    "response.output_text.done",
+    "response.output_audio_transcript.delta",
+    "response.output_audio_transcript.done",
+    "response.output_audio.delta",
+    "response.output_audio.done",
+    "response.function_call_arguments.delta",
+    "response.function_call_arguments.done",
+    "response.mcp_call_arguments.delta",
+    "response.mcp_call_arguments.done",
+    "response.mcp_call.in_progress",
+    "response.mcp_call.completed",
+    "response.mcp_call.failed",
+    "mcp_list_tools.in_progress",
+    "mcp_list_tools.completed",
+    "mcp_list_tools.failed",
+    "rate_limits.updated",
+    "response.cancelled",
+    "response.text.delta",
+    "response.audio_transcript.delta",
+    "response.audio_transcript.done",
+    "response.audio.delta",
+    "response.audio.done",
+)
+
+# 除日志外有实际处理逻辑的 event, 其余 type 在非 verbose 模式下跳过 JSON 解析
+ACTIVE_EVENT_TYPES = (
+    "error",
+    "session.created",
+    "conversation.item.created",
+    "conversation.item.truncated",
+    "input_audio_buffer.speech_started",
+    "input_audio_buffer.speech_stopped",
+    "response.created",
+    "response.done",
+    "response.output_audio.delta",
+    "response.output_audio.done",
+    "response.audio.delta",
+    "response.audio.done",
+)
+
 
 class AIManager(object):
 
     def __init__(self):
+        # 轮次检测模式, 决定 session 请求中的 turnDetection
+        self.turn_detection = settings.get_turn_detection()
+        # 每轮对话各里程碑的延迟时间线
+        self.timeline = tl.TurnTimeline(history=settings.LATENCY_HISTORY, log=logger.info)
+        # 链路自适应: 每次会话按信号与发送负载选择上行编码与帧时长, 各缓冲按最长帧分配
+        self.link_policy = LinkPolicy(
+            net.csqQueryPoll,
+            frame_ms=settings.UPLINK_FRAME_MS,
+            codecs=settings.UPLINK_CODECS,
+            weak_csq=settings.LINK_WEAK_CSQ,
+            strong_csq=settings.LINK_STRONG_CSQ,
+            slow_load=settings.LINK_SLOW_LOAD,
+            fast_load=settings.LINK_FAST_LOAD
+        ) if settings.LINK_POLICY else None
+        max_chunk = self.link_policy.max_frame_ms() * G711_BYTES_PER_MS if self.link_policy is not None else settings.UPLINK_CHUNK_SIZE
+        self.input_format = "g711_alaw"  # session 请求中的上行编码
+        self.session_format = None  # 当前连接建立时所用的上行编码
         # openAI Realtime
-        self.protocol = OpenAIRealTimeConnection(event_cb=self.on_openai_event)
+        self.dispatch_table = self.build_dispatch_table(verbose=settings.VERBOSE_EVENTS)
+        self.protocol = OpenAIRealTimeConnection(
+            event_cb=self.on_openai_event,
+            handlers=self.dispatch_table,
+            frame_builder=settings.UPLINK_FRAME_BUILDER,
+            max_audio_size=max_chunk,
+            audio_cb=self.on_openai_audio,
+            max_frame_size=settings.MAX_FRAME_SIZE,
+            large_frame_size=settings.LARGE_FRAME_SIZE,
+            token_cache=TokenCache(
+                fetch=lambda: get_openai_realtime_token(self.turn_detection, self.input_format),
+                margin=settings.TOKEN_EXPIRE_MARGIN,
+                refresh_ahead=settings.TOKEN_REFRESH_AHEAD
+            ),
+            recorder=TraceRecorder(
+                settings.TRACE_PATH,
+                audio=settings.TRACE_AUDIO,
+                max_bytes=settings.TRACE_MAX_BYTES
+            ) if settings.TRACE_PATH else None,
+            timeline=self.timeline
+        )
 
         self.chat_thread = None
+
+        # 上行采集: 采集线程写环形缓冲, chat 线程取出发送, 采集节奏不受网络影响
+        # 预录: 唤醒后、会话建立前的音频先缓存在同一环形缓冲, 会话建立后突发上传
+        self.preroll_size = min(settings.PREROLL_MAX_MS * G711_BYTES_PER_MS, settings.PREROLL_MAX_BYTES)
+        # 按上行块大小对齐, chat 循环直接 peek 整块视图发送, 不拷贝
+        self.capture_ring = RingBuffer(
+            settings.CAPTURE_RING_SIZE + self.preroll_size,
+            policy=settings.CAPTURE_OVERFLOW_POLICY,
+            chunk=max_chunk
+        )
+        self.capture_buf = bytearray(max_chunk) if settings.CAPTURE_READINTO else None
+        self.capture_view = None  # capture_buf 中本次会话一帧长度的视图
+        self.capture_thread = None
+        self.capture_flag = False
+        self.capture_limit = 0  # 预录阶段的缓存上限, 0 为不限
+        self.preroll_dropped = 0
+        self.uplink_chunk = settings.UPLINK_CHUNK_SIZE
+        # chat 循环稳态迭代所用的绑定方法, 进入循环前由 bind_uplink 设置
+        self.uplink_send = None
+        self.uplink_headroom = None
+        registry.gauge("capture.ring_bytes", lambda: len(self.capture_ring))
+        # 堆采样与自适应 GC, 在 chat 循环、说话结束与回复结束等间隙调用 poll
+        self.heap = HeapMonitor(collect_bytes=settings.GC_COLLECT_BYTES, urgent_free=settings.GC_URGENT_FREE)
+        # local_vad 模式下 VAD 的 hangover 即判定说话结束的静音时长, 与上行门限共用同一 VAD
+        if self.turn_detection == LOCAL_VAD:
+            self.vad = EnergyVAD(threshold=settings.VAD_THRESHOLD, hangover_ms=settings.LOCAL_VAD_SILENCE_MS)
+            self.turn_detector = TurnDetector(min_speech_ms=settings.LOCAL_VAD_MIN_SPEECH_MS)
+        else:
+            self.vad = EnergyVAD(threshold=settings.VAD_THRESHOLD, hangover_ms=settings.VAD_HANGOVER_MS)
+            self.turn_detector = None
+        # 上行静音门限, 静音帧不上传
+        self.uplink_gate = UplinkGate(
+            self.vad,
+            max_chunk,
+            padding_bytes=settings.VAD_PADDING_MS * G711_BYTES_PER_MS,
+            keepalive_ms=settings.VAD_KEEPALIVE_MS,
+            bytes_per_ms=G711_BYTES_PER_MS
+        ) if settings.UPLINK_VAD else None
+        # 上行 AGC: 在 VAD 判定之后、上传之前原地调整帧电平
+        self.uplink_gain = GainStage(
+            step_db=settings.GAIN_STEP_DB,
+            max_db=settings.UPLINK_AGC_MAX_DB,
+            agc=True,
+            agc_target=settings.UPLINK_AGC_TARGET,
+            noise_floor=settings.VAD_THRESHOLD
+        ) if settings.UPLINK_AGC else None
+        self.configure_uplink(settings.UPLINK_CHUNK_SIZE)
+
+        # 热备: 对话结束后保持连接, 下次唤醒直接复用
+        self.standby_thread = None
+        self.standby_event = Event()
+        self.standby_stats = {"cold": 0, "cold_ms": 0, "warm": 0, "saved_ms": 0}
+
+        # 对话中断线重连
+        self.reconnect_backoff = Backoff(
+            base_ms=settings.RECONNECT_BASE_MS,
+            cap_ms=settings.RECONNECT_MAX_MS,
+            budget_ms=settings.RECONNECT_BUDGET_MS,
+            max_attempts=settings.RECONNECT_MAX_ATTEMPTS
+        )
+        self.reconnect_stats = {"drops": 0, "reconnects": 0, "attempts": 0, "give_ups": 0, "downtime_ms": 0, "max_downtime_ms": 0}
         
         # Wakeup 按键
         self.wakeup_key = ExtInt(ExtInt.GPIO41, ExtInt.IRQ_FALLING, ExtInt.PULL_PU, self.on_wakeup_key_click, 250)
@@ -29,28 +207,43 @@ class AIManager(object):
         self.event_set = EventSet()
 
         self.conversation_item_id = None  # 记录对话的id
+        self.response_item_id = None  # 最近一段下行音频所属的回复 item id
+        self.truncated_item_id = None  # 已截断的回复 item id, 其后续音频直接丢弃
+        self.response_active = False  # 服务端正在生成回复
         self.interrupt_flag = False
         self.stop_chat_flag = False
     
     def init(self):
         logger.info("init {} extension".format(type(self).__name__))
         self.wakeup_key.enable()  # 使能唤醒按键
-        self.on_wakeup_key_click(None)
+        self.on_wakeup_key_click(None, source="boot")
 
-    def on_wakeup_key_click(self, args):
+    def on_wakeup_key_click(self, args, source="key"):
+        self.timeline.begin(source)
+        self.timeline.mark(tl.WAKE)
+        # 休眠超过预取窗口时缓存的 token 已失效, 此时立即在后台获取, 与 chat 线程的初始化和预录并行
+        self.prefetch_token()
         self.start_chat()
         CurrentApp().audio_manager.stop_music()
         self.__cancel_response()
 
-    def __cancel_response(self):
-        if self.conversation_item_id is not None:
-            try:
+    def __cancel_response(self, cancel=True):
+        """打断当前回复: 先丢弃未播放的音频, 再按实际播放位置截断回复 item; server_vad 打断时服务端已自行取消回复, cancel 为 False"""
+        audio_manager = CurrentApp().audio_manager
+        item_id = self.response_item_id
+        pending = audio_manager.playback_pending()
+        played_ms = audio_manager.interrupt_playback(item_id)
+        try:
+            if cancel and self.response_active:
                 self.protocol.response_cancel()
-                self.protocol.conversation_item_truncate(self.conversation_item_id)
-            except:
-                pass
-            self.conversation_item_id = None
-            self.interrupt_flag = True
+            if item_id is not None and (pending or self.response_active):
+                logger.debug("truncate item {} at {}ms".format(item_id, played_ms))
+                self.protocol.conversation_item_truncate(item_id, played_ms)
+                self.truncated_item_id = item_id
+                self.interrupt_flag = True
+        except:
+            pass
+        self.response_item_id = None
 
     def start_chat(self):
         self.stop_chat_flag = False
@@ -58,9 +251,10 @@ class AIManager(object):
             self.chat_thread = Thread(target=self.chat_process)
             self.chat_thread.start(stack_size=64)
 
-    def stop_chat(self):
+    def stop_chat(self, wait=True):
+        """结束对话; chat 线程退出时会等待的线程(如空闲检测)中调用须传 wait=False"""
         self.stop_chat_flag = True
-        if self.chat_thread and self.chat_thread.is_running():
+        if wait and self.chat_thread and self.chat_thread.is_running():
             self.chat_thread.join()
 
     def chat_process(self):
@@ -72,26 +266,63 @@ class AIManager(object):
             CurrentApp().audio_manager.stop_kws()
             CurrentApp().audio_manager.set_upload_flag(False)
             CurrentApp().audio_manager.init_g711()
-            with self.protocol:
-                if not self.event_set.wait(SESSION_CREATED_EVENT, timeout=10, clear=True):
-                    logger.debug("protocol connect failed, get no SESSION_CREATED_EVENT after 10 seconds.")
-                    return
-                logger.debug("protocol connect successed")
-                CurrentApp().audio_manager.set_upload_flag(True)
-                CurrentApp().led_manager.power_green_led.on()
-                # CurrentApp().power_manager.start_check_standby()
-                while not self.stop_chat_flag:
-                    # if not self.protocol.is_state_ok():
-                    #     break
-                    # utime.sleep(1)
-                    buf = CurrentApp().audio_manager.g711_read()
-                    CurrentApp().ai_manager.protocol.input_audio_buffer_append(buf)
-                    utime.sleep_ms(10)
+            self.heap.reset()
+            self.select_link_profile()
+            self.start_capture(preroll=True)
+            if not self.open_session():
+                return
+            # 会话建立后顺延预取窗口, 对话中断线重连时 token 仍在缓存中
+            self.prefetch_token()
+            self.end_preroll()
+            self.reset_turn_state()
+            CurrentApp().audio_manager.set_upload_flag(True)
+            CurrentApp().led_manager.power_green_led.on()
+            # 配置了 CHAT_IDLE_TIMEOUT 时空闲超时结束对话
+            CurrentApp().power_manager.start_check_standby()
+            self.bind_uplink(CurrentApp().audio_manager)
+            while not self.stop_chat_flag:
+                # if not self.protocol.is_state_ok():
+                #     break
+                # utime.sleep(1)
+                if not self.protocol.is_connected():
+                    # 服务端正常关闭或会话结束时对话随之结束, 只有接收异常才退避重连
+                    if self.protocol.close_reason != CLOSE_ERROR:
+                        logger.info("realtime session closed by server, end chat")
+                        break
+                    if not self.reconnect():
+                        break
+                try:
+                    if not self.uplink_step():
+                        # 不足一块, 按还差的字节数等待采集
+                        utime.sleep_ms(max(10, (self.uplink_chunk - len(self.capture_ring)) // G711_BYTES_PER_MS))
+                except Exception as e:
+                    # 连接已断开时交给下一轮重连, 否则仍按异常结束对话
+                    if self.protocol.is_connected():
+                        raise
+                    logger.debug("uplink got {} after connection lost".format(repr(e)))
         except Exception as e:
             logger.debug("chat process got {}".format(repr(e)))
         finally:
             logger.debug("chat process thread break out")
-            # CurrentApp().power_manager.stop_check_standby()
+            CurrentApp().power_manager.stop_check_standby()
+            self.stop_capture()
+            outbound = self.protocol.outbound_stats()
+            logger.debug("outbound stats: {}".format(outbound))
+            if self.link_policy is not None:
+                self.link_policy.record(outbound["audio"])
+                logger.debug("link policy stats: {}".format(self.link_policy.stats()))
+            logger.debug("recv stats: {}".format(self.protocol.recv_stats()))
+            if self.uplink_gate is not None:
+                logger.debug("uplink vad stats: {}".format(self.uplink_gate.stats()))
+            if self.turn_detector is not None:
+                logger.debug("local turn detection stats: {}".format(self.turn_detector.stats()))
+            logger.debug("reconnect stats: {}".format(self.reconnect_stats))
+            self.timeline.end()
+            logger.debug("latency summary: {}".format(self.timeline.summary()))
+            logger.debug("heap stats: {}".format(self.heap.stats()))
+            logger.debug("metrics: {}".format(registry.snapshot()))
+            self.close_session()
+            self.prefetch_token()
             CurrentApp().audio_manager.set_upload_flag(False)
             CurrentApp().audio_manager.deinit_g711()
             CurrentApp().audio_manager.start_kws()
@@ -100,6 +331,270 @@ class AIManager(object):
             auto_sleep(True)
         logger.debug("chat_process thread exit")
 
+    def prefetch_token(self):
+        """唤醒、会话建立或对话结束后的 TOKEN_PREFETCH_WINDOW 秒内后台预取 token, 缓存已失效时立即获取; 超出窗口或进入低功耗后停止"""
+        if settings.TOKEN_PREFETCH:
+            self.protocol.token_cache.start_refresh(settings.TOKEN_PREFETCH_WINDOW)
+
+    def open_session(self):
+        """建立 realtime 会话; 处于热备的连接仍可用时直接复用"""
+        self.stop_standby()
+        if self.protocol.is_connected() and self.session_format == self.input_format and self.protocol.expire_at - settings.TOKEN_EXPIRE_MARGIN > utime.mktime(utime.localtime()):
+            self.standby_stats["warm"] += 1
+            saved = self.standby_stats["cold_ms"] // self.standby_stats["cold"] if self.standby_stats["cold"] else 0
+            self.standby_stats["saved_ms"] += saved
+            logger.debug("reuse warm standby connection, saved ~{}ms connect time".format(saved))
+            # 丢弃上一轮残留在服务端的输入音频
+            self.protocol.input_audio_buffer_clear()
+            return True
+        self.protocol.disconnect()
+        self.event_set.clear(SESSION_CREATED_EVENT)
+        start = utime.ticks_ms()
+        self.protocol.connect()
+        self.session_format = self.input_format
+        if not self.event_set.wait(SESSION_CREATED_EVENT, timeout=10, clear=True):
+            logger.debug("protocol connect failed, get no SESSION_CREATED_EVENT after 10 seconds.")
+            self.protocol.disconnect()
+            return False
+        cost = utime.ticks_diff(utime.ticks_ms(), start)
+        self.standby_stats["cold"] += 1
+        self.standby_stats["cold_ms"] += cost
+        logger.debug("protocol connect successed, cost {}ms".format(cost))
+        return True
+
+    def configure_uplink(self, chunk):
+        """设置上行帧字节数, 采集环形缓冲与 padding 缓存按新帧长对齐并清空"""
+        self.uplink_chunk = chunk
+        self.capture_ring.set_chunk(chunk)
+        if self.uplink_gate is not None:
+            self.uplink_gate.set_chunk(chunk)
+        if self.capture_buf is not None:
+            self.capture_view = memoryview(self.capture_buf)[:chunk]
+
+    def select_link_profile(self):
+        """新会话开始前按链路质量选择上行编码与帧时长, 应用到 session 请求与采集循环"""
+        if self.link_policy is None:
+            return
+        profile = self.link_policy.select()
+        logger.info("link profile: {}".format(profile))
+        if profile.codec != self.input_format:
+            # 编码随 session 请求下发, 已缓存的 token 与热备连接不再适用
+            self.input_format = profile.codec
+            self.protocol.token_cache.invalidate()
+        self.configure_uplink(profile.frame_ms * G711_BYTES_PER_MS)
+
+    def bind_uplink(self, audio_manager):
+        """绑定 chat 循环稳态迭代用到的方法, 迭代中不再经 CurrentApp() 查找组件或新建绑定方法"""
+        self.uplink_send = self.protocol.input_audio_buffer_append if self.uplink_gain is None else self.send_gained
+        self.uplink_headroom = audio_manager.playback_headroom_ms
+
+    def uplink_step(self):
+        """chat 循环的一次稳态迭代: 取采集环形缓冲中的一整块音频上传, 不足一块返回 0
+
+        整块以视图形式直接交给门限; 开启 UPLINK_FRAME_BUILDER 时除首次绑定外不分配堆内存,
+        默认配置下每个上传的 append 帧由 ujson.dumps 生成新的字符串。
+        """
+        # 上一块已发出、下一块尚未采满, 是 chat 线程的空闲间隙
+        self.heap.poll(self.uplink_headroom())
+        buf = self.capture_ring.peek()
+        if buf is None:
+            return 0
+        n = self.uplink_chunk
+        try:
+            if self.uplink_gate is None:
+                if self.turn_detector is not None:
+                    # 先于 send 中的增益处理判定
+                    self.vad.update(buf, n, n // G711_BYTES_PER_MS)
+                self.uplink_send(buf, n)
+            else:
+                self.uplink_gate.process(buf, n, self.uplink_send)
+            if self.turn_detector is not None:
+                self.detect_turn(self.turn_detector.feed(self.vad, n // G711_BYTES_PER_MS))
+        finally:
+            self.capture_ring.consume(n)
+        return n
+
+    def send_gained(self, buf, length):
+        """上行 AGC 原地处理后上传, buf 为采集环形缓冲或 padding 缓冲中的视图"""
+        self.uplink_gain.process(buf, length)
+        self.protocol.input_audio_buffer_append(buf, length)
+
+    def reset_turn_state(self):
+        """新会话或重连后清除上一连接上的回复与 VAD 状态"""
+        self.response_active = False
+        self.response_item_id = None
+        self.interrupt_flag = False
+        self.vad.reset()
+        if self.uplink_gate is not None:
+            self.uplink_gate.reset()
+        if self.uplink_gain is not None:
+            self.uplink_gain.reset()
+        if self.turn_detector is not None:
+            self.turn_detector.reset()
+
+    def reconnect(self):
+        """对话中连接异常断开: 按带抖动的指数退避重连, 预算耗尽或对话被停止时返回 False"""
+        self.reconnect_stats["drops"] += 1
+        logger.warn("realtime connection lost, reconnecting")
+        CurrentApp().led_manager.power_green_led.blink(50, 50)
+        # 断线前未播完的回复已无法继续
+        CurrentApp().audio_manager.flush_playback()
+        backoff = self.reconnect_backoff
+        backoff.reset()
+        ok = False
+        while not self.stop_chat_flag:
+            delay = backoff.next_delay()
+            if delay < 0:
+                break
+            utime.sleep_ms(delay)
+            if self.stop_chat_flag:
+                break
+            self.reconnect_stats["attempts"] += 1
+            try:
+                ok = self.open_session()
+            except Exception as e:
+                logger.debug("reconnect attempt {} got {}".format(backoff.attempts, repr(e)))
+            if ok:
+                break
+        downtime = backoff.elapsed_ms()
+        self.reconnect_stats["downtime_ms"] += downtime
+        if downtime > self.reconnect_stats["max_downtime_ms"]:
+            self.reconnect_stats["max_downtime_ms"] = downtime
+        if not ok:
+            self.reconnect_stats["give_ups"] += 1
+            logger.warn("reconnect gave up after {} attempts, {}ms".format(backoff.attempts, downtime))
+            return False
+        self.reconnect_stats["reconnects"] += 1
+        logger.info("reconnected after {} attempts, downtime {}ms".format(backoff.attempts, downtime))
+        self.reset_turn_state()
+        CurrentApp().led_manager.power_green_led.on()
+        return True
+
+    def close_session(self):
+        """结束对话; 开启热备且连接正常时保持连接, 空闲超时或 token 过期后再断开"""
+        if settings.WARM_STANDBY_IDLE > 0 and self.protocol.is_connected():
+            self.start_standby()
+        else:
+            self.protocol.disconnect()
+
+    def start_standby(self):
+        remaining = self.protocol.expire_at - settings.TOKEN_EXPIRE_MARGIN - utime.mktime(utime.localtime())
+        timeout = min(settings.WARM_STANDBY_IDLE, remaining)
+        if timeout <= 0:
+            self.protocol.disconnect()
+            return
+        logger.debug("enter warm standby for {}s".format(timeout))
+        self.standby_event.clear()
+        self.standby_thread = Thread(target=self.standby_process, args=(timeout, ))
+        self.standby_thread.start()
+
+    def stop_standby(self):
+        if self.standby_thread is not None:
+            self.standby_event.set()
+            self.standby_thread.join()
+            self.standby_thread = None
+
+    def standby_process(self, timeout):
+        if self.standby_event.wait(timeout=timeout, clear=True):
+            return
+        logger.debug("warm standby timeout, disconnect, stats: {}".format(self.standby_stats))
+        self.protocol.disconnect()
+
+    def start_capture(self, preroll=False):
+        self.capture_ring.open()
+        self.capture_ring.reset_stats()
+        self.capture_limit = self.preroll_size if preroll else 0
+        self.preroll_dropped = 0
+        self.capture_flag = True
+        self.capture_thread = Thread(target=self.capture_process)
+        self.capture_thread.start(stack_size=16)
+
+    def stop_capture(self):
+        self.capture_flag = False
+        self.capture_ring.close()
+        if self.capture_thread is not None:
+            self.capture_thread.join()
+            self.capture_thread = None
+            logger.debug("capture ring stats: {}".format(self.capture_ring.stats()))
+
+    def end_preroll(self):
+        """会话已建立, 解除预录上限, 已缓存的预录音频由 chat 循环突发上传"""
+        logger.debug("preroll {} bytes, dropped {} bytes over cap".format(len(self.capture_ring), self.preroll_dropped))
+        self.capture_limit = 0
+
+    def capture_process(self):
+        logger.debug("capture thread enter")
+        audio_manager = CurrentApp().audio_manager
+        # 固件不支持 read_v3 时退回 g711.read
+        buf = self.capture_view if audio_manager.capture_readinto else None
+        while self.capture_flag:
+            try:
+                self.capture_step(audio_manager, buf)
+            except Exception as e:
+                logger.debug("capture process got {}".format(repr(e)))
+                break
+            utime.sleep_ms(10)
+        logger.debug("capture thread exit")
+
+    def capture_step(self, audio_manager, buf):
+        """采集线程的一次迭代: 读一块音频写入采集环形缓冲, 返回读取的字节数
+
+        buf 为 None 时由 g711.read 返回新的 bytes, 否则直接读入 buf(固件支持 read_v3 时)。
+        """
+        if buf is None:
+            data = audio_manager.g711_read()
+            n = len(data) if data else 0
+        else:
+            data = buf
+            n = audio_manager.g711_readinto(buf)
+        if n:
+            if self.capture_limit and len(self.capture_ring) >= self.capture_limit:
+                # 预录超过上限时保留唤醒后最早的音频
+                self.preroll_dropped += n
+            else:
+                self.capture_ring.write(data, n, timeout=1)
+        return n
+
+    def detect_turn(self, result):
+        """local_vad 模式: 端侧判定说话开始时打断当前回复, 说话结束时提交输入并请求回复"""
+        if result == TurnDetector.SPEECH_STARTED:
+            logger.debug("local vad speech started")
+            self.on_speech_started()
+            self.__cancel_response()
+        elif result == TurnDetector.SPEECH_STOPPED:
+            logger.debug("local vad speech stopped, commit input audio buffer")
+            self.on_speech_stopped()
+            # commit 与 response.create 都排在已入队的上行音频之后
+            self.protocol.input_audio_buffer_commit()
+            self.protocol.response_create(OutboundScheduler.AUDIO)
+
+    def on_speech_started(self):
+        # 本轮已说过话则开始新一轮
+        if not self.timeline.started() or self.timeline.has(tl.SPEECH_STARTED):
+            self.timeline.begin("speech")
+        self.timeline.mark(tl.SPEECH_STARTED)
+        CurrentApp().led_manager.wifi_green_led.on()
+        CurrentApp().audio_manager.stop_music()
+        CurrentApp().power_manager.reset_standby_check()
+        self.interrupt_flag = False
+
+    def on_speech_stopped(self):
+        self.timeline.mark(tl.SPEECH_STOPPED)
+        # 等待服务端回复期间没有下行音频, 适合回收
+        self.heap.poll(CurrentApp().audio_manager.playback_headroom_ms())
+        CurrentApp().led_manager.wifi_green_led.off()
+        CurrentApp().power_manager.reset_standby_check()
+
+    def build_dispatch_table(self, verbose=False):
+        """预计算 event type -> handler, 未关注的 type 映射为 None"""
+        table = {}
+        for event_type in SERVER_EVENT_TYPES:
+            if verbose or event_type in ACTIVE_EVENT_TYPES:
+                table[event_type] = getattr(self, event_type.replace(".", "_"), None)
+            else:
+                table[event_type] = None
+        return table
+
     def on_openai_event(self, event):
         try:
             if "type" in event:
@@ -115,6 +610,7 @@ class AIManager(object):
 
     def session_created(self, event):
         logger.debug("session_created: \n{}".format(event))
+        self.timeline.mark(tl.SESSION)
         self.event_set.set(SESSION_CREATED_EVENT)
     
     def session_updated(self, event):
@@ -160,15 +656,12 @@ class AIManager(object):
     
     def input_audio_buffer_speech_started(self, event):
         logger.debug("input_audio_buffer_speech_started: \n{}".format(event))
-        CurrentApp().led_manager.wifi_green_led.on()
-        CurrentApp().audio_manager.stop_music()
-        CurrentApp().power_manager.reset_standby_check()
-        self.interrupt_flag = False
+        self.on_speech_started()
+        self.__cancel_response(cancel=False)
 
     def input_audio_buffer_speech_stopped(self, event):
         logger.debug("input_audio_buffer_speech_stopped: \n{}".format(event))
-        CurrentApp().led_manager.wifi_green_led.off()
-        CurrentApp().power_manager.reset_standby_check()
+        self.on_speech_stopped()
 
     def input_audio_buffer_speech_committed(self, event):
         logger.debug("input_audio_buffer_speech_committed: \n{}".format(event))
@@ -178,10 +671,14 @@ class AIManager(object):
 
     def response_created(self, event):
         logger.debug("response_created: \n{}".format(event))
+        self.response_active = True
+        self.timeline.mark(tl.RESPONSE)
 
     def response_done(self, event):
         logger.debug("response_done: \n{}".format(event))
-        gc.collect()
+        self.response_active = False
+        CurrentApp().audio_manager.end_playback_stream()
+        self.heap.poll(CurrentApp().audio_manager.playback_headroom_ms())
 
     def response_output_item_added(self, event):
         logger.debug("response_output_item_added: \n{}".format(event))
@@ -208,10 +705,11 @@ class AIManager(object):
         logger.debug("response_output_audio_transcript_done: \n{}".format(event))
 
     def response_output_audio_delta(self, event):
-        logger.debug("response_output_audio_delta: \n{}".format(event))
+        # GA 版接口中 response.audio.delta 的新名称
+        self.response_audio_delta(event)
 
     def response_output_audio_done(self, event):
-        logger.debug("response_output_audio_done: \n{}".format(event))
+        self.response_audio_done(event)
     
     def response_function_call_arguments_delta(self, event):
         logger.debug("response_function_call_arguments_delta: \n{}".format(event))
@@ -222,8 +720,8 @@ class AIManager(object):
     def response_mcp_call_arguments_delta(self, event):
         logger.debug("response_mcp_call_arguments_delta: \n{}".format(event))
     
-    def esponse_mcp_call_arguments_done(self, event):
-        logger.debug("esponse_mcp_call_arguments_done: \n{}".format(event))
+    def response_mcp_call_arguments_done(self, event):
+        logger.debug("response_mcp_call_arguments_done: \n{}".format(event))
 
     def response_mcp_call_in_progress(self, event):
         logger.debug("response_mcp_call_in_progress: \n{}".format(event))
@@ -259,11 +757,26 @@ class AIManager(object):
         logger.debug("response_audio_transcript_done: \n{}".format(event))
     
     def response_audio_delta(self, event):
-        if self.interrupt_flag or CurrentApp().audio_manager.is_playing():
+        item_id = event.get("item_id")
+        if self.interrupt_flag or item_id == self.truncated_item_id or CurrentApp().audio_manager.is_playing():
+            return
+        self.response_item_id = item_id
+        self.timeline.mark(tl.FIRST_DELTA)
+        # 与 on_openai_audio 相同, 直接解码进抖动缓冲, 不整段 b64decode
+        CurrentApp().audio_manager.enqueue_playback(event["delta"], tag=item_id)
+        CurrentApp().power_manager.reset_standby_check()
+
+    def on_openai_audio(self, event, raw, start, end):
+        """音频 delta 不经过 JSON 解析, 由 protocol 直接回调; raw[start:end] 的 base64 文本直接解码进抖动缓冲的块,
+        播放线程写出后归还"""
+        item_id = event.get("item_id")
+        if self.interrupt_flag or item_id == self.truncated_item_id or CurrentApp().audio_manager.is_playing():
             return
-        data = base64.b64decode(event["delta"])
-        CurrentApp().audio_manager.g711_write(data)
+        self.response_item_id = item_id
+        self.timeline.mark(tl.FIRST_DELTA)
+        CurrentApp().audio_manager.enqueue_playback(raw, start, end, item_id)
         CurrentApp().power_manager.reset_standby_check()
 
     def response_audio_done(self, event):
         logger.debug("response_audio_done: \n{}".format(event))
+        CurrentApp().audio_manager.end_playback_stream()
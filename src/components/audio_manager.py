@@ -4,7 +4,15 @@ import audio
 import G711
 from machine import ExtInt
 from usr.libs import CurrentApp
-from usr.libs.threading import Thread, Lock
+from usr.libs import b64
+from usr.libs.threading import Thread, Lock, Condition
+from usr.libs.timeline import FIRST_WRITE
+from usr.libs.metrics import registry
+from usr.libs.ringbuf import RingBuffer
+from usr.libs.pool import BufferPool
+from usr.libs.backoff import Backoff
+from usr.libs.media_cache import MediaCache
+from usr.libs.gain import GainStage
 from usr.libs.logging import getLogger
 from usr.configure import settings
 
@@ -14,6 +22,521 @@ logger = getLogger(__name__)
 
 RECORD_TIME_MS = 200
 
+# G711 8kHz 单声道每毫秒字节数
+G711_BYTES_PER_MS = 8
+
+
+class JitterBuffer(object):
+    """下行音频抖动缓冲
+
+    容量按毫秒计: 预分配可容纳 capacity_ms 音频的定长块, 接收线程把 base64 音频 delta 直接解码追加进队尾块,
+    同一回复 item 的连续 delta 填满一块再取下一块, 小 delta 不再各占一整块; 播放线程以块的 memoryview 写出。接收线程只入队不等待: 块已用尽时丢弃
+    放不下的部分并计一次 overrun, 接收线程随即回到 socket 读取, 排在音频之后的控制 event 不被播放节奏拖住。
+    播放线程先缓冲到目标深度再开始按编解码器节奏写出, 每块写完即归还。播放中队列读空记为一次 underrun 并把
+    目标深度上调一级, 每段回复无 underrun 播完后下调一级。
+    """
+
+    def __init__(self, capacity_ms, block_size=1024, target_ms=200, min_ms=100, max_ms=1000, step_ms=100,
+                 underrun_wait_ms=100):
+        # 另加一块给播放线程正在写出的数据, 队列中始终可存满 capacity_ms
+        self.capacity = -(-capacity_ms * G711_BYTES_PER_MS // block_size) + 1
+        self.capacity_ms = capacity_ms
+        self.block_size = block_size
+        self.pool = BufferPool(self.capacity, block_size)
+        self.__items = [None] * self.capacity
+        self.__head = 0
+        self.__count = 0
+        self.__bytes = 0
+        self.__tail = None  # 队尾仍可追加的块
+        self.__cond = Condition()
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.step_ms = step_ms
+        self.target_ms = max(min_ms, min(target_ms, max_ms))
+        self.underrun_wait_ms = underrun_wait_ms
+        self.playing = False  # 已过预缓冲, 正在播放
+        self.draining = False  # 本段回复音频已全部到达, 播完剩余数据即可
+        self.clean = True  # 本段回复未发生 underrun
+        self.peak_ms = 0
+        self.underruns = 0
+        self.overruns = 0  # 块已用尽而丢弃音频的写入次数
+        self.dropped_bytes = 0  # overrun 丢弃的音频字节数
+        self.flushes = 0
+
+    def __pop(self):
+        item = self.__items[self.__head]
+        self.__items[self.__head] = None
+        self.__head = (self.__head + 1) % self.capacity
+        self.__count -= 1
+        self.__bytes -= item.length
+        if item is self.__tail:
+            self.__tail = None
+        return item
+
+    def __prebuffered(self):
+        # 块将用尽时也视为达到目标深度, 尽快开始播放归还块, 减少 overrun
+        return self.__bytes >= self.target_ms * G711_BYTES_PER_MS or self.__count >= self.capacity - 1 or (self.draining and self.__count)
+
+    def __room(self, tag, need):
+        """调用方持有 __cond: 返回可追加 tag 音频且至少剩 need 字节的队尾块, 否则新取一块; 块已用尽返回 None"""
+        tail = self.__tail
+        if tail is not None and tail.tag == tag and self.block_size - tail.length >= need:
+            return tail
+        item = self.pool.acquire(timeout=0)
+        if item is None:
+            return None
+        item.tag = tag
+        self.__items[(self.__head + self.__count) % self.capacity] = item
+        self.__count += 1
+        self.__tail = item
+        return item
+
+    def put(self, data, length=None, tag=None):
+        """追加 length 字节音频, tag 为所属回复 item id; 不等待, 块已用尽时丢弃剩余部分并返回 False"""
+        if length is None:
+            length = len(data)
+        return self.__put(memoryview(data), 0, length, tag, False)
+
+    def put_b64(self, src, start, end, tag=None):
+        """把 base64 文本 src[start:end] 直接解码进队尾块, 不经中间缓冲; 其余同 put"""
+        return self.__put(src, start, end, tag, True)
+
+    def __put(self, src, pos, end, tag, encoded):
+        with self.__cond:
+            while pos < end:
+                # base64 按 4 字符一组解码出 3 字节, 块中至少要剩一组的空间
+                tail = self.__room(tag, 3 if encoded else 1)
+                if tail is None:
+                    self.overruns += 1
+                    self.dropped_bytes += (end - pos) * 3 // 4 if encoded else end - pos
+                    break
+                room = self.block_size - tail.length
+                if encoded:
+                    n = min(room // 3 * 4, end - pos)
+                    length = b64.decode_into(src, pos, pos + n, tail.buf, tail.length)
+                else:
+                    n = min(room, end - pos)
+                    length = tail.length + n
+                    tail.buf[tail.length:length] = src[pos:pos + n]
+                self.__bytes += length - tail.length
+                tail.length = length
+                pos += n
+            if self.__bytes // G711_BYTES_PER_MS > self.peak_ms:
+                self.peak_ms = self.__bytes // G711_BYTES_PER_MS
+            self.__cond.notify()
+        return pos >= end
+
+    def end_stream(self):
+        with self.__cond:
+            self.draining = True
+            self.__cond.notify()
+
+    def flush(self):
+        with self.__cond:
+            while self.__count:
+                self.__pop().release()
+            self.playing = False
+            self.draining = False
+            self.clean = True
+            self.flushes += 1
+
+    def next_item(self):
+        """取下一块待播放数据, 调用方写出后须 release, 无数据时返回 None"""
+        with self.__cond:
+            if not self.playing:
+                if self.draining and not self.__count:
+                    # 本段回复已播放完毕
+                    self.draining = False
+                if not self.__cond.wait_for(self.__prebuffered, timeout=self.underrun_wait_ms * 2 / 1000):
+                    return None
+                self.playing = True
+                return self.__pop()
+            if not self.__count:
+                self.__cond.wait_for(lambda: self.__count or self.draining, timeout=self.underrun_wait_ms / 1000)
+            if self.__count:
+                return self.__pop()
+            self.playing = False
+            if self.draining:
+                self.draining = False
+                if self.clean:
+                    self.target_ms = max(self.min_ms, self.target_ms - self.step_ms)
+                self.clean = True
+            else:
+                self.underruns += 1
+                self.clean = False
+                self.target_ms = min(self.max_ms, self.target_ms + self.step_ms)
+            return None
+
+    def pending(self):
+        with self.__cond:
+            return self.playing or self.__count > 0
+
+    def depth_ms(self):
+        return self.__bytes // G711_BYTES_PER_MS
+
+    def stats(self):
+        with self.__cond:
+            return {
+                "capacity_ms": self.capacity_ms,
+                "depth_ms": self.__bytes // G711_BYTES_PER_MS,
+                "peak_ms": self.peak_ms,
+                "target_ms": self.target_ms,
+                "underruns": self.underruns,
+                "overruns": self.overruns,
+                "dropped_ms": self.dropped_bytes // G711_BYTES_PER_MS,
+                "flushes": self.flushes,
+                "pool": self.pool.stats(),
+            }
+
+
+class PlaybackPosition(object):
+    """按回复 item id 记录已写入及正在写入 PCM 设备的音频字节数, 只保留最近 slots 个 item"""
+
+    def __init__(self, slots=4):
+        self.__ids = [None] * slots
+        self.__bytes = [0] * slots
+        self.__last = 0
+        self.__lock = Lock()
+
+    def advance(self, item_id, length):
+        if item_id is None:
+            return
+        with self.__lock:
+            if self.__ids[self.__last] != item_id:
+                i = self.__find(item_id)
+                if i < 0:
+                    # 新 item 覆盖最早记录的槽位
+                    i = (self.__last + 1) % len(self.__ids)
+                    self.__ids[i] = item_id
+                    self.__bytes[i] = 0
+                self.__last = i
+            self.__bytes[self.__last] += length
+
+    def __find(self, item_id):
+        for i in range(len(self.__ids)):
+            if self.__ids[i] == item_id:
+                return i
+        return -1
+
+    def played_ms(self, item_id):
+        with self.__lock:
+            i = self.__find(item_id)
+            return self.__bytes[i] // G711_BYTES_PER_MS if i >= 0 else 0
+
+
+def _header(resp, name):
+    """不区分大小写取响应头"""
+    headers = getattr(resp, "headers", None) or {}
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+class MusicStream(object):
+    """音乐流下载/播放流水线
+
+    下载线程把 HTTP 响应体写入定长环形缓冲, 缓存高于高水位时暂停读取, 降到低水位再继续; 播放线程在
+    缓存达到预缓冲量后按整块把环形缓冲的视图直接送入 playStream, 不再逐块拷贝。播放中缓存不足一块
+    且下载未结束时记为一次 underrun, 重新预缓冲后继续播放。
+    连接中断或响应体短于声明长度时按 backoff 退避后以 Range 请求从已下载位置续传, 期间播放线程继续消耗
+    缓冲中的数据; 服务端忽略 Range 返回 200 时跳过已下载的部分。
+    指定 cache 时命中的 URL 直接从缓存文件读入环形缓冲, 不访问网络; 未命中时边播放边写入缓存, 完整下载后
+    才提交。
+    """
+
+    def __init__(self, aud, size, chunk, prebuffer, high, low, fetch_timeout=10, backoff=None, cache=None,
+                 revalidate=False):
+        self.aud = aud
+        self.chunk = chunk
+        self.ring = RingBuffer(size, RingBuffer.BLOCK, chunk=chunk)
+        size = self.ring.size
+        self.high = max(chunk, size * high // 100)  # 高水位, 字节
+        self.low = max(0, min(self.high - chunk, size * low // 100))  # 低水位, 字节
+        self.prebuffer = max(chunk, min(prebuffer, self.high))
+        self.fetch_timeout = fetch_timeout
+        self.backoff = backoff or Backoff(max_attempts=5)
+        self.cache = cache
+        self.revalidate = revalidate  # 缓存命中时是否先向服务端确认
+        self.__tail = bytearray(chunk)
+        self.__fetch_buf = bytearray(chunk) if cache is not None else None
+        self.__writer = None
+        self.__entry = None
+        self.__etag = None
+        self.__modified = None
+        self.__complete = False
+        self.__not_modified = False
+        self.__stop = False
+        self.__eof = False
+        self.__fetch_thread = None
+        self.__play_thread = None
+        self.__underruns = registry.counter("music.underruns")
+        self.__fetch_pauses = registry.counter("music.fetch_pauses")
+        self.__resumes = registry.counter("music.resumes")
+        self.underruns = 0
+        self.fetch_pauses = 0
+        self.resumes = 0  # 中断后以 Range 续传的次数
+        self.total_bytes = -1  # 响应给出的总长度, -1 为未知
+        self.fetched_bytes = 0  # 已写入环形缓冲的字节数, 即续传位置
+        self.skipped_bytes = 0  # 服务端不支持 Range 时重复下载并丢弃的字节数
+        self.played_bytes = 0
+        self.rebuffer_ms = 0  # underrun 后重新预缓冲的累计时长
+        self.source = "network"  # 本次播放的数据来源: network / cache
+        registry.gauge("music.buffer_bytes", self.ring.__len__)
+
+    def start(self, url):
+        self.__stop = False
+        self.__eof = False
+        self.underruns = 0
+        self.fetch_pauses = 0
+        self.resumes = 0
+        self.total_bytes = -1
+        self.fetched_bytes = 0
+        self.skipped_bytes = 0
+        self.played_bytes = 0
+        self.rebuffer_ms = 0
+        self.source = "network"
+        self.__writer = None
+        self.__entry = None
+        self.__complete = False
+        self.__not_modified = False
+        self.ring.open()
+        self.ring.reset_stats()
+        self.__fetch_thread = Thread(target=self.__fetch, args=(url, ))
+        self.__fetch_thread.start()
+        self.__play_thread = Thread(target=self.__play)
+        self.__play_thread.start()
+
+    def stop(self):
+        self.__stop = True
+        self.ring.close()
+        for t in (self.__fetch_thread, self.__play_thread):
+            if t is not None:
+                t.join()
+        self.__fetch_thread = None
+        self.__play_thread = None
+
+    def is_running(self):
+        t = self.__play_thread
+        return t is not None and t.is_running()
+
+    def __fetch(self, url):
+        logger.debug("music fetch start")
+        backoff = self.backoff
+        backoff.reset()
+        try:
+            entry = self.cache.lookup(url) if self.cache is not None else None
+            if entry is not None and not self.revalidate:
+                if self.__fetch_cached(entry):
+                    return
+                entry = None
+            # 命中且需确认时以条件请求访问, 304 表示缓存内容未变
+            conditional = None
+            if entry is not None:
+                conditional = {}
+                if entry.get("etag"):
+                    conditional["If-None-Match"] = entry["etag"]
+                if entry.get("modified"):
+                    conditional["If-Modified-Since"] = entry["modified"]
+            self.__entry = entry
+            while not self.__stop:
+                offset = self.fetched_bytes
+                try:
+                    if self.__fetch_range(url, offset, conditional):
+                        break
+                except Exception as e:
+                    logger.warn("music fetch interrupted at {} bytes: {}".format(self.fetched_bytes, repr(e)))
+                conditional = None
+                if self.__stop:
+                    break
+                if self.fetched_bytes > offset:
+                    # 本次连接有进展, 重新计算退避
+                    backoff.reset()
+                delay = backoff.next_delay()
+                if delay < 0:
+                    logger.warn("music fetch gave up after {} retries".format(backoff.attempts))
+                    break
+                while delay > 0 and not self.__stop:
+                    utime.sleep_ms(min(delay, 100))
+                    delay -= 100
+                # 环形缓冲中的数据继续播放, 以 Range 从已下载位置续传
+                self.resumes += 1
+                self.__resumes.inc()
+            if self.__not_modified:
+                self.__fetch_cached(entry)
+        finally:
+            writer = self.__writer
+            if writer is not None:
+                self.__writer = None
+                if self.__complete and not self.__stop:
+                    writer.commit(self.__etag, self.__modified)
+                else:
+                    writer.abort()
+            # 先关闭再置 eof: 播放线程看到 eof 时缓冲已不再写入, 取完剩余数据后退出
+            self.ring.close()
+            self.__eof = True
+        logger.debug("music fetch stop, {} bytes from {}".format(self.fetched_bytes, self.source))
+
+    def __fetch_cached(self, entry):
+        """从缓存文件读入环形缓冲, 文件已不可用时返回 False"""
+        try:
+            f = self.cache.open(entry)
+        except OSError:
+            self.cache.invalidate(entry)
+            return False
+        self.source = "cache"
+        self.total_bytes = entry["size"]
+        buf = self.__fetch_buf
+        try:
+            while not self.__stop:
+                n = f.readinto(buf)
+                if not n or not self.__feed(buf, n):
+                    break
+        finally:
+            f.close()
+            self.cache.served(self.fetched_bytes)
+        return True
+
+    def __feed(self, data, length):
+        """写入环形缓冲, 高于高水位时先暂停到低水位; 停止时返回 False"""
+        ring = self.ring
+        if len(ring) >= self.high:
+            self.fetch_pauses += 1
+            self.__fetch_pauses.inc()
+            while not self.__stop and ring.wait_free(ring.size - self.low, timeout=1) < ring.size - self.low:
+                pass
+            if self.__stop:
+                return False
+        if not ring.write(data, length):
+            return False
+        self.fetched_bytes += length
+        return True
+
+    def __fetch_range(self, url, offset, headers=None):
+        """从 offset 处下载到结束, 返回是否已完成(含不可重试的错误), 连接中断时抛出异常或返回 False"""
+        if offset:
+            headers = {"Range": "bytes={}-".format(offset)}
+        resp = request.get(url, headers=headers, decode=False, sizeof=self.chunk, timeout=self.fetch_timeout)
+        try:
+            status = resp.status_code
+            skip = 0
+            if status == 206:
+                # Content-Range: bytes start-end/total
+                value = _header(resp, "content-range")
+                if value and "/" in value and value.rsplit("/", 1)[1].strip().isdigit():
+                    self.total_bytes = int(value.rsplit("/", 1)[1])
+            elif status == 200:
+                # 服务端不支持 Range, 跳过已下载部分
+                skip = offset
+                value = _header(resp, "content-length")
+                if value and value.strip().isdigit():
+                    self.total_bytes = int(value)
+            elif status == 304 and self.__entry is not None:
+                self.__not_modified = True
+                return True
+            elif status == 416:
+                return True
+            elif status >= 500:
+                raise ValueError("http status {}".format(status))
+            else:
+                logger.error("music fetch got http status {}".format(status))
+                return True
+            self.__track_validators(url, offset, _header(resp, "etag"), _header(resp, "last-modified"))
+            chunked = (_header(resp, "transfer-encoding") or "").lower() == "chunked"
+            for data in resp.content:
+                if self.__stop:
+                    return True
+                if skip:
+                    if len(data) <= skip:
+                        skip -= len(data)
+                        self.skipped_bytes += len(data)
+                        continue
+                    self.skipped_bytes += skip
+                    data = memoryview(data)[skip:]
+                    skip = 0
+                if not self.__feed(data, len(data)):
+                    return True
+                if self.__writer is not None and not self.__writer.write(data):
+                    self.__writer = None
+        finally:
+            resp.close()
+        if self.total_bytes >= 0:
+            self.__complete = self.fetched_bytes >= self.total_bytes
+            return self.__complete
+        # 未给出长度: chunked 响应读到结束块才算完整; 以连接关闭为结束时无法区分截断, 播放到此为止但不写入缓存
+        self.__complete = chunked
+        return True
+
+    def __track_validators(self, url, offset, etag, modified):
+        """记录响应的 ETag / Last-Modified, 首个响应开始写缓存; 续传时内容已变化则放弃写缓存"""
+        if offset == 0:
+            self.__etag = etag
+            self.__modified = modified
+            if self.__writer is not None:
+                self.__writer.abort()
+                self.__writer = None
+            if self.cache is not None:
+                if self.__entry is not None:
+                    # 条件请求返回了新内容
+                    self.cache.invalidate(self.__entry)
+                    self.__entry = None
+                self.__writer = self.cache.begin(url, self.total_bytes)
+        elif self.__writer is not None and (etag != self.__etag or modified != self.__modified):
+            self.__writer.abort()
+            self.__writer = None
+
+    def __play(self):
+        logger.debug("music play start")
+        ring = self.ring
+        chunk = self.chunk
+        buffering = True
+        since = -1
+        while not self.__stop:
+            if buffering:
+                if ring.wait_count(self.prebuffer, timeout=0.5) < self.prebuffer and not self.__eof:
+                    continue
+                buffering = False
+                if since >= 0:
+                    self.rebuffer_ms += utime.ticks_diff(utime.ticks_ms(), since)
+            view = ring.peek()
+            if view is None:
+                if self.__eof:
+                    # 下载已结束, 送出不足一块的尾部
+                    n = ring.readinto(self.__tail, timeout=0)
+                    if not n:
+                        break
+                    self.aud.playStream(3, memoryview(self.__tail)[:n])
+                    self.played_bytes += n
+                    continue
+                self.underruns += 1
+                self.__underruns.inc()
+                buffering = True
+                since = utime.ticks_ms()
+                continue
+            self.aud.playStream(3, view)
+            ring.consume(chunk)
+            self.played_bytes += chunk
+            CurrentApp().power_manager.reset_standby_check()
+        self.aud.stopPlayStream()
+        logger.debug("music play stop: {}".format(self.stats()))
+
+    def stats(self):
+        stats = self.ring.stats()
+        stats.update(
+            fetched_bytes=self.fetched_bytes,
+            played_bytes=self.played_bytes,
+            underruns=self.underruns,
+            fetch_pauses=self.fetch_pauses,
+            resumes=self.resumes,
+            total_bytes=self.total_bytes,
+            skipped_bytes=self.skipped_bytes,
+            rebuffer_ms=self.rebuffer_ms,
+            source=self.source,
+        )
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
 
 class AudioManager(object):
 
@@ -34,46 +557,89 @@ class AudioManager(object):
         self.vol_plus.enable()
         self.vol_sub.enable()
         # 音乐播放
-        self.__stop_flag = False
-        self.t = None
-        self.lock = Lock()
+        self.music = None
+        # 采集读与播放写各用一把锁, 阻塞的采集读不会挡住播放写; 创建与释放 PCM/G711 时两把都持有
+        self.capture_lock = Lock()
+        self.playback_lock = Lock()
+        self.lock_wait = registry.histogram("audio.lock_wait_us")  # 播放线程等待 G711 写锁的时长
         self.should_upload_data = False
+        # 固件 G711 提供 read_v3 时采集直接读入调用方缓冲, 不再每次返回新的 bytes
+        self.capture_readinto = settings.CAPTURE_READINTO and hasattr(G711, "read_v3")
+        # 下行播放: 接收线程入队, 播放线程写 PCM
+        self.jitter_buffer = JitterBuffer(
+            settings.PLAYBACK_BUFFER_MS,
+            block_size=settings.PLAYBACK_BLOCK_SIZE,
+            target_ms=settings.PLAYBACK_TARGET_MS,
+            min_ms=settings.PLAYBACK_MIN_MS,
+            max_ms=settings.PLAYBACK_MAX_MS
+        )
+        self.playback_thread = None
+        self.playback_flag = False
+        self.playback_position = PlaybackPosition()
+        registry.gauge("audio.jitter_ms", self.jitter_buffer.depth_ms)
+        registry.gauge("audio.jitter_overruns", lambda: self.jitter_buffer.overruns)
+        registry.gauge("playback_pool.in_use", self.jitter_buffer.pool.in_use)
+        # 下行软件增益: 在 setVolume 的档位之外细调音量, 可选 AGC 使各段回复响度一致
+        self.playback_gain = GainStage(
+            gain_db=settings.PLAYBACK_GAIN_DB,
+            step_db=settings.GAIN_STEP_DB,
+            agc=settings.PLAYBACK_AGC,
+            agc_target=settings.PLAYBACK_AGC_TARGET,
+            noise_floor=settings.VAD_THRESHOLD
+        )
+        registry.gauge("audio.playback_gain_db", lambda: self.playback_gain.total_db)
     
     def init(self):
         logger.info("init {} extension".format(type(self).__name__))
+        logger.info("capture readinto: {}".format(self.capture_readinto))
 
     def play_music(self, url):
         # https://uat-ai-media.iotomp.com/hls/music/maibaoge.mp3
         # https://uat-ai-media.iotomp.com/hls/music/liangzhilaohu.mp3
         # url = "https://uat-ai-media.iotomp.com/hls/music/liangzhilaohu.mp3"
-        self.__stop_flag = False
-        def inner(url):
-            logger.debug("play audio data start")
-            # self.__before_start()
-            resp = request.get(url)
-            for data in resp.content:
-                if self.__stop_flag:
-                    resp.close()
-                    break
-                # logger.debug("play audio data length: {}".format(len(data)))
-                self.aud.playStream(3, data.encode())
-                CurrentApp().power_manager.reset_standby_check()
-            self.aud.stopPlayStream()
-            logger.debug("play audio data stop")
-            # self.__after_stop()
-        self.t = Thread(target=inner, args=(url, ))
-        self.t.start()
+        self.stop_music()
+        if self.music is None:
+            # 首次播放时才分配下载缓冲
+            self.music = MusicStream(
+                self.aud,
+                settings.MUSIC_BUFFER_SIZE,
+                settings.MUSIC_CHUNK_SIZE,
+                settings.MUSIC_PREBUFFER_MS * settings.MUSIC_BYTES_PER_SEC // 1000,
+                settings.MUSIC_HIGH_WATERMARK,
+                settings.MUSIC_LOW_WATERMARK,
+                fetch_timeout=settings.MUSIC_FETCH_TIMEOUT,
+                backoff=Backoff(
+                    base_ms=settings.MUSIC_RESUME_BASE_MS,
+                    cap_ms=settings.MUSIC_RESUME_MAX_MS,
+                    max_attempts=settings.MUSIC_RESUME_RETRIES
+                ),
+                cache=self.__media_cache(),
+                revalidate=settings.MEDIA_CACHE_REVALIDATE
+            )
+        self.music.start(url)
+
+    def __media_cache(self):
+        if not settings.MEDIA_CACHE_ENABLE:
+            return None
+        try:
+            return MediaCache(
+                settings.MEDIA_CACHE_DIR,
+                max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+                reserve_bytes=settings.MEDIA_CACHE_RESERVE_BYTES
+            )
+        except Exception as e:
+            logger.error("media cache unavailable: {}".format(repr(e)))
+            return None
 
     def stop_music(self):
-        self.__stop_flag = True
-        if self.t is not None:
-            self.t.join()
-    
+        if self.music is not None:
+            self.music.stop()
+
     def is_playing(self):
-        return (self.t is not None and self.t.is_running())
-    
+        return self.music is not None and self.music.is_running()
+
     def __before_start(self):
-        with self.lock:
+        with self.capture_lock, self.playback_lock:
             if self.g711 is not None:
                 # self.g711.stop_record_v3()
                 # self.g711.stop_decoder()
@@ -90,7 +656,7 @@ class AudioManager(object):
             # self.g711.start_auto_decoder(0, RECORD_TIME_MS, self.g711_cb)
 
     def __after_stop(self):
-        with self.lock:
+        with self.capture_lock, self.playback_lock:
             if self.g711 is not None:
                 # self.g711.stop_record_v3()
                 # self.g711.stop_decoder()
@@ -107,15 +673,17 @@ class AudioManager(object):
             # self.g711.start_auto_decoder(0, RECORD_TIME_MS, self.g711_cb)
 
     def init_g711(self):
-        with self.lock:
+        with self.capture_lock, self.playback_lock:
             self.pcm = audio.Audio.PCM(0, audio.Audio.PCM.MONO, 8000, audio.Audio.PCM.WRITEREAD, audio.Audio.PCM.BLOCK, 25)
             self.g711 = G711(self.pcm)
             # self.g711.set_callback_v3(self.g711_cb)
             # self.g711.start_record_v3(0, RECORD_TIME_MS)
             # self.g711.start_auto_decoder(0, RECORD_TIME_MS, self.g711_cb)
+        self.start_playback()
     
     def deinit_g711(self):
-        with self.lock:
+        self.stop_playback()
+        with self.capture_lock, self.playback_lock:
             if self.g711 is not None:
                 # self.g711.stop_record_v3()
                 # self.g711.stop_decoder()
@@ -148,12 +716,96 @@ class AudioManager(object):
         # return self.g711.read_buff(buf, length)
     
     def g711_read(self):
-        with self.lock:
+        with self.capture_lock:
             return self.g711.read(0, 5)
     
+    def g711_readinto(self, buf):
+        """读取 len(buf) 字节 A-law 数据到 buf, 返回读取字节数"""
+        with self.capture_lock:
+            return self.g711.read_v3(buf, len(buf))
+
     def g711_write(self, data):
-        with self.lock:
+        """写出一块 A-law 数据, 先经软件增益原地处理, data 须为可写缓冲"""
+        self.playback_gain.process(data, len(data))
+        start = utime.ticks_us()
+        self.playback_lock.acquire()
+        self.lock_wait.observe(utime.ticks_diff(utime.ticks_us(), start))
+        try:
+            if self.g711 is None:
+                return
             return self.g711.write(data, 0)
+        finally:
+            self.playback_lock.release()
+
+    def start_playback(self):
+        if self.playback_thread is not None:
+            return
+        self.jitter_buffer.flush()
+        self.jitter_buffer.pool.reset_stats()
+        self.playback_flag = True
+        self.playback_thread = Thread(target=self.playback_process)
+        self.playback_thread.start(stack_size=16)
+
+    def set_playback_gain(self, db):
+        """设置下行软件增益(dB), 与 setVolume 叠加"""
+        self.playback_gain.set_gain(db)
+        logger.debug("playback gain: {}".format(self.playback_gain.stats()))
+
+    def stop_playback(self):
+        self.playback_flag = False
+        if self.playback_thread is not None:
+            self.playback_thread.join()
+            self.playback_thread = None
+            self.jitter_buffer.flush()
+            logger.debug("jitter buffer stats: {}".format(self.jitter_buffer.stats()))
+
+    def playback_process(self):
+        logger.debug("playback thread enter")
+        timeline = CurrentApp().ai_manager.timeline
+        while self.playback_flag:
+            item = self.jitter_buffer.next_item()
+            if item is None:
+                continue
+            try:
+                # 写出前先计入播放位置: 已交给 PCM 设备的一块即使被打断也会播完, 打断时的截断位置应包含它
+                self.playback_position.advance(item.tag, item.length)
+                self.g711_write(item.data())
+                timeline.mark(FIRST_WRITE)
+            except Exception as e:
+                logger.debug("playback process got {}".format(repr(e)))
+            finally:
+                item.release()
+        logger.debug("playback thread exit")
+
+    def enqueue_playback(self, delta, start=0, end=None, tag=None):
+        """接收线程调用: base64 音频 delta[start:end] 直接解码进抖动缓冲, tag 为所属回复 item id;
+        不等待, 缓冲已满时丢弃放不下的部分"""
+        if not self.playback_flag:
+            return False
+        return self.jitter_buffer.put_b64(delta, start, len(delta) if end is None else end, tag)
+
+    def end_playback_stream(self):
+        """本段回复音频已全部到达"""
+        self.jitter_buffer.end_stream()
+
+    def flush_playback(self):
+        """打断时立即丢弃未播放的音频"""
+        self.jitter_buffer.flush()
+
+    def playback_pending(self):
+        """下行音频正在播放或仍有未播放数据"""
+        return self.jitter_buffer.pending()
+
+    def playback_headroom_ms(self):
+        """下行已缓冲可播放的时长, 当前没有播放时返回 -1"""
+        if not self.jitter_buffer.pending():
+            return -1
+        return self.jitter_buffer.depth_ms()
+
+    def interrupt_playback(self, item_id):
+        """丢弃未播放的音频, 返回 item_id 已写入 PCM 设备的时长(ms), 正在写出的一块也计入"""
+        self.jitter_buffer.flush()
+        return self.playback_position.played_ms(item_id)
 
     def stop_kws(self):
         logger.debug("stop kws...")
@@ -191,7 +843,7 @@ class AudioManager(object):
         logger.info("on_keyword_spotting: {}".format(state))
         if state[0] == 1 and state[1] == 0:
             # 唤醒词触发
-            CurrentApp().ai_manager.on_wakeup_key_click(None)
+            CurrentApp().ai_manager.on_wakeup_key_click(None, source="kws")
         else:
             pass
 
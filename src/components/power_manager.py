@@ -2,6 +2,7 @@ from machine import Pin
 from usr.libs import CurrentApp
 from usr.libs.threading import Thread, EventSet
 from usr.libs.logging import getLogger
+from usr.configure import settings
 
 
 logger = getLogger(__name__)
@@ -27,16 +28,20 @@ class PowerManager(object):
         self.charge_pin.write(0)
 
     def start_check_standby(self):
+        """对话空闲检测: CHAT_IDLE_TIMEOUT 秒内没有 reset_standby_check 时结束对话, 为 0 时不检测"""
+        if settings.CHAT_IDLE_TIMEOUT <= 0:
+            return
         if self.check_standby_thread and self.check_standby_thread.is_running():
             return
         self.standby_event_set.clear(0b11)
         def inner():
             logger.debug("enter standby mode detection")
             while True:
-                rv = self.standby_event_set.wait_any(0b11, timeout=60, clear=True)
-                if rv == -1:
-                    logger.debug("no conversation detected after 60s, enter standby mode")
-                    CurrentApp().ai_manager.stop_chat()
+                result, rv = self.standby_event_set.wait_any(0b11, timeout=settings.CHAT_IDLE_TIMEOUT, clear=True)
+                if not result:
+                    logger.debug("no conversation detected after {}s, enter standby mode".format(settings.CHAT_IDLE_TIMEOUT))
+                    # chat 线程退出时会 join 本线程, 不能等待 chat 线程
+                    CurrentApp().ai_manager.stop_chat(wait=False)
                     break
                 if rv & 0b01:
                     logger.debug("exit standby mode detection")
@@ -61,11 +66,12 @@ class PowerManager(object):
         def inner():
             logger.debug("enter lpm detection")
             while True:
-                rv = self.lpm_event_set.wait_any(0b11, timeout=120, clear=True)
-                if rv == -1:
+                result, rv = self.lpm_event_set.wait_any(0b11, timeout=120, clear=True)
+                if not result:
                     logger.debug("lpm detected after 120s, enter low power mode")
                     CurrentApp().audio_manager.stop_kws()
                     CurrentApp().led_manager.disable_all()
+                    CurrentApp().ai_manager.protocol.token_cache.stop_refresh()
                     break
                 if rv & 0b01:
                     logger.debug("exit lpm detection")
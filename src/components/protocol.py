@@ -1,11 +1,15 @@
 import utime
 import ujson
+import _thread
 import base64
 import request
 import ubinascii
 import uhashlib
 import uwebsocket as ws
-from usr.libs.threading import Thread
+from usr.libs import b64
+from usr.libs.metrics import registry
+from usr.libs import timeline as tl
+from usr.libs.threading import Thread, Lock, Event, Condition
 from usr.libs.logging import getLogger
 from usr.configure import settings
 
@@ -25,8 +29,13 @@ def _get_sign(pk, dk, time_string, ak):
     return hex_msg.decode()
 
 
-def get_openai_realtime_token():
-    """获取 OpenAI Realtime Token"""
+# 轮次检测模式: 服务端 VAD 判断说话结束并自动回复 / 端侧 VAD 判断说话结束后由设备提交并请求回复
+SERVER_VAD = "server_vad"
+LOCAL_VAD = "local_vad"
+
+
+def get_openai_realtime_token(turn_detection=SERVER_VAD, input_format="g711_alaw"):
+    """获取 OpenAI Realtime Token, input_format 为本次会话的上行音频编码"""
     timestamp = utime.mktime(utime.localtime()) * 1000
     sign = _get_sign(settings.PRODUCT_KEY, settings.DEVICE_KEY, str(timestamp), settings.ACCESS_SECRET)
     logger.debug("request post url: {}".format(settings.AIGC_API_URL))
@@ -38,7 +47,7 @@ def get_openai_realtime_token():
         },
         data = ujson.dumps(
             {
-                "inputAudioFormat": "g711_alaw",
+                "inputAudioFormat": input_format,
                 "outputAudioFormat": "g711_alaw",
                 "temperature": 0.8,
                 "productKey": settings.PRODUCT_KEY,
@@ -46,8 +55,7 @@ def get_openai_realtime_token():
                 "timestamp": timestamp,
                 "sign": sign,
                 # "inputAudioNoiseReduction": "far_field",
-                # "turnDetection": None,
-                "turnDetection": {
+                "turnDetection": None if turn_detection == LOCAL_VAD else {
                     "createResponse": True,
                     "interruptResponse": True,
                     "prefixPaddingMs": 800,
@@ -65,6 +73,220 @@ def get_openai_realtime_token():
     return json_data["data"]
 
 
+# 接收线程退出原因: 本端主动断开或收到对端关闭帧(recv 返回 None)为正常关闭; recv 读到空串(TCP 断开)与接收异常为异常断线
+CLOSE_NORMAL = "closed"
+CLOSE_ERROR = "error"
+
+
+# 携带 base64 音频 delta 的服务端 event
+AUDIO_DELTA_TYPES = ("response.audio.delta", "response.output_audio.delta")
+
+# 分发表中未登记的 type
+_UNREGISTERED = object()
+
+
+def _string_end(raw, pos):
+    """pos 为字符串的起始引号, 返回结束引号的位置, 未闭合返回 -1"""
+    end = raw.find('"', pos + 1)
+    while end > 0 and raw[end - 1] == "\\":
+        # 前面有奇数个反斜杠时该引号是转义的
+        n = 1
+        while raw[end - 1 - n] == "\\":
+            n += 1
+        if n % 2 == 0:
+            break
+        end = raw.find('"', end + 1)
+    return end
+
+
+def _find_string_value(raw, key):
+    """定位 raw 顶层对象中 "key" 的字符串值，返回 (key 起始, 值起始, 值结束)，不存在或值不是字符串返回 None
+
+    从头按层级扫描, 字符串整段跳过, 嵌套对象与数组中的同名 key 不会被误认; 命中前只经过 key 之前的内容。
+    """
+    depth = 0
+    pos = 0
+    size = len(raw)
+    while pos < size:
+        c = raw[pos]
+        if c == '"':
+            end = _string_end(raw, pos)
+            if end < 0:
+                return None
+            if depth == 1 and end - pos - 1 == len(key) and raw.startswith(key, pos + 1):
+                colon = end + 1
+                while colon < size and raw[colon] == " ":
+                    colon += 1
+                if colon < size and raw[colon] == ":":
+                    value_start = colon + 1
+                    while value_start < size and raw[value_start] == " ":
+                        value_start += 1
+                    if value_start >= size or raw[value_start] != '"':
+                        return None
+                    value_end = _string_end(raw, value_start)
+                    if value_end < 0:
+                        return None
+                    return pos, value_start + 1, value_end
+            pos = end + 1
+            continue
+        if c == "{" or c == "[":
+            depth += 1
+        elif c == "}" or c == "]":
+            depth -= 1
+        pos += 1
+    return None
+
+
+def _now():
+    """与签名 timestamp 同一时钟的秒级时间"""
+    return utime.mktime(utime.localtime())
+
+
+class TokenCache(object):
+    """ephemeral token 缓存
+
+    以 productKey/deviceKey 为键缓存 url/token，提前 margin 秒视为过期；后台线程在过期前
+    (refresh_ahead 秒与剩余有效期一半中的较小者) 预取新 token，唤醒时无需等待 token 接口。
+    预取只在最近一次 start_refresh 之后的 window 秒内进行, 窗口结束后线程退出, 空闲时不消耗流量与接口配额。
+    start_refresh 时缓存已失效(如休眠超过窗口后唤醒)则预取线程立即获取; 同一时刻只有一个取 token 请求,
+    get 遇到进行中的获取时等待其结果, 不重复请求。
+    """
+
+    RETRY_INTERVAL = 10  # 预取失败后的重试间隔, 秒
+    LOAD_WAIT = 15  # get 等待进行中的获取的最长时间, 秒
+
+    def __init__(self, fetch=get_openai_realtime_token, margin=10, refresh_ahead=30):
+        self.__fetch = fetch
+        self.__lock = Lock()
+        self.__cond = Condition(self.__lock)  # 进行中的获取结束
+        self.__entries = {}  # key -> (url, token, 过期时刻, 获取时刻)
+        self.__loading = False  # 有取 token 请求进行中
+        self.__generation = 0  # invalidate 次数, 期间开始的获取结果不再写入缓存
+        self.__stop_event = Event()
+        self.__refresh_thread = None
+        self.__refreshing = False  # 预取线程在运行且尚未决定退出
+        self.__active_until = 0  # 预取窗口结束时刻, 0 为不限
+        self.margin = margin
+        self.refresh_ahead = refresh_ahead
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.waits = 0  # get 等待进行中的获取的次数
+
+    @staticmethod
+    def key():
+        return "{}:{}".format(settings.PRODUCT_KEY, settings.DEVICE_KEY)
+
+    @staticmethod
+    def __to_seconds(expire_at):
+        # expireAt 为毫秒时间戳
+        return expire_at // 1000 if expire_at > 10000000000 else expire_at
+
+    def __fresh(self, entry, now):
+        return entry is not None and entry[2] - self.margin > now
+
+    def __load(self, key):
+        with self.__lock:
+            self.__loading = True
+            generation = self.__generation
+        entry = None
+        try:
+            data = self.__fetch()
+            now = _now()
+            entry = (data["url"] + data["path"], data["ephemeralToken"], self.__to_seconds(data["expireAt"]), now)
+        finally:
+            with self.__cond:
+                if entry is not None and generation == self.__generation:
+                    self.__entries[key] = entry
+                self.__loading = False
+                self.__cond.notify_all()
+        logger.debug("{} token fetched, valid for {}s".format(type(self).__name__, entry[2] - now))
+        return entry
+
+    def get(self):
+        """返回 (url, token, 过期时刻)，缓存失效时同步获取; 已有获取进行中时先等待其结果"""
+        key = self.key()
+        with self.__cond:
+            if self.__loading and not self.__fresh(self.__entries.get(key), _now()):
+                self.waits += 1
+                self.__cond.wait_for(lambda: not self.__loading, timeout=self.LOAD_WAIT)
+            entry = self.__entries.get(key)
+        if self.__fresh(entry, _now()):
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = self.__load(key)
+        return entry[0], entry[1], entry[2]
+
+    def invalidate(self):
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.pop(self.key(), None)
+
+    def __refresh_at(self, entry):
+        return entry[2] - min(self.refresh_ahead, (entry[2] - entry[3]) // 2)
+
+    def __refresh_worker(self):
+        logger.debug("{} refresh thread enter".format(type(self).__name__))
+        while True:
+            key = self.key()
+            now = _now()
+            with self.__lock:
+                entry = self.__entries.get(key)
+                until = self.__active_until
+                if until and now >= until:
+                    # 窗口内不再有活动, 由下一次 start_refresh 重新启动
+                    self.__refreshing = False
+                    break
+            if not self.__fresh(entry, now) or self.__refresh_at(entry) <= now:
+                try:
+                    entry = self.__load(key)
+                    self.refreshes += 1
+                    delay = self.__refresh_at(entry) - _now()
+                except Exception as e:
+                    self.failures += 1
+                    logger.warn("{} refresh failed, Exception details: {}".format(type(self).__name__, repr(e)))
+                    delay = self.RETRY_INTERVAL
+            else:
+                delay = self.__refresh_at(entry) - now
+            if until:
+                delay = min(delay, until - _now())
+            if self.__stop_event.wait(timeout=max(delay, 1), clear=True):
+                with self.__lock:
+                    self.__refreshing = False
+                break
+        logger.debug("{} refresh thread exit".format(type(self).__name__))
+
+    def start_refresh(self, window=0):
+        """在此后 window 秒内后台预取 token, 重复调用顺延窗口; window 为 0 时不限时长"""
+        with self.__lock:
+            now = _now()
+            self.__active_until = now + window if window > 0 else 0
+            if self.__refreshing:
+                return
+            self.__refreshing = True
+            if not self.__fresh(self.__entries.get(self.key()), now):
+                # 新线程会立即获取; 先行标记, 线程开始运行前调用的 get 也等待这次获取
+                self.__loading = True
+        if self.__refresh_thread is not None:
+            # 上一个线程已决定退出, 等其结束
+            self.__refresh_thread.join()
+        self.__stop_event.clear()
+        self.__refresh_thread = Thread(target=self.__refresh_worker)
+        self.__refresh_thread.start(stack_size=16)
+
+    def stop_refresh(self):
+        if self.__refresh_thread is not None:
+            self.__stop_event.set()
+            self.__refresh_thread.join()
+            self.__refresh_thread = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes, "failures": self.failures,
+                "waits": self.waits}
+
+
 class EventIDGenerator(object):
 
     def __init__(self):
@@ -77,13 +299,398 @@ class EventIDGenerator(object):
         return self.__id
 
 
+class AppendFrameBuilder(object):
+    """input_audio_buffer.append 预序列化帧构造器
+
+    JSON 骨架常驻于一块预分配的 bytearray，每帧只原地改写 event_id 数字并把音频
+    base64 编码写入骨架，返回的 memoryview 可直接发送，不再构造 dict/str。
+    """
+
+    HEAD = b'{"type":"input_audio_buffer.append","event_id":"event_'
+    ID_WIDTH = 5  # EventIDGenerator 上限 10000，定宽补零
+    MID = b'","audio":"'
+    TAIL = b'"}'
+
+    def __init__(self, max_audio_size=1024):
+        self.max_audio_size = max_audio_size
+        self.__id_offset = len(self.HEAD)
+        self.__audio_offset = self.__id_offset + self.ID_WIDTH + len(self.MID)
+        self.__buf = bytearray(self.__audio_offset + b64.encoded_length(max_audio_size) + len(self.TAIL))
+        self.__buf[:self.__id_offset] = self.HEAD
+        self.__buf[self.__id_offset + self.ID_WIDTH:self.__audio_offset] = self.MID
+        self.__mv = memoryview(self.__buf)
+        # 帧长不变时复用同一个 memoryview 切片
+        self.__frame_size = 0
+        self.__frame = None
+
+    def __patch_event_id(self, event_id):
+        buf = self.__buf
+        pos = self.__id_offset + self.ID_WIDTH - 1
+        while pos >= self.__id_offset:
+            buf[pos] = 48 + event_id % 10  # ord("0")
+            event_id //= 10
+            pos -= 1
+
+    def build(self, event_id, buffer, length=None):
+        """构造一帧，返回指向内部缓冲区的 memoryview，在下一次 build 前有效"""
+        if length is None:
+            length = len(buffer)
+        if length > self.max_audio_size:
+            raise ValueError("audio length {} exceeds frame builder capacity {}".format(length, self.max_audio_size))
+        self.__patch_event_id(event_id)
+        buf = self.__buf
+        end = b64.encode_into(buffer, length, buf, self.__audio_offset)
+        # 逐字节写入结尾, 不新建切片
+        for c in self.TAIL:
+            buf[end] = c
+            end += 1
+        if end != self.__frame_size:
+            self.__frame_size = end
+            self.__frame = self.__mv[:end]
+        return self.__frame
+
+
+class _Lane(object):
+    """调度通道: 定长循环队列及其统计"""
+
+    def __init__(self, name, max_size):
+        self.name = name
+        self.max_size = max_size
+        self.items = [None] * max_size
+        self.ticks = [0] * max_size  # 入队时刻
+        self.head = 0
+        self.count = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.peak = self.count
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_total = 0  # 入队到发送完成, ms
+        self.latency_max = 0
+        self.send_total = 0  # conn.send 耗时, ms
+        self.send_max = 0
+
+    def is_full(self):
+        return self.count >= self.max_size
+
+    def push(self, item):
+        pos = (self.head + self.count) % self.max_size
+        self.items[pos] = item
+        self.ticks[pos] = utime.ticks_ms()
+        self.count += 1
+        if self.count > self.peak:
+            self.peak = self.count
+
+    def pop(self):
+        item = self.items[self.head]
+        self.items[self.head] = None
+        self.head = (self.head + 1) % self.max_size
+        self.count -= 1
+        return item
+
+    def clear(self):
+        while self.count:
+            self.pop()
+            self.dropped += 1
+
+    def record(self, latency, send_ms, ok=True):
+        if not ok:
+            self.errors += 1
+            return
+        self.sent += 1
+        self.latency_total += latency
+        self.send_total += send_ms
+        if latency > self.latency_max:
+            self.latency_max = latency
+        if send_ms > self.send_max:
+            self.send_max = send_ms
+
+    def stats(self):
+        return {
+            "depth": self.count,
+            "peak": self.peak,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "latency_avg_ms": self.latency_total // self.sent if self.sent else 0,
+            "latency_max_ms": self.latency_max,
+            "send_avg_ms": self.send_total // self.sent if self.sent else 0,
+            "send_max_ms": self.send_max,
+        }
+
+
+class OutboundScheduler(object):
+    """出站 event 调度器
+
+    所有客户端 event 经由唯一的写线程串行发送; 控制通道(cancel/truncate 等)总是先于
+    音频通道出队, 打断时不会排在已缓存的音频帧之后。与上行音频有先后关系的 event(commit 及随后的
+    response.create)走音频通道, 排在已入队的 append 帧之后。音频帧直接构造进预分配的帧槽，
+    通道容量比槽数少 1，保证写线程正在发送的槽不会被生产者覆盖。
+    """
+
+    CONTROL = 0
+    AUDIO = 1
+    SLOT_POLL_MS = 5  # 音频帧槽耗尽时的轮询间隔
+
+    def __init__(self, send, control_size=16, audio_slots=4, max_audio_size=1024, frame_builder=False):
+        self.__send = send
+        # 各通道与帧槽由原生锁保护; 没有线程在其上等待, 无需 Condition
+        self.__lock = _thread.allocate_lock()
+        self.__lanes = (_Lane("control", control_size), _Lane("audio", audio_slots - 1))
+        self.__slots = [AppendFrameBuilder(max_audio_size) for _ in range(audio_slots)] if frame_builder else None
+        self.__slot_next = 0
+        self.__payload = None  # 写线程取出、正在发送的 event
+        self.__ticks = 0  # 其入队时刻
+        self.__closed = True
+        self.__thread = None
+        # 写线程无事可做时阻塞在此锁上, 生产者入队后释放; 不经 Condition.wait, 稳态下不分配等待对象
+        self.__wakeup = _thread.allocate_lock()
+
+    @property
+    def frame_builder(self):
+        return self.__slots is not None
+
+    def start(self):
+        with self.__lock:
+            if not self.__closed:
+                return
+            self.__closed = False
+            for lane in self.__lanes:
+                lane.reset_stats()
+            self.__wakeup.acquire(0)
+        self.__thread = Thread(target=self.__writer)
+        self.__thread.start(stack_size=32)
+
+    def stop(self):
+        with self.__lock:
+            self.__closed = True
+            for lane in self.__lanes:
+                lane.clear()
+            self.__wake_writer()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def submit(self, payload, lane=CONTROL, timeout=1):
+        """payload 入队; 控制通道满时直接丢弃, 音频通道满时与 submit_audio 一样轮询等待, 超时丢弃并返回 False"""
+        q = self.__lanes[lane]
+        waited = 0
+        while True:
+            with self.__lock:
+                if self.__closed:
+                    if not waited:
+                        raise RuntimeError("{} not running".format(type(self).__name__))
+                    return False
+                if not q.is_full():
+                    q.push(payload)
+                    self.__wake_writer()
+                    return True
+                if lane == self.CONTROL or waited >= timeout * 1000:
+                    q.dropped += 1
+                    if lane == self.CONTROL:
+                        logger.warn("{} lane full, drop event".format(q.name))
+                    return False
+            utime.sleep_ms(self.SLOT_POLL_MS)
+            waited += self.SLOT_POLL_MS
+
+    def submit_audio(self, event_id, buffer, length=None, timeout=1):
+        """在空闲帧槽中构造 input_audio_buffer.append 并入队，槽位耗尽时轮询等待写线程，超时返回 False"""
+        q = self.__lanes[self.AUDIO]
+        waited = 0
+        while True:
+            with self.__lock:
+                if self.__closed:
+                    if not waited:
+                        raise RuntimeError("{} not running".format(type(self).__name__))
+                    return False
+                if not q.is_full():
+                    slot = self.__slots[self.__slot_next]
+                    self.__slot_next = (self.__slot_next + 1) % len(self.__slots)
+                    q.push(slot.build(event_id, buffer, length))
+                    self.__wake_writer()
+                    return True
+                if waited >= timeout * 1000:
+                    q.dropped += 1
+                    return False
+            # 按短间隔轮询而非 Condition.wait, 等待期间不分配等待对象
+            utime.sleep_ms(self.SLOT_POLL_MS)
+            waited += self.SLOT_POLL_MS
+
+    def __wake_writer(self):
+        # 调用方持有 __lock, 生产者之间串行; 锁已释放说明已有未处理的唤醒
+        if self.__wakeup.locked():
+            self.__wakeup.release()
+
+    def __next(self):
+        """取出下一条待发送的 event 存入 __payload, 入队时刻存入 __ticks, 返回所在通道; 没有可发送的 event 时返回 None
+
+        不以元组返回, 每发送一帧不再分配。
+        """
+        with self.__lock:
+            if self.__closed:
+                return None
+            if self.__lanes[self.CONTROL].count:
+                lane = self.__lanes[self.CONTROL]
+            elif self.__lanes[self.AUDIO].count:
+                lane = self.__lanes[self.AUDIO]
+            else:
+                return None
+            self.__ticks = lane.ticks[lane.head]
+            self.__payload = lane.pop()
+            return lane
+
+    def __writer(self):
+        while True:
+            lane = self.__next()
+            if lane is None:
+                if self.__closed:
+                    break
+                self.__wakeup.acquire()
+                continue
+            payload = self.__payload
+            self.__payload = None
+            ticks = self.__ticks
+            start = utime.ticks_ms()
+            ok = True
+            try:
+                self.__send(ujson.dumps(payload) if isinstance(payload, dict) else payload)
+            except Exception as e:
+                ok = False
+                logger.info("{} send failed, Exception details: {}".format(type(self).__name__, repr(e)))
+            end = utime.ticks_ms()
+            with self.__lock:
+                lane.record(utime.ticks_diff(end, ticks), utime.ticks_diff(end, start), ok)
+
+    def depth(self, lane):
+        return self.__lanes[lane].count
+
+    def pending(self):
+        return self.__lanes[self.CONTROL].count + self.__lanes[self.AUDIO].count
+
+    def stats(self):
+        with self.__lock:
+            return {lane.name: lane.stats() for lane in self.__lanes}
+
+
+class TraceRecorder(object):
+    """event 轨迹录制
+
+    每条收发的 event 连同距连接建立的毫秒数写成一行 JSONL, 每次连接以一条 "open" 记录开头,
+    可在主机上由 simulator.server 回放。audio 为 False 时去掉音频 base64, 只记录 audio_bytes 长度。
+    """
+
+    def __init__(self, path, audio=False, max_bytes=1024 * 512):
+        self.path = path
+        self.audio = audio
+        self.max_bytes = max_bytes
+        self.__lock = Lock()
+        self.__file = None
+        self.__start = 0
+        self.written = 0
+        self.dropped = 0  # 超过 max_bytes 未写入的条数
+
+    def start(self):
+        with self.__lock:
+            if self.__file is not None:
+                return
+            self.__file = open(self.path, "a")
+            self.__start = utime.ticks_ms()
+            self.__write('{{"t":0,"dir":"open","ts":{}}}\n'.format(_now()))
+
+    def stop(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+    def __write(self, line):
+        if self.written + len(line) > self.max_bytes:
+            self.dropped += 1
+            return
+        self.__file.write(line)
+        self.written += len(line)
+
+    def __strip_audio(self, direction, raw):
+        if direction == "recv":
+            span = _find_string_value(raw, "type")
+            if span is None or raw[span[1]:span[2]] not in AUDIO_DELTA_TYPES:
+                return raw, -1
+            span = _find_string_value(raw, "delta")
+        else:
+            span = _find_string_value(raw, "audio")
+        if span is None:
+            return raw, -1
+        value_start, value_end = span[1], span[2]
+        length = b64.decoded_length(value_end - value_start)
+        while value_end > value_start and raw[value_end - 1] == "=":
+            length -= 1
+            value_end -= 1
+        return raw[:value_start] + raw[span[2]:], length
+
+    def record(self, direction, raw):
+        """direction 为 "send" 或 "recv", raw 为已序列化的 event"""
+        if self.__file is None:
+            return
+        if not isinstance(raw, str):
+            raw = bytes(raw).decode()
+        audio_bytes = -1
+        if not self.audio:
+            raw, audio_bytes = self.__strip_audio(direction, raw)
+        t = utime.ticks_diff(utime.ticks_ms(), self.__start)
+        if audio_bytes < 0:
+            line = '{{"t":{},"dir":"{}","event":{}}}\n'.format(t, direction, raw)
+        else:
+            line = '{{"t":{},"dir":"{}","event":{},"audio_bytes":{}}}\n'.format(t, direction, raw, audio_bytes)
+        with self.__lock:
+            if self.__file is not None:
+                self.__write(line)
+
+    def stats(self):
+        return {"path": self.path, "written": self.written, "dropped": self.dropped}
+
+
 class OpenAIRealTimeConnection(object):
 
-    def __init__(self, event_cb=lambda event: None, debug=True):
+    def __init__(self, event_cb=lambda event: None, debug=True, frame_builder=False, max_audio_size=1024, audio_slots=4,
+                 audio_cb=None, max_frame_size=1024*32, large_frame_size=1024*4, handlers=None,
+                 token_cache=None, recorder=None, timeline=None):
         self.debug = debug
         self.__recv_thread = None
         self.__event_cb = event_cb
+        # 音频 delta 不经 JSON 解析, 回调 audio_cb(event, raw, start, end), raw[start:end] 为 delta 的 base64 文本,
+        # 由回调方直接解码进播放缓冲; 为 None 时音频 delta 整体解析交给对应 handler
+        self.__audio_cb = audio_cb
+        self.max_frame_size = max_frame_size
+        self.large_frame_size = large_frame_size
+        self.oversize_frames = 0  # 超过 max_frame_size 被丢弃的帧数
+        self.frames_sent = registry.counter("ws.frames_sent")
+        self.bytes_sent = registry.counter("ws.bytes_sent")
+        self.frames_recv = registry.counter("ws.frames_recv")
+        self.bytes_recv = registry.counter("ws.bytes_recv")
+        self.dropped_frames = registry.counter("ws.dropped_frames")
+        self.parse_errors = registry.counter("ws.parse_errors")
+        self.handle_errors = registry.counter("ws.handle_errors")
+        # event type -> handler 分发表, 为 None 时所有 event 解析后交给 event_cb
+        self.__handlers = handlers
+        self.__type_stats = {}
         self.__event_id_generator = EventIDGenerator()
+        self.token_cache = token_cache or TokenCache()
+        self.expire_at = 0  # 当前连接所用 token 的过期时刻
+        self.close_reason = None  # 接收线程退出原因, 连接期间为 None
+        self.__closing = False  # disconnect 已开始, 接收线程随后的退出属于正常关闭
+        self.recorder = recorder  # TraceRecorder, 为 None 时不录制
+        self.timeline = timeline  # TurnTimeline, 记录取 token、建连与首帧上行时刻
+        # 出站调度器; frame_builder 为 False 时音频帧退回逐帧 ujson.dumps
+        self.__scheduler = OutboundScheduler(
+            self.__send,
+            audio_slots=audio_slots,
+            max_audio_size=max_audio_size,
+            frame_builder=frame_builder
+        )
+        registry.gauge("ws.control_queue", lambda: self.__scheduler.depth(OutboundScheduler.CONTROL))
+        registry.gauge("ws.audio_queue", lambda: self.__scheduler.depth(OutboundScheduler.AUDIO))
 
     def __str__(self):
         return "{}".format(type(self).__name__)
@@ -102,6 +709,10 @@ class OpenAIRealTimeConnection(object):
             raise RuntimeError("{} not connected".format(self))
         return __client__
 
+    def is_connected(self):
+        """websocket 已连接且接收线程仍在运行"""
+        return getattr(self, "__client__", None) is not None and self.__recv_thread is not None and self.__recv_thread.is_running()
+
     def is_state_ok(self):
         return self.conn.sock.getsocketsta() == 4
     
@@ -109,79 +720,221 @@ class OpenAIRealTimeConnection(object):
         """disconnect websocket"""
         __client__ = getattr(self, "__client__", None)
         if __client__ is not None:
+            self.__closing = True
             __client__.close()
             delattr(self, "__client__")
+        self.__scheduler.stop()
         if self.__recv_thread is not None:
             self.__recv_thread.join()
             self.__recv_thread = None
+        if self.recorder is not None:
+            self.recorder.stop()
 
     def get_realtime_api_info(self):
-        """通过移远云接口获取 realtime 连接 url 和 token"""
-        data = get_openai_realtime_token()
-        url = data["url"] + data["path"]
-        token = data["ephemeralToken"]
-        expire = data["expireAt"]
-        return url, token, expire
+        """通过移远云接口获取 realtime 连接 url 和 token, 优先使用缓存"""
+        return self.token_cache.get()
 
     def connect(self):
         """connect websocket"""
         url, token, expire = self.get_realtime_api_info()
-        __client__ = ws.Client.connect(
-            url,
-            headers={
-                "Authorization": "Bearer {}".format(token)
-            },
-            debug=self.debug
-        )
+        self.expire_at = expire
+        if self.timeline is not None:
+            self.timeline.mark(tl.TOKEN)
+        try:
+            __client__ = ws.Client.connect(
+                url,
+                headers={
+                    "Authorization": "Bearer {}".format(token)
+                },
+                debug=self.debug
+            )
+        except Exception:
+            # token 可能已被服务端作废, 下次连接重新获取
+            self.token_cache.invalidate()
+            raise
+        if self.timeline is not None:
+            self.timeline.mark(tl.CONNECTED)
+        if self.recorder is not None:
+            self.recorder.start()
+        # 先挂上连接再启动接收线程, 否则接收线程可能先于 setattr 运行而立即退出
+        setattr(self, "__client__", __client__)
+        self.close_reason = None
+        self.__closing = False
         try:
             self.__recv_thread = Thread(target=self.__recv_thread_worker)
             self.__recv_thread.start(stack_size=128)
         except Exception as e:
+            delattr(self, "__client__")
             __client__.close()
             logger.error("{} connect failed, Exception details: {}".format(self, repr(e)))
         else:
-            setattr(self, "__client__", __client__)
+            self.__scheduler.start()
             return __client__
 
+    def __send(self, data):
+        if self.recorder is not None:
+            self.recorder.record("send", data)
+        self.conn.send(data)
+        self.frames_sent.inc()
+        self.bytes_sent.inc(len(data))
+
     def __recv_thread_worker(self):
+        client = self.conn
         while True:
             try:
-                raw = self.conn.recv(1024*32)
+                raw = client.recv(self.max_frame_size)
             except Exception as e:
                 logger.info("{} recv thread break, Exception details: {}".format(self, repr(e)))
+                self.close_reason = CLOSE_NORMAL if self.__closing else CLOSE_ERROR
                 break
-            if raw is None or raw == "":
+            # 固件 recv 收到关闭帧返回 None, 读不到数据(TCP 断开)返回空串
+            if raw is None:
+                logger.info("{} recv thread break, websocket closed by peer".format(self))
+                self.close_reason = CLOSE_NORMAL
+                break
+            if raw == "":
                 logger.info("{} recv thread break, Exception details: read none bytes, websocket disconnect".format(self))
+                self.close_reason = CLOSE_NORMAL if self.__closing else CLOSE_ERROR
                 break
-            if len(raw) > 1024*4:
+            self.frames_recv.inc()
+            self.bytes_recv.inc(len(raw))
+            # 固件 recv 按整条消息返回, size 并不限制读取长度, 超长帧在此丢弃
+            if len(raw) > self.max_frame_size:
+                self.oversize_frames += 1
+                self.dropped_frames.inc()
+                logger.warn("{} drop frame of {} bytes, exceeds max_frame_size {}".format(self, len(raw), self.max_frame_size))
                 continue
+            if self.recorder is not None:
+                self.recorder.record("recv", raw)
             try:
-                self.__event_cb(ujson.loads(raw))
+                self.__on_frame(raw)
             except Exception as e:
+                self.handle_errors.inc()
                 print("handle event error: {}".format(repr(e)))
 
-    def emit(self, payload):
-        """发布客户端event"""
-        return self.conn.send(ujson.dumps(payload))
+    def __on_frame(self, raw):
+        """按嗅探出的 type 查分发表: 未登记的 type 整体解析交给 event_cb，登记为 None 的直接跳过不解析"""
+        if self.__handlers is None:
+            if len(raw) > self.large_frame_size:
+                return self.__handle_large_frame(raw)
+            return self.__event_cb(ujson.loads(raw))
+        # 顶层找不到字符串 type 时按未登记处理, 整体解析后交给 event_cb
+        span = _find_string_value(raw, "type")
+        event_type = raw[span[1]:span[2]] if span is not None else None
+        stat = self.__type_stats.get(event_type)
+        if stat is None:
+            stat = self.__type_stats[event_type] = [0, 0, 0, 0]  # 收到, 解析, 解析总耗时 us, 最大耗时 us
+        stat[0] += 1
+        handler = self.__handlers.get(event_type, _UNREGISTERED)
+        if handler is None:
+            return
+        if handler is _UNREGISTERED:
+            return self.__event_cb(self.__loads(raw, stat))
+        if self.__audio_cb is not None and event_type in AUDIO_DELTA_TYPES:
+            if self.__decode_audio_delta(raw, stat) is not None:
+                return
+        if len(raw) > self.large_frame_size:
+            logger.debug("{} large frame of {} bytes, type: {}".format(self, len(raw), event_type))
+        return handler(self.__loads(raw, stat))
+
+    def __loads(self, raw, stat):
+        start = utime.ticks_us()
+        try:
+            event = ujson.loads(raw)
+        except ValueError:
+            self.parse_errors.inc()
+            raise
+        cost = utime.ticks_diff(utime.ticks_us(), start)
+        stat[1] += 1
+        stat[2] += cost
+        if cost > stat[3]:
+            stat[3] = cost
+        return event
+
+    def __handle_large_frame(self, raw):
+        """大帧: 音频 delta 走分块解码; 其余整体解析"""
+        if self.__audio_cb is None or self.__decode_audio_delta(raw) is None:
+            return self.__event_cb(ujson.loads(raw))
+
+    def __decode_audio_delta(self, raw, stat=None):
+        """只解析去掉 delta 后的信封，delta 的 base64 区间交给 audio_cb; 不是音频 delta 时返回 None"""
+        span = _find_string_value(raw, "delta")
+        if span is None:
+            return None
+        key_start, value_start, value_end = span
+        cut_start, cut_end = key_start, value_end + 1
+        # 连同相邻的一个逗号一起去掉
+        pos = cut_end
+        while raw[pos] == " ":
+            pos += 1
+        if raw[pos] == ",":
+            cut_end = pos + 1
+        else:
+            pos = cut_start - 1
+            while raw[pos] == " ":
+                pos -= 1
+            if raw[pos] == ",":
+                cut_start = pos
+        envelope = raw[:cut_start] + raw[cut_end:]
+        event = ujson.loads(envelope) if stat is None else self.__loads(envelope, stat)
+        if event.get("type") not in AUDIO_DELTA_TYPES:
+            return None
+        self.__audio_cb(event, raw, value_start, value_end)
+        return event
+
+    def recv_stats(self):
+        """接收侧按 event type 统计的帧数、解析次数与解析耗时"""
+        return {
+            "oversize_frames": self.oversize_frames,
+            "types": {
+                t: {
+                    "count": v[0],
+                    "parsed": v[1],
+                    "parse_avg_us": v[2] // v[1] if v[1] else 0,
+                    "parse_max_us": v[3],
+                } for t, v in self.__type_stats.items()
+            }
+        }
+
+    def emit(self, payload, lane=OutboundScheduler.CONTROL):
+        """发布客户端event, 交由出站调度器异步发送, payload 为 dict 或已序列化的帧"""
+        return self.__scheduler.submit(payload, lane)
+
+    def outbound_stats(self):
+        """出站各通道的队列深度与发送时延统计"""
+        return self.__scheduler.stats()
+
+    def outbound_pending(self):
+        """出站队列中尚未发出的 event 数"""
+        return self.__scheduler.pending()
 
     def session_update(self, payload):
         return self.emit(payload)
     
-    def input_audio_buffer_append(self, buffer):
+    def input_audio_buffer_append(self, buffer, length=None):
+        if self.timeline is not None:
+            self.timeline.mark(tl.UPLINK)
+        if self.__scheduler.frame_builder:
+            return self.__scheduler.submit_audio(self.__event_id_generator.get(), buffer, length)
+        if length is not None:
+            buffer = buffer[:length]
         return self.emit(
             {
                 "audio": base64.b64encode(buffer),
                 "event_id": "event_{}".format(self.__event_id_generator.get()),
                 "type": "input_audio_buffer.append"
-            }
+            },
+            OutboundScheduler.AUDIO
         )
     
     def input_audio_buffer_commit(self):
+        # 走音频通道, 排在已入队的 append 帧之后, 本轮的语音尾部不会落到下一轮
         return self.emit(
             {
                 "event_id": "event_{}".format(self.__event_id_generator.get()),
                 "type": "input_audio_buffer.commit"
-            }
+            },
+            OutboundScheduler.AUDIO
         )
     
     def input_audio_buffer_clear(self):
@@ -219,14 +972,15 @@ class OpenAIRealTimeConnection(object):
             }
         )
 
-    def conversation_item_truncate(self, item_id):
+    def conversation_item_truncate(self, item_id, audio_end_ms=0):
+        """截断回复 item, audio_end_ms 为用户实际听到的音频时长"""
         return self.emit(
             {
                 "event_id": "event_{}".format(self.__event_id_generator.get()),
                 "type": "conversation.item.truncate",
                 "item_id": item_id,
                 "content_index": 0,
-                "audio_end_ms": 0
+                "audio_end_ms": audio_end_ms
             }
         )
     
@@ -239,7 +993,8 @@ class OpenAIRealTimeConnection(object):
             }
         )
 
-    def response_create(self):
+    def response_create(self, lane=OutboundScheduler.CONTROL):
+        """lane 为 AUDIO 时排在已入队的音频与 commit 之后"""
         return self.emit(
             {
                 "event_id": "event_{}".format(self.__event_id_generator.get()),
@@ -247,7 +1002,8 @@ class OpenAIRealTimeConnection(object):
                 "response": {
                     "output_modalities": [ "audio" ]
                 }
-            }
+            },
+            lane
         )
 
     def response_cancel(self):
@@ -23,6 +23,133 @@ class Settings(Database):
     QTH_SERVER = "mqtt://iot-south.acceleronix.io:1883"  # 欧洲
     # QTH_SERVER = "mqtt://iot-south.quectelcn.com:1883"  # 国内
 
+    # 上行音频采集环形缓冲, G711 8kHz 下 8000 字节约 1s
+    CAPTURE_RING_SIZE = 8000
+    # 溢出策略: drop_oldest / drop_newest / block
+    CAPTURE_OVERFLOW_POLICY = "drop_oldest"
+    # 采集线程用 G711.read_v3 直接读入预分配缓冲区, 不再每次返回新的 bytes; 启动时检测固件, 不支持时自动退回
+    # G711.read, 设为 False 强制使用 read. 上行每帧仍有的分配见 UPLINK_FRAME_BUILDER
+    CAPTURE_READINTO = True
+    # 单个 input_audio_buffer.append 帧的音频字节数
+    UPLINK_CHUNK_SIZE = 640
+    # append 帧改用预序列化骨架原地 base64 编码, 不再逐帧 ujson.dumps; 纯 Python 编码在主机上约慢 20 倍,
+    # 在模组上实测帧率之前默认关闭. 关闭时每个上传的 640 字节帧约分配 1.9KB(tests/test_chat_alloc.py 记录),
+    # 开启且采集走 read_v3 时上行稳态迭代不分配堆内存
+    UPLINK_FRAME_BUILDER = False
+
+    # 链路自适应: 每次会话按 CSQ 与发送负载(音频帧发送耗时占帧时长的百分比)选择上行帧时长, 弱/一般/强
+    # 链路分别取 UPLINK_FRAME_MS 中最长/中间/最短一档, 关闭时固定为 UPLINK_CHUNK_SIZE;
+    # UPLINK_CODECS 按(弱, 一般, 强)给出 session 请求的上行编码, 采集链路目前只产生 g711_alaw, 其他编码启动时报错
+    LINK_POLICY = True
+    UPLINK_FRAME_MS = (80, 160, 240)
+    UPLINK_CODECS = ("g711_alaw", "g711_alaw", "g711_alaw")
+    LINK_WEAK_CSQ = 12
+    LINK_STRONG_CSQ = 20
+    LINK_SLOW_LOAD = 50
+    LINK_FAST_LOAD = 15
+
+    # 上行端侧 VAD: 平均幅度门限、句尾保持时长、语音前导补发时长、静音期间保活帧间隔
+    UPLINK_VAD = True
+    VAD_THRESHOLD = 300
+    VAD_HANGOVER_MS = 800
+    VAD_PADDING_MS = 300
+    VAD_KEEPALIVE_MS = 1000
+
+    # 轮次检测: server_vad 由服务端判断说话结束; local_vad 由端侧 VAD 判断后提交并请求回复,
+    # 省去 speech_stopped 的一次往返. 可在设备配置文件中以 TURN_DETECTION 单独覆盖
+    TURN_DETECTION = "server_vad"
+    # local_vad: 静音持续多久判定说话结束(ms), 语音至少持续多久才算一轮(ms)
+    LOCAL_VAD_SILENCE_MS = 500
+    LOCAL_VAD_MIN_SPEECH_MS = 200
+
+    # 预录: 唤醒后会话建立前最多缓存的音频时长(ms)与字节数
+    PREROLL_MAX_MS = 3000
+    PREROLL_MAX_BYTES = 24000
+
+    # 下行抖动缓冲: 容量(ms), 即服务端下发可以领先播放的最长时长; 接收线程从不等待播放, 超出部分丢弃并计入
+    # overrun, 回复再长也不会拖住 speech_started 等控制 event. 服务端按 4 倍实时下发时一段 D 秒的回复最多
+    # 领先 0.75D 秒, 6000 可完整容纳 8s 的回复; 代价是启动即预分配 48 块共 48KB, 与采集环形缓冲(含预录约
+    # 32KB)及首次放音乐时分配的 48KB 下载缓冲同一量级, 内存紧张的模组可调小, 以 overrun 计数衡量丢音.
+    # 缓冲块字节数: 接收线程把 base64 delta 直接解码进块, 播放线程整块写出 PCM 后归还; 初始/最小/最大目标深度(ms)
+    PLAYBACK_BUFFER_MS = 6000
+    PLAYBACK_BLOCK_SIZE = 1024
+    PLAYBACK_TARGET_MS = 200
+    PLAYBACK_MIN_MS = 100
+    PLAYBACK_MAX_MS = 1000
+
+    # 音乐播放: 下载环形缓冲字节数, 每次下载与送入 playStream 的块大小, 音频码率(字节/秒, 128kbps MP3 为
+    # 16000), 起播及 underrun 后重新预缓冲的时长(ms)
+    MUSIC_BUFFER_SIZE = 1024 * 48
+    MUSIC_CHUNK_SIZE = 1024
+    MUSIC_BYTES_PER_SEC = 16000
+    MUSIC_PREBUFFER_MS = 2000
+    # 下载高/低水位, 占缓冲容量的百分比: 缓存高于高水位暂停下载, 降到低水位后恢复
+    MUSIC_HIGH_WATERMARK = 90
+    MUSIC_LOW_WATERMARK = 50
+    # 音乐下载 HTTP 超时, 秒
+    MUSIC_FETCH_TIMEOUT = 10
+    # 音乐下载中断后以 Range 续传: 退避初始/最大等待(ms), 连续无进展时最多重试次数
+    MUSIC_RESUME_BASE_MS = 1000
+    MUSIC_RESUME_MAX_MS = 8000
+    MUSIC_RESUME_RETRIES = 5
+    # 音乐缓存: 目录, 总大小上限, 文件系统至少保留的空闲空间; MEDIA_CACHE_REVALIDATE 为 True 时命中后先以
+    # If-None-Match / If-Modified-Since 向服务端确认内容未变, 否则命中直接从 flash 播放, 不访问网络
+    MEDIA_CACHE_ENABLE = True
+    MEDIA_CACHE_DIR = "/usr/media"
+    MEDIA_CACHE_MAX_BYTES = 1024 * 1024 * 2
+    MEDIA_CACHE_RESERVE_BYTES = 1024 * 256
+    MEDIA_CACHE_REVALIDATE = False
+
+    # A-law 查表软件增益: 每级 dB 数; 下行固定增益(dB, 与 setVolume 叠加)与 AGC 目标平均幅度;
+    # 上行 AGC 的目标平均幅度与最大增益(dB). 低于 VAD_THRESHOLD 的帧视为静音, 不调整增益
+    GAIN_STEP_DB = 2
+    PLAYBACK_GAIN_DB = 0
+    PLAYBACK_AGC = False
+    PLAYBACK_AGC_TARGET = 2500
+    UPLINK_AGC = False
+    UPLINK_AGC_TARGET = 2000
+    UPLINK_AGC_MAX_DB = 18
+
+    # 服务端帧上限, 超过则丢弃
+    MAX_FRAME_SIZE = 1024 * 32
+    LARGE_FRAME_SIZE = 1024 * 4
+
+    # 为 True 时所有服务端 event 都解析并打印日志, 否则只解析有实际处理逻辑的 event
+    VERBOSE_EVENTS = False
+
+    # ephemeral token 缓存: 过期前 TOKEN_EXPIRE_MARGIN 秒视为失效, 后台提前 TOKEN_REFRESH_AHEAD 秒预取;
+    # 预取只在唤醒或对话结束后的 TOKEN_PREFETCH_WINDOW 秒内进行, 空闲与低功耗时不再取 token;
+    # 唤醒时缓存已失效则立即在后台获取, 与唤醒后的初始化和预录并行
+    TOKEN_PREFETCH = True
+    TOKEN_EXPIRE_MARGIN = 10
+    TOKEN_REFRESH_AHEAD = 30
+    TOKEN_PREFETCH_WINDOW = 300
+
+    # 对话空闲超时: 超过该时长(秒)没有说话与回复音频时结束对话, 回到唤醒词检测, 连接转入热备; 0 为关闭, 对话只随断线结束
+    CHAT_IDLE_TIMEOUT = 0
+
+    # 热备: 对话结束后保持 websocket 连接的空闲时长, 秒, 0 为关闭. 只有连接仍正常时结束的对话才转入热备,
+    # 即需要 CHAT_IDLE_TIMEOUT 大于 0; 空闲超时关闭时对话只随断线结束, 热备不会生效
+    WARM_STANDBY_IDLE = 60
+
+    # 对话中断线重连: 退避初始/最大等待(ms), 自断线起的重连预算(ms)与最多重试次数, 0 为不限
+    RECONNECT_BASE_MS = 500
+    RECONNECT_MAX_MS = 8000
+    RECONNECT_BUDGET_MS = 30000
+    RECONNECT_MAX_ATTEMPTS = 0
+
+    # event 轨迹录制: 文件路径, 为空不录制; 是否保留音频 base64; 文件大小上限
+    TRACE_PATH = ""
+    TRACE_AUDIO = False
+    TRACE_MAX_BYTES = 1024 * 512
+
+    # 自适应 GC: 自上次回收后新分配超过 GC_COLLECT_BYTES 时在空闲间隙回收, 空闲堆低于 GC_URGENT_FREE 时立即回收
+    GC_COLLECT_BYTES = 1024 * 32
+    GC_URGENT_FREE = 1024 * 64
+
+    # 对话延迟时间线保留的轮数
+    LATENCY_HISTORY = 32
+
     # 仿真环境
     # AIGC_API_URL = "https://uat-one-api.iotomp.com/v2/aibiz/openapi/v1/chatgpt/createSession"
     # AIGC_API_URL = "https://uat-one-api.iotomp.com/v2/aibiz/openapi/v1/chatgpt/production/test/createSession"
@@ -34,6 +161,9 @@ class Settings(Database):
     def get_version(cls):
         return cls.VERSION
 
+    def get_turn_detection(self):
+        return self.get("TURN_DETECTION") or self.TURN_DETECTION
+
 
 # 全局配置对象
 settings = Settings(DEFAULT_CONFIG_PATH)
@@ -0,0 +1,56 @@
+import array
+
+
+def alaw_to_linear(a):
+    """G.711 A-law 字节解码为 16bit 线性采样"""
+    a ^= 0x55
+    t = (a & 0x0F) << 4
+    seg = (a & 0x70) >> 4
+    if seg == 0:
+        t += 8
+    elif seg == 1:
+        t += 0x108
+    else:
+        t = (t + 0x108) << (seg - 1)
+    return t if a & 0x80 else -t
+
+
+# A-law 字节 -> 采样幅度绝对值
+MAGNITUDE = array.array("H", [abs(alaw_to_linear(a)) for a in range(256)])
+
+
+def mean_magnitude(buf, length=None, stride=1):
+    """A-law 帧的平均幅度, stride > 1 时隔点采样"""
+    if length is None:
+        length = len(buf)
+    if not length:
+        return 0
+    table = MAGNITUDE
+    total = 0
+    i = 0
+    while i < length:
+        total += table[buf[i]]
+        i += stride
+    return total * stride // length
+
+
+# 各段 13bit 采样的上界
+_SEG_END = (0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF)
+
+
+def linear_to_alaw(pcm):
+    """16bit 线性采样编码为 G.711 A-law 字节"""
+    pcm >>= 3
+    if pcm >= 0:
+        mask = 0xD5
+    else:
+        mask = 0x55
+        pcm = -pcm - 1
+    seg = 0
+    while seg < 8 and pcm > _SEG_END[seg]:
+        seg += 1
+    if seg >= 8:
+        return 0x7F ^ mask
+    if seg < 2:
+        return ((seg << 4) | ((pcm >> 1) & 0x0F)) ^ mask
+    return ((seg << 4) | ((pcm >> seg) & 0x0F)) ^ mask
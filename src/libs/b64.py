@@ -0,0 +1,70 @@
+_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_PAD = 61  # ord("=")
+
+
+def _build_decode_table():
+    table = bytearray(b"\xff" * 256)
+    for i in range(len(_ALPHABET)):
+        table[_ALPHABET[i]] = i
+    return bytes(table)
+
+
+_DECODE_TABLE = _build_decode_table()
+
+
+def encoded_length(n):
+    """n 字节编码后的长度"""
+    return (n + 2) // 3 * 4
+
+
+def encode_into(src, length, dst, offset=0):
+    """将 src 前 length 字节编码写入 dst[offset:]，返回写入结束位置"""
+    table = _ALPHABET
+    i = 0
+    end = length - length % 3
+    while i < end:
+        n = (src[i] << 16) | (src[i + 1] << 8) | src[i + 2]
+        dst[offset] = table[n >> 18]
+        dst[offset + 1] = table[(n >> 12) & 0x3F]
+        dst[offset + 2] = table[(n >> 6) & 0x3F]
+        dst[offset + 3] = table[n & 0x3F]
+        i += 3
+        offset += 4
+    rest = length - end
+    if rest:
+        n = src[i] << 16
+        if rest == 2:
+            n |= src[i + 1] << 8
+        dst[offset] = table[n >> 18]
+        dst[offset + 1] = table[(n >> 12) & 0x3F]
+        dst[offset + 2] = table[(n >> 6) & 0x3F] if rest == 2 else _PAD
+        dst[offset + 3] = _PAD
+        offset += 4
+    return offset
+
+
+def decoded_length(n):
+    """n 个 base64 字符解码后的最大长度"""
+    return n // 4 * 3
+
+
+def decode_into(src, start, end, dst, offset=0):
+    """解码 src[start:end] (str 或 bytes，长度为 4 的倍数) 写入 dst[offset:]，返回写入结束位置"""
+    table = _DECODE_TABLE
+    conv = ord if isinstance(src, str) else int
+    i = start
+    while i < end:
+        c2 = conv(src[i + 2])
+        c3 = conv(src[i + 3])
+        n = (table[conv(src[i])] << 18) | (table[conv(src[i + 1])] << 12)
+        dst[offset] = n >> 16
+        offset += 1
+        if c2 != _PAD:
+            n |= table[c2] << 6
+            dst[offset] = (n >> 8) & 0xFF
+            offset += 1
+            if c3 != _PAD:
+                dst[offset] = (n | table[c3]) & 0xFF
+                offset += 1
+        i += 4
+    return offset
@@ -0,0 +1,39 @@
+import utime
+import urandom
+
+
+class Backoff(object):
+    """带抖动的指数退避
+
+    第 n 次重试前等待 min(cap_ms, base_ms * 2^n) 的一半再加上随机的另一半, 避免大量设备同时重连;
+    自首次失败起超过 budget_ms 或重试次数超过 max_attempts 后放弃, 0 为不限。
+    """
+
+    def __init__(self, base_ms=500, cap_ms=8000, budget_ms=0, max_attempts=0):
+        self.base_ms = base_ms
+        self.cap_ms = cap_ms
+        self.budget_ms = budget_ms
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.__start = 0
+        self.__waited_ms = 0  # 已安排的等待时长之和
+
+    def reset(self):
+        self.attempts = 0
+        self.__waited_ms = 0
+        self.__start = utime.ticks_ms()
+
+    def elapsed_ms(self):
+        return utime.ticks_diff(utime.ticks_ms(), self.__start)
+
+    def next_delay(self):
+        """下一次重试前的等待时长(ms), 预算耗尽返回 -1"""
+        if self.max_attempts and self.attempts >= self.max_attempts:
+            return -1
+        delay = min(self.cap_ms, self.base_ms << min(self.attempts, 16))
+        delay = delay // 2 + urandom.randint(0, delay // 2)
+        if self.budget_ms and max(self.elapsed_ms(), self.__waited_ms) + delay > self.budget_ms:
+            return -1
+        self.attempts += 1
+        self.__waited_ms += delay
+        return delay
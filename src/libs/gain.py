@@ -0,0 +1,107 @@
+from .alaw import alaw_to_linear, linear_to_alaw, mean_magnitude
+
+
+def gain_table(db):
+    """db 增益对应的 256 字节 A-law 查表, 超出量程的采样削顶"""
+    factor = 10 ** (db / 20)
+    table = bytearray(256)
+    for a in range(256):
+        pcm = int(alaw_to_linear(a) * factor)
+        table[a] = linear_to_alaw(max(-32768, min(32767, pcm)))
+    return bytes(table)
+
+
+class GainStage(object):
+    """A-law 查表增益与 AGC
+
+    增益按 step_db 分级, 每级一张 256 字节的 A-law -> A-law 查表, 由 set_gain 在调用方线程生成
+    (打开 AGC 时构造即生成全部各级), 音频线程上的 process 只查表; process 原地把缓冲中的每个字节
+    替换为查表结果, 0dB 时直接跳过。
+
+    gain_db 为固定增益(软件音量); 打开 AGC 时按帧平均幅度追加自动增益使电平趋近 agc_target:
+    过响的帧立即下调到不削顶的一级, 偏弱时每帧最多上调一级; 平均幅度低于 noise_floor 的帧视为静音,
+    保持当前增益不变。
+    """
+
+    def __init__(self, gain_db=0, step_db=2, min_db=-12, max_db=18, agc=False, agc_target=2000, noise_floor=300,
+                 stride=2):
+        self.step_db = step_db
+        self.min_step = -(-min_db // step_db)
+        self.max_step = max_db // step_db
+        self.__tables = [None] * (self.max_step - self.min_step + 1)
+        # 各级增益的 Q8 定点倍数, 用于 AGC 估算增益后的电平
+        self.__factors = [int(256 * 10 ** (s * step_db / 20)) for s in range(self.min_step, self.max_step + 1)]
+        self.agc = agc
+        self.agc_target = agc_target
+        self.noise_floor = noise_floor
+        self.stride = stride
+        self.gain_step = 0  # 固定增益级数
+        self.agc_step = 0  # AGC 追加的级数
+        self.level = 0  # 最近一帧处理前的平均幅度
+        if agc:
+            # AGC 可能用到任意一级
+            for step in range(self.min_step, self.max_step + 1):
+                self.__build(step)
+        self.set_gain(gain_db)
+
+    def set_gain(self, db):
+        """设置固定增益, 按 step_db 就近取整(正负对称)并限制在量程内, 并生成该级查表"""
+        step = max(self.min_step, min(self.max_step, int(round(db / self.step_db))))
+        self.__build(step)
+        self.gain_step = step
+
+    @property
+    def gain_db(self):
+        return self.gain_step * self.step_db
+
+    @property
+    def total_db(self):
+        return self.__total_step() * self.step_db
+
+    def reset(self):
+        self.agc_step = 0
+        self.level = 0
+
+    def __total_step(self):
+        return max(self.min_step, min(self.max_step, self.gain_step + self.agc_step))
+
+    def __build(self, step):
+        i = step - self.min_step
+        if step and self.__tables[i] is None:
+            self.__tables[i] = gain_table(step * self.step_db)
+
+    def __update_agc(self, level):
+        if level < self.noise_floor:
+            return
+        # 加上当前总增益后的电平
+        step = self.__total_step()
+        out = level * self.__factors[step - self.min_step] >> 8
+        if out > self.agc_target:
+            # 过响: 直接下调到不超过目标的一级
+            while step > self.min_step and level * self.__factors[step - self.min_step] >> 8 > self.agc_target:
+                step -= 1
+            self.agc_step = step - self.gain_step
+        elif step < self.max_step and level * self.__factors[step + 1 - self.min_step] >> 8 <= self.agc_target:
+            # 偏弱: 每帧最多上调一级
+            self.agc_step = step + 1 - self.gain_step
+
+    def process(self, buf, length):
+        """原地处理 buf 前 length 字节, buf 须为可写缓冲(bytearray 或其 memoryview)"""
+        if self.agc:
+            self.level = mean_magnitude(buf, length, self.stride)
+            self.__update_agc(self.level)
+        step = self.__total_step()
+        if not step:
+            return
+        table = self.__tables[step - self.min_step]
+        for i in range(length):
+            buf[i] = table[buf[i]]
+
+    def stats(self):
+        return {
+            "gain_db": self.gain_db,
+            "agc": self.agc,
+            "agc_db": self.agc_step * self.step_db,
+            "total_db": self.total_db,
+            "level": self.level,
+        }
@@ -0,0 +1,96 @@
+import gc
+import utime
+from .metrics import registry
+
+
+# GC 暂停时长直方图桶上界, us
+PAUSE_BUCKETS_US = (1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+
+class HeapMonitor(object):
+    """堆使用采样与自适应 GC
+
+    poll 由各线程在空闲间隙调用: 每次采样 mem_free / mem_alloc 并记录本次对话的峰值; 自上次回收后
+    新分配超过 collect_bytes 时, 仅当下行播放余量 headroom_ms 足以覆盖一次 GC 暂停(按近期暂停时长的
+    两倍估算)才回收, 否则推迟到下一个间隙; 空闲堆低于 urgent_free 时不再等待。
+    固件不提供 gc.mem_free / mem_alloc 时(如主机仿真)只记录调用, 不做回收。
+    """
+
+    def __init__(self, collect_bytes=1024 * 32, urgent_free=1024 * 64):
+        self.supported = hasattr(gc, "mem_free") and hasattr(gc, "mem_alloc")
+        self.collect_bytes = collect_bytes
+        self.urgent_free = urgent_free
+        self.pause_us = 0  # 近期 GC 暂停时长估计
+        self.__baseline = 0  # 上次回收后的 mem_alloc
+        self.peak_alloc = 0
+        self.min_free = -1
+        self.collects = 0
+        self.urgent = 0
+        self.deferred = 0
+        self.__pauses = registry.histogram("gc.pause_us", PAUSE_BUCKETS_US)
+        registry.gauge("heap.free", self.mem_free)
+        registry.gauge("heap.alloc", self.mem_alloc)
+        registry.gauge("heap.peak_alloc", lambda: self.peak_alloc)
+        registry.gauge("heap.min_free", lambda: self.min_free)
+
+    def mem_free(self):
+        return gc.mem_free() if self.supported else -1
+
+    def mem_alloc(self):
+        return gc.mem_alloc() if self.supported else -1
+
+    def reset(self):
+        """新对话开始时清除峰值统计"""
+        self.peak_alloc = 0
+        self.min_free = -1
+        self.collects = 0
+        self.urgent = 0
+        self.deferred = 0
+        if self.supported:
+            self.__baseline = gc.mem_alloc()
+
+    def poll(self, headroom_ms=-1):
+        """采样并按需回收, headroom_ms 为下行已缓冲可播放的时长, -1 为当前没有播放; 返回是否做了回收"""
+        if not self.supported:
+            return False
+        alloc = gc.mem_alloc()
+        free = gc.mem_free()
+        if alloc > self.peak_alloc:
+            self.peak_alloc = alloc
+        if self.min_free < 0 or free < self.min_free:
+            self.min_free = free
+        if alloc < self.__baseline:
+            # 期间发生过固件自动回收
+            self.__baseline = alloc
+        if alloc - self.__baseline < self.collect_bytes:
+            return False
+        urgent = free < self.urgent_free
+        if not urgent and 0 <= headroom_ms * 1000 < self.pause_us * 2:
+            self.deferred += 1
+            return False
+        if urgent:
+            self.urgent += 1
+        self.collect()
+        return True
+
+    def collect(self):
+        start = utime.ticks_us()
+        gc.collect()
+        pause = utime.ticks_diff(utime.ticks_us(), start)
+        self.collects += 1
+        self.__pauses.observe(pause)
+        self.pause_us = pause if pause > self.pause_us else (self.pause_us + pause) // 2
+        if self.supported:
+            self.__baseline = gc.mem_alloc()
+
+    def stats(self):
+        return {
+            "free": self.mem_free(),
+            "alloc": self.mem_alloc(),
+            "peak_alloc": self.peak_alloc,
+            "min_free": self.min_free,
+            "collects": self.collects,
+            "urgent": self.urgent,
+            "deferred": self.deferred,
+            "pause_us": self.pause_us,
+        }
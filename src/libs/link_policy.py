@@ -0,0 +1,107 @@
+from .metrics import registry
+
+
+# 链路等级
+WEAK = 0
+NORMAL = 1
+STRONG = 2
+
+LEVELS = ("weak", "normal", "strong")
+
+CSQ_UNKNOWN = 99
+
+# 采集链路能够产生的上行编码: G711 采集只输出 A 律, 帧长按 8 字节/ms 计算
+SUPPORTED_CODECS = ("g711_alaw",)
+
+
+class LinkProfile(object):
+    """一次会话采用的上行编码与帧时长"""
+
+    def __init__(self, codec, frame_ms, level, csq=CSQ_UNKNOWN, load=-1):
+        self.codec = codec
+        self.frame_ms = frame_ms
+        self.level = level
+        self.csq = csq  # 选择时的信号强度
+        self.load = load  # 选择时的发送负载估计, -1 为尚无样本
+
+    def __repr__(self):
+        return "{}(codec=\"{}\", frame_ms={}, level={}, csq={}, load={})".format(
+            type(self).__name__, self.codec, self.frame_ms, LEVELS[self.level], self.csq, self.load)
+
+
+class LinkPolicy(object):
+    """按链路质量为每次会话选择上行编码与帧时长
+
+    链路质量取自 signal() 返回的 CSQ(0~31, 99 为未知)与发送负载: 负载为音频帧平均发送耗时占帧时长的
+    百分比, 按此前各次会话做指数平滑。CSQ 低于 weak_csq 或负载高于 slow_load 为弱链路, 选最长的帧以减少
+    每帧 JSON / base64 开销; CSQ 不低于 strong_csq 且负载低于 fast_load(尚无样本时只看 CSQ)为强链路,
+    选最短的帧以降低时延; 其余取中间档。
+    codecs 按 (弱, 一般, 强) 给出各等级的编码, 须为 SUPPORTED_CODECS 之一, 否则构造时抛出 ValueError。
+    """
+
+    def __init__(self, signal, frame_ms=(80, 160, 240), codecs=("g711_alaw", "g711_alaw", "g711_alaw"), weak_csq=12,
+                 strong_csq=20, slow_load=50, fast_load=15, min_frames=20):
+        if len(codecs) != len(LEVELS):
+            raise ValueError("codecs needs one entry per level {}, got {}".format(LEVELS, codecs))
+        for codec in codecs:
+            if codec not in SUPPORTED_CODECS:
+                raise ValueError("unsupported uplink codec \"{}\", capture only produces {}".format(codec, SUPPORTED_CODECS))
+        self.signal = signal
+        self.frame_ms = tuple(sorted(frame_ms))
+        self.codecs = tuple(codecs)
+        self.weak_csq = weak_csq
+        self.strong_csq = strong_csq
+        self.slow_load = slow_load
+        self.fast_load = fast_load
+        self.min_frames = min_frames  # 会话发送的音频帧不少于该数才计入负载
+        self.load = -1  # 发送负载的指数平滑, %
+        self.profile = None
+        self.selections = [0] * len(LEVELS)
+        registry.gauge("link.frame_ms", lambda: self.profile.frame_ms if self.profile is not None else 0)
+        registry.gauge("link.load", lambda: self.load)
+
+    def max_frame_ms(self):
+        return self.frame_ms[-1]
+
+    def __csq(self):
+        try:
+            csq = self.signal()
+        except Exception:
+            return CSQ_UNKNOWN
+        return csq if isinstance(csq, int) and 0 <= csq <= 31 else CSQ_UNKNOWN
+
+    def level(self, csq, load):
+        known = csq != CSQ_UNKNOWN
+        if (known and csq < self.weak_csq) or load > self.slow_load:
+            return WEAK
+        if known and csq >= self.strong_csq and load < self.fast_load:
+            return STRONG
+        return NORMAL
+
+    def select(self):
+        """新会话开始前选择编码与帧时长"""
+        csq = self.__csq()
+        level = self.level(csq, self.load)
+        if level == WEAK:
+            frame_ms = self.frame_ms[-1]
+        elif level == STRONG:
+            frame_ms = self.frame_ms[0]
+        else:
+            frame_ms = self.frame_ms[len(self.frame_ms) // 2]
+        self.selections[level] += 1
+        self.profile = LinkProfile(self.codecs[level], frame_ms, level, csq, self.load)
+        return self.profile
+
+    def record(self, audio_stats):
+        """会话结束时计入本次 profile 下音频通道的发送统计(OutboundScheduler.stats()["audio"])"""
+        if self.profile is None or audio_stats.get("sent", 0) < self.min_frames:
+            return
+        sample = audio_stats["send_avg_ms"] * 100 // self.profile.frame_ms
+        self.load = sample if self.load < 0 else (self.load * 3 + sample) // 4
+
+    def stats(self):
+        return {
+            "profile": repr(self.profile),
+            "load": self.load,
+            "selections": {LEVELS[i]: self.selections[i] for i in range(len(LEVELS))},
+        }
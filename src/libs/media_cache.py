@@ -0,0 +1,279 @@
+import uos
+import ql_fs
+import uhashlib
+import ubinascii
+import ujson as json
+from .threading import Lock
+from .metrics import registry
+
+
+INDEX_NAME = "index.json"
+
+
+def _remove(path):
+    try:
+        uos.remove(path)
+    except OSError:
+        pass
+
+
+def _replace(src, dst):
+    """src 重命名为 dst, 文件系统不支持覆盖时先删除 dst"""
+    try:
+        uos.rename(src, dst)
+    except OSError:
+        _remove(dst)
+        uos.rename(src, dst)
+
+
+class CacheWriter(object):
+    """边下载边写入的临时文件, commit 后才进入缓存索引, 中途中断则 abort 丢弃
+
+    长度未知(未预留空间)时每写入 FREE_CHECK_BYTES 检查一次文件系统剩余空间, 低于保留量即放弃。
+    """
+
+    FREE_CHECK_BYTES = 1024 * 32
+
+    def __init__(self, cache, key, url, path, reserved=0):
+        self.cache = cache
+        self.key = key
+        self.url = url
+        self.path = path
+        self.size = 0
+        self.reserved = reserved  # begin 时预留的文件系统空间, commit / abort 后归还
+        self.__checked = 0  # 上次检查剩余空间时的 size
+        self.__file = open(path, "wb")
+
+    def write(self, data):
+        """写入一块数据, 超过缓存上限或写入失败时放弃缓存并返回 False"""
+        if self.__file is None:
+            return False
+        try:
+            self.__file.write(data)
+        except Exception:
+            self.abort()
+            return False
+        self.size += len(data)
+        if self.size > self.cache.max_bytes:
+            self.abort()
+            return False
+        if not self.reserved and self.size - self.__checked >= self.FREE_CHECK_BYTES:
+            self.__checked = self.size
+            if not self.cache._has_room(0):
+                self.abort()
+                return False
+        return True
+
+    def commit(self, etag=None, modified=None):
+        if self.__file is None:
+            return False
+        self.__file.close()
+        self.__file = None
+        return self.cache._commit(self, etag, modified)
+
+    def abort(self):
+        if self.__file is None:
+            return
+        self.__file.close()
+        self.__file = None
+        _remove(self.path)
+        self.cache._aborted(self)
+
+
+class MediaCache(object):
+    """设备文件系统上的媒体内容缓存
+
+    以 URL 的哈希为键, 每个条目记录 URL、响应的 ETag / Last-Modified 与文件大小, 索引存放在缓存目录的
+    index.json 中。首次播放时由 CacheWriter 把下载内容写入临时文件, 下载完整后改名为正式文件并更新索引;
+    下载期间只预留空间, 提交时总大小超过 max_bytes 才按最近最少使用淘汰, 下载失败不影响已有条目。
+    开始写入与写入过程中文件系统剩余空间都不低于 reserve_bytes。
+    命中只在内存中更新 LRU 顺序, 随下一次提交、淘汰或删除写入索引。启动时清理索引之外的文件与残留的临时文件。
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 2, reserve_bytes=1024 * 256):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.reserve_bytes = reserve_bytes  # 文件系统至少保留的空闲空间
+        self.__lock = Lock()
+        self.__entries = {}
+        self.__seq = 0  # LRU 使用序号, 越大越新
+        self.__reserved = 0  # 进行中的 CacheWriter 预留的字节数
+        self.hits = registry.counter("media_cache.hits")
+        self.misses = registry.counter("media_cache.misses")
+        self.stale = registry.counter("media_cache.stale")
+        self.stores = registry.counter("media_cache.stores")
+        self.evictions = registry.counter("media_cache.evictions")
+        self.aborts = registry.counter("media_cache.aborts")
+        self.served_bytes = registry.counter("media_cache.served_bytes")
+        registry.gauge("media_cache.bytes", self.total_bytes)
+        self.__load()
+
+    @staticmethod
+    def key(url):
+        return ubinascii.hexlify(uhashlib.sha256(url.encode()).digest()).decode()[:16]
+
+    def __path(self, key):
+        return "{}/{}.bin".format(self.root, key)
+
+    def __load(self):
+        if not ql_fs.path_exists(self.root):
+            ql_fs.mkdirs(self.root)
+        index = None
+        try:
+            with open("{}/{}".format(self.root, INDEX_NAME)) as f:
+                index = json.loads(f.read())
+        except Exception:
+            pass
+        if isinstance(index, dict):
+            self.__seq = index.get("seq", 0)
+            for key, entry in index.get("entries", {}).items():
+                try:
+                    size = uos.stat(self.__path(key))[6]
+                except OSError:
+                    continue
+                if size == entry.get("size"):
+                    self.__entries[key] = entry
+        # 清理未进入索引的文件与中断残留的临时文件
+        keep = {INDEX_NAME}
+        for key in self.__entries:
+            keep.add(key + ".bin")
+        for item in uos.ilistdir(self.root):
+            if item[0] not in keep and item[1] == 0x8000:
+                _remove("{}/{}".format(self.root, item[0]))
+
+    def __save(self):
+        path = "{}/{}".format(self.root, INDEX_NAME)
+        with open(path + ".tmp", "w") as f:
+            f.write(json.dumps({"seq": self.__seq, "entries": self.__entries}))
+        _replace(path + ".tmp", path)
+
+    def total_bytes(self):
+        total = 0
+        for entry in self.__entries.values():
+            total += entry["size"]
+        return total
+
+    def lookup(self, url):
+        """已缓存的条目, 未命中返回 None 并计一次 miss"""
+        with self.__lock:
+            entry = self.__entries.get(self.key(url))
+            if entry is None or entry["url"] != url:
+                self.misses.inc()
+                return None
+            return entry
+
+    def open(self, entry):
+        """打开条目文件用于播放, 并更新内存中的 LRU 顺序"""
+        key = self.key(entry["url"])
+        f = open(self.__path(key), "rb")
+        with self.__lock:
+            self.__seq += 1
+            entry["used"] = self.__seq
+            self.hits.inc()
+        return f
+
+    def served(self, length):
+        self.served_bytes.inc(length)
+
+    def invalidate(self, entry):
+        """内容已变化(ETag / Last-Modified 不一致), 删除条目"""
+        key = self.key(entry["url"])
+        with self.__lock:
+            self.stale.inc()
+            if self.__entries.pop(key, None) is not None:
+                _remove(self.__path(key))
+                self.__save()
+
+    def begin(self, url, size=-1):
+        """开始写入 url 的内容, size 为响应给出的总长度; 超过上限或空间不足时返回 None"""
+        if size > self.max_bytes:
+            return None
+        key = self.key(url)
+        reserved = max(size, 0)
+        with self.__lock:
+            # 只预留空间, 已有条目留到 commit 时再淘汰; 长度未知时由 CacheWriter 在写入中检查
+            if not self.__has_room(reserved):
+                return None
+            self.__reserved += reserved
+        try:
+            return CacheWriter(self, key, url, self.__path(key) + ".tmp", reserved)
+        except Exception:
+            self.__release(reserved)
+            return None
+
+    def __has_room(self, size):
+        """再写入 size 字节后剩余空间仍不低于 reserve_bytes(扣除进行中的预留); 无法获取时视为足够"""
+        try:
+            st = uos.statvfs(self.root)
+        except Exception:
+            return True
+        return st[0] * st[4] >= self.__reserved + size + self.reserve_bytes
+
+    def _has_room(self, size):
+        with self.__lock:
+            return self.__has_room(size)
+
+    def __release(self, reserved):
+        with self.__lock:
+            self.__reserved -= reserved
+
+    def __evict(self, size):
+        """按 LRU 删除条目直到再放入 size 字节不超过上限"""
+        total = self.total_bytes()
+        while self.__entries and total + size > self.max_bytes:
+            oldest = None
+            for key, entry in self.__entries.items():
+                if oldest is None or entry["used"] < self.__entries[oldest]["used"]:
+                    oldest = key
+            total -= self.__entries.pop(oldest)["size"]
+            _remove(self.__path(oldest))
+            self.evictions.inc()
+
+    def _commit(self, writer, etag, modified):
+        with self.__lock:
+            self.__reserved -= writer.reserved
+            self.__entries.pop(writer.key, None)
+            self.__evict(writer.size)
+            if self.total_bytes() + writer.size > self.max_bytes:
+                _remove(writer.path)
+                self.aborts.inc()
+                self.__save()
+                return False
+            _replace(writer.path, self.__path(writer.key))
+            self.__seq += 1
+            self.__entries[writer.key] = {
+                "url": writer.url,
+                "etag": etag,
+                "modified": modified,
+                "size": writer.size,
+                "used": self.__seq,
+            }
+            self.__save()
+            self.stores.inc()
+            return True
+
+    def _aborted(self, writer):
+        self.__release(writer.reserved)
+        self.aborts.inc()
+
+    def clear(self):
+        with self.__lock:
+            for key in self.__entries:
+                _remove(self.__path(key))
+            self.__entries = {}
+            self.__save()
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "entries": len(self.__entries),
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits.value,
+                "misses": self.misses.value,
+                "stale": self.stale.value,
+                "stores": self.stores.value,
+                "evictions": self.evictions.value,
+                "aborts": self.aborts.value,
+                "served_bytes": self.served_bytes.value,
+            }
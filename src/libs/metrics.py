@@ -0,0 +1,153 @@
+import _thread
+from array import array
+
+
+# 默认延迟直方图桶上界, us; 最后一个桶统计超过最大上界的样本
+LATENCY_BUCKETS_US = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+class Counter(object):
+    """单调递增计数, 值存放在注册表的 array 中"""
+
+    def __init__(self, values, index, lock):
+        self.__values = values
+        self.__index = index
+        self.__lock = lock
+
+    def inc(self, n=1):
+        with self.__lock:
+            self.__values[self.__index] += n
+
+    @property
+    def value(self):
+        return self.__values[self.__index]
+
+
+class Gauge(object):
+    """瞬时值; 以 fn 注册的 gauge 在取快照时调用 fn 采样, 不需要 set"""
+
+    def __init__(self, values, index):
+        self.__values = values
+        self.__index = index
+
+    def set(self, value):
+        self.__values[self.__index] = value
+
+    @property
+    def value(self):
+        return self.__values[self.__index]
+
+
+class Histogram(object):
+    """固定桶直方图: counts[i] 为 <= bounds[i] 的样本数, 末桶为超过最大上界的样本数"""
+
+    def __init__(self, bounds, lock):
+        self.bounds = tuple(bounds)
+        self.__counts = array("L", [0] * (len(self.bounds) + 1))
+        self.__lock = lock
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        bounds = self.bounds
+        i = 0
+        n = len(bounds)
+        while i < n and value > bounds[i]:
+            i += 1
+        with self.__lock:
+            self.__counts[i] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def reset(self):
+        with self.__lock:
+            for i in range(len(self.__counts)):
+                self.__counts[i] = 0
+            self.count = 0
+            self.total = 0
+            self.max = 0
+
+    def snapshot(self):
+        with self.__lock:
+            return {
+                "bounds": self.bounds,
+                "counts": list(self.__counts),
+                "count": self.count,
+                "avg": self.total // self.count if self.count else 0,
+                "max": self.max,
+            }
+
+
+class Registry(object):
+    """运行时指标注册表
+
+    计数与 gauge 值分别存放在一块 array 中, 指标对象只持有下标; 同名指标重复注册返回同一对象, 便于
+    各组件在构造时各自取用。snapshot 返回全部指标的 dict。
+    """
+
+    def __init__(self):
+        self.__lock = _thread.allocate_lock()
+        self.__counter_values = array("L")
+        self.__counters = {}
+        self.__gauge_values = array("l")
+        self.__gauges = {}
+        self.__gauge_fns = {}
+        self.__histograms = {}
+
+    def counter(self, name):
+        with self.__lock:
+            counter = self.__counters.get(name)
+            if counter is None:
+                self.__counter_values.append(0)
+                counter = self.__counters[name] = Counter(self.__counter_values, len(self.__counter_values) - 1, self.__lock)
+            return counter
+
+    def gauge(self, name, fn=None):
+        with self.__lock:
+            if fn is not None:
+                self.__gauge_fns[name] = fn
+                return None
+            gauge = self.__gauges.get(name)
+            if gauge is None:
+                self.__gauge_values.append(0)
+                gauge = self.__gauges[name] = Gauge(self.__gauge_values, len(self.__gauge_values) - 1)
+            return gauge
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS_US):
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram(bounds, _thread.allocate_lock())
+            return histogram
+
+    def reset(self):
+        """计数与直方图清零, gauge 保持当前值"""
+        with self.__lock:
+            for i in range(len(self.__counter_values)):
+                self.__counter_values[i] = 0
+        for histogram in list(self.__histograms.values()):
+            histogram.reset()
+
+    def snapshot(self):
+        with self.__lock:
+            counters = {name: c.value for name, c in self.__counters.items()}
+            gauges = {name: g.value for name, g in self.__gauges.items()}
+            fns = list(self.__gauge_fns.items())
+            histograms = list(self.__histograms.items())
+        for name, fn in fns:
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": {name: h.snapshot() for name, h in histograms},
+        }
+
+
+# 全局指标注册表
+registry = Registry()
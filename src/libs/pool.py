@@ -0,0 +1,110 @@
+import _thread
+from .threading import Condition
+
+
+class PooledBuffer(object):
+    """缓冲池中的一块预分配缓冲区, 使用完毕必须 release 归还"""
+
+    def __init__(self, pool, size):
+        self.__pool = pool
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.length = 0
+        self.tag = None  # 数据归属标识, 如下行音频所属的 item id
+        self.__view_length = -1
+        self.__view = None
+
+    def data(self):
+        """有效数据的 memoryview, 长度不变时复用同一切片"""
+        if self.length != self.__view_length:
+            self.__view_length = self.length
+            self.__view = self.mv[:self.length]
+        return self.__view
+
+    def release(self):
+        self.__pool.release(self)
+
+
+class BufferPool(object):
+    """定长缓冲池: 预分配 count 块 size 字节的缓冲区, 耗尽时等待归还或超时
+
+    空闲列表由原生 _thread 锁保护, 借出与归还不经 threading.Lock; 只有池耗尽需要等待时才经 Condition。
+    """
+
+    def __init__(self, count, size):
+        self.size = size
+        self.count = count
+        self.__free = [PooledBuffer(self, size) for _ in range(count)]
+        self.__lock = _thread.allocate_lock()
+        self.__cond = Condition()  # 有缓冲区归还
+        self.__waiters = 0  # 等待归还的申请方数
+        self.peak = 0  # 同时借出的最大块数
+        self.exhausted = 0  # 申请时池已耗尽的次数
+        self.timeouts = 0  # 等待超时未拿到缓冲区的次数
+
+    def in_use(self):
+        with self.__lock:
+            return self.count - len(self.__free)
+
+    def acquire(self, timeout=None):
+        """借出一块缓冲区, 超时返回 None"""
+        with self.__lock:
+            if self.__free:
+                return self.__take()
+            self.exhausted += 1
+            if timeout is not None and timeout <= 0:
+                self.timeouts += 1
+                return None
+        with self.__cond:
+            # 在 __lock 下登记等待并复查, 归还方释放 __lock 后看到等待者再经 __cond 通知, 不会漏掉
+            with self.__lock:
+                self.__waiters += 1
+            try:
+                if self.__cond.wait_for(self.__has_free, timeout=timeout):
+                    with self.__lock:
+                        if self.__free:
+                            return self.__take()
+            finally:
+                with self.__lock:
+                    self.__waiters -= 1
+        with self.__lock:
+            self.timeouts += 1
+        return None
+
+    def __has_free(self):
+        with self.__lock:
+            return len(self.__free) > 0
+
+    def __take(self):
+        """调用方持有 __lock"""
+        item = self.__free.pop()
+        item.length = 0
+        item.tag = None
+        used = self.count - len(self.__free)
+        if used > self.peak:
+            self.peak = used
+        return item
+
+    def release(self, item):
+        with self.__lock:
+            self.__free.append(item)
+        if self.__waiters:
+            with self.__cond:
+                self.__cond.notify()
+
+    def reset_stats(self):
+        with self.__lock:
+            self.peak = self.count - len(self.__free)
+            self.exhausted = 0
+            self.timeouts = 0
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "count": self.count,
+                "size": self.size,
+                "in_use": self.count - len(self.__free),
+                "peak": self.peak,
+                "exhausted": self.exhausted,
+                "timeouts": self.timeouts,
+            }
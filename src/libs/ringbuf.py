@@ -0,0 +1,308 @@
+import utime
+import _thread
+from .threading import Condition
+
+
+class _Slicer(object):
+
+    def __getitem__(self, index):
+        return index
+
+
+# 预先构造的整段切片 [:], 整块写入时以它赋值, 不再每次新建 slice 对象
+_WHOLE = _Slicer()[:]
+_SEQ_MASK = 0x3FFFFFFF  # 读序号回绕范围, 保持为小整数
+
+
+class RingBuffer(object):
+    """定长字节环形缓冲区，预分配 bytearray，线程安全，写满时按溢出策略处理
+
+    指定 chunk 时容量向上取整为 chunk 的整数倍, 读位置保持按块对齐: peek 直接返回预先切好的整块视图,
+    consume 后再移动读位置, 读取方无需拷贝也不新建切片; 每次写入整块时也不会跨越缓冲区末尾。
+    缓存状态由原生 _thread 锁保护, 稳态读写不经 threading.Lock(其 acquire 记录线程 id, 可能分配);
+    只有需要阻塞等待时才经 Condition, 状态变化时有等待者才去通知。
+    """
+
+    DROP_OLDEST = "drop_oldest"  # 覆盖最旧数据
+    DROP_NEWEST = "drop_newest"  # 丢弃写不下的新数据
+    BLOCK = "block"  # 阻塞写入方直到有空间
+
+    def __init__(self, size, policy=DROP_OLDEST, chunk=0):
+        if policy not in (self.DROP_OLDEST, self.DROP_NEWEST, self.BLOCK):
+            raise ValueError("unknown overflow policy \"{}\"".format(policy))
+        self.__request = size  # 构造时要求的容量, 更换块大小时据此重新取整
+        if chunk:
+            size = (size + chunk - 1) // chunk * chunk
+        self.__size = size
+        self.__buf = bytearray(size)
+        self.__mv = memoryview(self.__buf)
+        self.__chunk = chunk
+        self.__views = [self.__mv[i:i + chunk] for i in range(0, size, chunk)] if chunk else None
+        self.__scratch = memoryview(bytearray(chunk)) if chunk else None
+        self.__head = 0  # 读位置
+        self.__count = 0  # 已缓存字节数
+        self.__seq = 0  # 读序号: 累计从读端移出(读取、consume、溢出丢弃、清空)的字节数
+        self.__peek_seq = 0  # 最近一次 peek 时的读序号
+        self.__closed = False
+        self.__lock = _thread.allocate_lock()
+        self.__cond = Condition()  # 缓存状态变化
+        self.__waiters = 0  # 阻塞等待中的读写方数
+        self.policy = policy
+        self.overruns = 0  # 发生溢出的次数
+        self.dropped_bytes = 0  # 因溢出丢弃的字节数
+        self.peak = 0  # 最高水位
+
+    def __len__(self):
+        with self.__lock:
+            return self.__count
+
+    @property
+    def size(self):
+        return self.__size
+
+    def free(self):
+        with self.__lock:
+            return self.__size - self.__count
+
+    def __copy_in(self, src, length):
+        tail = (self.__head + self.__count) % self.__size
+        chunk = self.__chunk
+        if length == chunk and len(src) == chunk and tail % chunk == 0:
+            # 按块对齐写入整块: 直接整段赋值给预先切好的块视图, 不新建切片
+            self.__views[tail // chunk][_WHOLE] = src
+            self.__count += length
+            return
+        first = min(length, self.__size - tail)
+        if first == length and len(src) == length:
+            self.__mv[tail:tail + length] = src
+        else:
+            src = memoryview(src)
+            self.__mv[tail:tail + first] = src[:first]
+            if first < length:
+                self.__mv[:length - first] = src[first:length]
+        self.__count += length
+
+    def __copy_out(self, dst, length):
+        first = min(length, self.__size - self.__head)
+        dst[:first] = self.__mv[self.__head:self.__head + first]
+        if first < length:
+            dst[first:length] = self.__mv[:length - first]
+        self.__drop(length)
+
+    def __drop(self, length):
+        self.__head = (self.__head + length) % self.__size
+        self.__count -= length
+        self.__seq = (self.__seq + length) & _SEQ_MASK
+        if not self.__count:
+            self.__head = 0
+
+    def __reset(self):
+        self.__seq = (self.__seq + self.__count) & _SEQ_MASK
+        self.__head = 0
+        self.__count = 0
+
+    def write(self, data, length=None, timeout=None):
+        """写入 data 前 length 字节，返回实际写入字节数"""
+        if length is None:
+            length = len(data)
+        src = data
+        self.__lock.acquire()
+        try:
+            if self.__closed:
+                return 0
+            if length > self.__size:
+                # 单次写入超过总容量，仅保留最新的 size 字节
+                self.overruns += 1
+                self.dropped_bytes += length - self.__size
+                src = memoryview(data)[length - self.__size:length]
+                length = self.__size
+            free = self.__size - self.__count
+            if length > free:
+                if self.policy == self.BLOCK:
+                    self.__lock.release()
+                    # timeout 不大于 0 时不等待; 返回时重新持有 __lock
+                    if not self.__wait(0, length, timeout) or self.__closed:
+                        self.overruns += 1
+                        self.dropped_bytes += length
+                        return 0
+                elif self.policy == self.DROP_NEWEST:
+                    self.overruns += 1
+                    self.dropped_bytes += length - free
+                    length = free
+                else:
+                    drop = length - free
+                    if self.__chunk:
+                        # 按整块丢弃, 保持读位置对齐
+                        drop = min(self.__count, drop + (-(self.__head + drop)) % self.__chunk)
+                    self.overruns += 1
+                    self.dropped_bytes += drop
+                    self.__drop(drop)
+            if length:
+                self.__copy_in(src, length)
+                if self.__count > self.peak:
+                    self.peak = self.__count
+        finally:
+            self.__lock.release()
+        if length:
+            self.__notify()
+        return length
+
+    def readinto(self, buf, min_size=1, timeout=None):
+        """读取至多 len(buf) 字节到 buf，等待缓存达到 min_size 或超时，返回读取字节数; timeout 不大于 0 时不等待"""
+        self.__wait(min_size, 0, timeout)
+        try:
+            length = min(len(buf), self.__count)
+            if length:
+                self.__copy_out(buf, length)
+        finally:
+            self.__lock.release()
+        if length:
+            self.__notify()
+        return length
+
+    def peek(self):
+        """下一整块 chunk 数据的视图, 不移动读位置, 不足一块返回 None; 视图在 consume 前有效
+
+        DROP_OLDEST 策略下若 peek 与 consume 之间发生溢出, 该块可能被新数据覆盖。
+        """
+        chunk = self.__chunk
+        if not chunk:
+            raise ValueError("peek requires a chunk size")
+        with self.__lock:
+            if self.__count < chunk:
+                return None
+            self.__peek_seq = self.__seq
+            head = self.__head
+            if head % chunk == 0:
+                return self.__views[head // chunk]
+            # 读位置未对齐(此前按非整块 readinto 过), 拷贝到临时缓冲
+            first = min(chunk, self.__size - head)
+            self.__scratch[:first] = self.__mv[head:head + first]
+            if first < chunk:
+                self.__scratch[first:chunk] = self.__mv[:chunk - first]
+            return self.__scratch
+
+    def consume(self, length):
+        """丢弃已 peek 处理完的 length 字节, 返回实际丢弃字节数
+
+        peek 之后已被溢出丢弃或清空的部分不再计入, 否则会把其后尚未处理的新数据一并丢掉。
+        """
+        with self.__lock:
+            length -= (self.__seq - self.__peek_seq) & _SEQ_MASK
+            length = min(length, self.__count)
+            if length > 0:
+                self.__drop(length)
+            else:
+                length = 0
+            self.__peek_seq = self.__seq
+        if length:
+            self.__notify()
+        return length
+
+    def set_chunk(self, chunk):
+        """更换块大小并清空缓存; 容量按新块大小重新取整, 超出已分配的缓冲时才重新分配"""
+        with self.__lock:
+            if chunk != self.__chunk:
+                size = (self.__request + chunk - 1) // chunk * chunk
+                if size > len(self.__buf):
+                    self.__buf = bytearray(size)
+                    self.__mv = memoryview(self.__buf)
+                self.__size = size
+                self.__chunk = chunk
+                self.__views = [self.__mv[i:i + chunk] for i in range(0, size, chunk)]
+                self.__scratch = memoryview(bytearray(chunk))
+            self.__reset()
+        self.__notify()
+
+    @property
+    def chunk(self):
+        return self.__chunk
+
+    def wait_count(self, min_size, timeout=None):
+        """等待缓存达到 min_size 字节、关闭或超时, 返回当前缓存字节数"""
+        self.__wait(min_size, 0, timeout)
+        count = self.__count
+        self.__lock.release()
+        return count
+
+    def wait_free(self, min_free, timeout=None):
+        """等待空闲空间达到 min_free 字节、关闭或超时, 返回当前空闲字节数"""
+        self.__wait(0, min_free, timeout)
+        free = self.__size - self.__count
+        self.__lock.release()
+        return free
+
+    def __ready(self, count, free):
+        return self.__count >= count and self.__size - self.__count >= free
+
+    def __wait(self, count, free, timeout):
+        """等待缓存不少于 count 字节且空闲不少于 free 字节, 或关闭, 返回时持有 __lock; timeout 不大于 0 时不等待, 超时返回 False
+
+        条件以参数而非 lambda 传入: 调用方的变量一旦被闭包引用, 每次调用都要为其分配 cell, 即使不需要等待。
+        """
+        lock = self.__lock
+        lock.acquire()
+        if self.__closed or self.__ready(count, free):
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        lock.release()
+        start = utime.ticks_ms()
+        with self.__cond:
+            # 在 __lock 下登记等待并复查, 状态变化方释放 __lock 后看到等待者再经 __cond 通知, 不会漏掉
+            lock.acquire()
+            self.__waiters += 1
+            try:
+                while not (self.__closed or self.__ready(count, free)):
+                    lock.release()
+                    if timeout is None:
+                        self.__cond.wait()
+                    else:
+                        remaining = timeout * 1000 - utime.ticks_diff(utime.ticks_ms(), start)
+                        if remaining <= 0:
+                            lock.acquire()
+                            return False
+                        self.__cond.wait(remaining / 1000)
+                    lock.acquire()
+                return True
+            finally:
+                self.__waiters -= 1
+
+    def __notify(self):
+        """缓存状态已变化, 调用方不持有 __lock; 没有等待者时不经 Condition"""
+        if self.__waiters:
+            with self.__cond:
+                self.__cond.notify_all()
+
+    def clear(self):
+        with self.__lock:
+            self.__reset()
+        self.__notify()
+
+    def open(self):
+        with self.__lock:
+            self.__reset()
+            self.__closed = False
+
+    def close(self):
+        """关闭后写入直接返回 0，读取方取完剩余数据后返回 0"""
+        with self.__lock:
+            self.__closed = True
+        self.__notify()
+
+    def reset_stats(self):
+        with self.__lock:
+            self.overruns = 0
+            self.dropped_bytes = 0
+            self.peak = self.__count
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "size": self.__size,
+                "count": self.__count,
+                "peak": self.peak,
+                "overruns": self.overruns,
+                "dropped_bytes": self.dropped_bytes,
+                "policy": self.policy,
+            }
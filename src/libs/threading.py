@@ -14,7 +14,7 @@ class Lock(object):
         self.acquire()
         return self
 
-    def __exit__(self, *args, **kwargs):
+    def __exit__(self, exc_type, exc_value, traceback):
         self.release()
 
     def acquire(self):
@@ -101,7 +101,7 @@ class Condition(object):
         self.acquire()
         return self
 
-    def __exit__(self, *args, **kwargs):
+    def __exit__(self, exc_type, exc_value, traceback):
         self.release()
 
     def __is_owned(self):
@@ -146,13 +146,10 @@ class Condition(object):
             raise RuntimeError("cannot wait on un-acquired lock.")
         if n < 0:
             raise ValueError("invalid param, n should be >= 0.")
-        waiters_to_notify = self.__waiters[:n]
-        for waiter in waiters_to_notify:
-            waiter.release()
-            try:
-                self.__waiters.remove(waiter)
-            except ValueError:
-                pass
+        # 无等待者时直接返回, 不复制等待列表
+        while n and self.__waiters:
+            self.__waiters.pop(0).release()
+            n -= 1
 
     def notify_all(self):
         self.notify(n=len(self.__waiters))
@@ -234,7 +231,7 @@ class Semaphore(object):
         self.acquire()
         return self
 
-    def __exit__(self, *args, **kwargs):
+    def __exit__(self, exc_type, exc_value, traceback):
         self.release()
 
     def counts(self):
@@ -0,0 +1,136 @@
+import utime
+from .threading import Lock
+
+
+# 一轮对话的里程碑, 按发生顺序排列
+WAKE = 0  # 按键或唤醒词唤醒
+TOKEN = 1  # 取得 realtime token
+CONNECTED = 2  # websocket 连接建立
+SESSION = 3  # 收到 session.created
+UPLINK = 4  # 发出第一帧上行音频
+SPEECH_STARTED = 5  # 检测到开始说话
+SPEECH_STOPPED = 6  # 检测到说话结束
+RESPONSE = 7  # 收到 response.created
+FIRST_DELTA = 8  # 收到第一个 response.audio.delta
+FIRST_WRITE = 9  # 第一块回复音频写入 PCM
+
+MILESTONES = ("wake", "token", "conn", "sess", "up", "ss", "se", "resp", "delta", "pcm")
+
+# 汇总统计的区间: (名称, 起点, 终点)
+INTERVALS = (
+    ("connect", WAKE, SESSION),
+    ("first_uplink", SESSION, UPLINK),
+    ("server", SPEECH_STOPPED, RESPONSE),
+    ("first_audio", RESPONSE, FIRST_DELTA),
+    ("playout", FIRST_DELTA, FIRST_WRITE),
+    ("reply", SPEECH_STOPPED, FIRST_WRITE),
+    ("wake_to_reply", WAKE, FIRST_WRITE),
+)
+
+
+def percentile(values, p):
+    """已排序列表的最近秩百分位"""
+    if not values:
+        return -1
+    i = (len(values) * p + 99) // 100 - 1
+    return values[max(0, min(i, len(values) - 1))]
+
+
+class TurnTimeline(object):
+    """对话轮次延迟时间线
+
+    每轮记录各里程碑首次发生的 ticks_ms, 同一里程碑重复 mark 只保留第一次; 一轮结束时换算为相对本轮
+    起点(begin 时刻)的毫秒偏移, 写入最近 history 轮的环形历史并输出一行日志。
+    """
+
+    def __init__(self, history=32, log=None):
+        self.__marks = [0] * len(MILESTONES)
+        self.__seen = [False] * len(MILESTONES)
+        self.__source = None  # 本轮起因: key / kws / boot / speech, None 为未开始
+        self.__origin = 0  # 本轮起点 ticks_ms
+        self.__rows = [[-1] * len(MILESTONES) for _ in range(history)]
+        self.__sources = [None] * history
+        self.__next = 0
+        self.__count = 0
+        self.__lock = Lock()
+        self.__log = log
+        self.turns = 0
+
+    def begin(self, source):
+        """结束当前轮并以 source 开始新一轮"""
+        with self.__lock:
+            self.__end()
+            self.__source = source
+            self.__origin = utime.ticks_ms()
+            for i in range(len(self.__seen)):
+                self.__seen[i] = False
+
+    def mark(self, milestone):
+        """记录里程碑, 本轮已记录过或尚未开始时忽略"""
+        if self.__seen[milestone] or self.__source is None:
+            return
+        self.__marks[milestone] = utime.ticks_ms()
+        self.__seen[milestone] = True
+
+    def started(self):
+        return self.__source is not None
+
+    def has(self, milestone):
+        return self.__source is not None and self.__seen[milestone]
+
+    def end(self):
+        with self.__lock:
+            self.__end()
+
+    def __end(self):
+        source = self.__source
+        if source is None:
+            return
+        index = self.__next
+        row = self.__rows[index]
+        self.__source = None
+        if True not in self.__seen:
+            return
+        for i in range(len(row)):
+            row[i] = utime.ticks_diff(self.__marks[i], self.__origin) if self.__seen[i] else -1
+        self.__sources[index] = source
+        self.__next = (self.__next + 1) % len(self.__rows)
+        self.__count = min(self.__count + 1, len(self.__rows))
+        self.turns += 1
+        if self.__log is not None:
+            self.__log(self.format(row, source, self.turns))
+
+    @staticmethod
+    def format(row, source, turn=0):
+        """单行紧凑格式, 如 turn 3 key wake=0 token=85 ... pcm=2310 reply=640; 未发生的里程碑省略"""
+        parts = ["turn {} {}".format(turn, source)]
+        for i in range(len(row)):
+            if row[i] >= 0:
+                parts.append("{}={}".format(MILESTONES[i], row[i]))
+        if row[SPEECH_STOPPED] >= 0 and row[FIRST_WRITE] >= row[SPEECH_STOPPED]:
+            parts.append("reply={}".format(row[FIRST_WRITE] - row[SPEECH_STOPPED]))
+        return " ".join(parts)
+
+    def history(self):
+        """最近各轮的 (source, offsets), 由旧到新"""
+        with self.__lock:
+            start = self.__next - self.__count
+            return [
+                (self.__sources[i], list(self.__rows[i]))
+                for i in [(start + k) % len(self.__rows) for k in range(self.__count)]
+            ]
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """各区间耗时(ms)的样本数、百分位与最大值, 只统计两端都发生且有序的轮次"""
+        rows = self.history()
+        result = {}
+        for name, start, end in INTERVALS:
+            values = sorted(
+                row[end] - row[start] for _, row in rows
+                if row[start] >= 0 and row[end] >= row[start]
+            )
+            stat = {"n": len(values), "max": values[-1] if values else -1}
+            for p in percentiles:
+                stat["p{}".format(p)] = percentile(values, p)
+            result[name] = stat
+        return result
@@ -0,0 +1,155 @@
+from .alaw import mean_magnitude
+from .ringbuf import RingBuffer
+
+
+class EnergyVAD(object):
+    """基于 A-law 帧平均幅度的端侧语音活动检测
+
+    幅度超过 threshold 判为语音; 语音结束后继续保持 hangover_ms 判为语音, 避免吞掉句尾和词间停顿。
+    """
+
+    def __init__(self, threshold=300, hangover_ms=800, stride=2):
+        self.threshold = threshold
+        self.hangover_ms = hangover_ms
+        self.stride = stride
+        self.level = 0  # 最近一帧的平均幅度
+        self.__hang_left = 0
+        self.active = False
+
+    def reset(self):
+        self.level = 0
+        self.__hang_left = 0
+        self.active = False
+
+    def update(self, buf, length, duration_ms):
+        """输入一帧, 返回该帧是否按语音处理"""
+        self.level = mean_magnitude(buf, length, self.stride)
+        if self.level >= self.threshold:
+            self.__hang_left = self.hangover_ms
+            self.active = True
+        elif self.__hang_left > 0:
+            self.__hang_left -= duration_ms
+            self.active = True
+        else:
+            self.active = False
+        return self.active
+
+
+class UplinkGate(object):
+    """上行静音门限
+
+    静音帧不上传; 语音起始时先补发缓存的 padding 前导音频(按 chunk_size 向上取整); 静音期间每
+    keepalive_ms 放行一帧, 保证服务端 VAD 仍能收到静音并判断说话结束。
+    """
+
+    def __init__(self, vad, chunk_size, padding_bytes=0, keepalive_ms=1000, bytes_per_ms=8):
+        self.vad = vad
+        self.keepalive_ms = keepalive_ms
+        self.bytes_per_ms = bytes_per_ms
+        self.padding = RingBuffer(padding_bytes, policy=RingBuffer.DROP_OLDEST, chunk=chunk_size) if padding_bytes else None
+        self.__pad_buf = bytearray(chunk_size)
+        self.__silent_ms = 0
+        self.reset()
+
+    def set_chunk(self, chunk_size):
+        """更换上行块大小, 清空 padding 缓存"""
+        if self.padding is not None:
+            self.padding.set_chunk(chunk_size)
+        if chunk_size > len(self.__pad_buf):
+            self.__pad_buf = bytearray(chunk_size)
+
+    def reset(self):
+        self.vad.reset()
+        if self.padding is not None:
+            self.padding.clear()
+        self.__silent_ms = 0
+        self.sent_bytes = 0
+        self.withheld_bytes = 0
+        self.padding_sent_bytes = 0
+        self.keepalives = 0
+
+    def process(self, buf, length, send):
+        """按 VAD 结果决定是否调用 send(buf, length) 上传该帧"""
+        duration = length // self.bytes_per_ms
+        if self.vad.update(buf, length, duration):
+            self.__silent_ms = 0
+            if self.padding is not None:
+                while len(self.padding):
+                    pad = self.padding.peek()
+                    if pad is None:
+                        # 不足一块的尾部
+                        n = self.padding.readinto(self.__pad_buf)
+                        send(self.__pad_buf, n)
+                    else:
+                        n = len(pad)
+                        send(pad, n)
+                        self.padding.consume(n)
+                    self.padding_sent_bytes += n
+                    self.sent_bytes += n
+            send(buf, length)
+            self.sent_bytes += length
+            return True
+        self.__silent_ms += duration
+        if self.__silent_ms >= self.keepalive_ms:
+            self.__silent_ms = 0
+            self.keepalives += 1
+            send(buf, length)
+            self.sent_bytes += length
+            return True
+        self.withheld_bytes += length
+        if self.padding is not None:
+            self.padding.write(buf, length)
+        return False
+
+    def stats(self):
+        return {
+            "sent_bytes": self.sent_bytes,
+            "saved_bytes": self.withheld_bytes - self.padding_sent_bytes,
+            "padding_sent_bytes": self.padding_sent_bytes,
+            "keepalives": self.keepalives,
+            "threshold": self.vad.threshold,
+        }
+
+
+class TurnDetector(object):
+    """端侧轮次检测: 根据逐帧 VAD 结果判断说话开始与结束
+
+    有声帧累计不足 min_speech_ms 即转为静音视为噪声, 不算一轮; 静音判定由 VAD 的 hangover 决定。
+    """
+
+    SPEECH_STARTED = 1
+    SPEECH_STOPPED = 2
+
+    def __init__(self, min_speech_ms=200):
+        self.min_speech_ms = min_speech_ms
+        self.__speaking = False
+        self.__speech_ms = 0
+        self.turns = 0
+        self.discarded = 0  # 过短被忽略的语音段数
+
+    def reset(self):
+        self.__speaking = False
+        self.__speech_ms = 0
+
+    def feed(self, vad, duration_ms):
+        """输入已 update 过当前帧的 vad, 返回 SPEECH_STARTED / SPEECH_STOPPED / None"""
+        if vad.active:
+            if vad.level >= vad.threshold:
+                # hangover 期间不计入语音时长
+                self.__speech_ms += duration_ms
+            if not self.__speaking and self.__speech_ms >= self.min_speech_ms:
+                self.__speaking = True
+                return self.SPEECH_STARTED
+            return None
+        speaking = self.__speaking
+        self.__speaking = False
+        if self.__speech_ms:
+            self.__speech_ms = 0
+            if speaking:
+                self.turns += 1
+                return self.SPEECH_STOPPED
+            self.discarded += 1
+        return None
+
+    def stats(self):
+        return {"turns": self.turns, "discarded": self.discarded}
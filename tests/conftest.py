@@ -0,0 +1,50 @@
+"""主机侧测试: 在 simulator 仿真运行时中以 usr 包名导入 src/ 下的代码
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator  # noqa: E402
+
+simulator.install()
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture(scope="session")
+def app():
+    """以默认配置连接本地 mock 服务端的完整应用, 整个测试进程只启动一次; 返回 (app, server)"""
+    from simulator.server import MockRealtimeServer
+    server = MockRealtimeServer()
+    simulator.configure(AIGC_API_URL=server.start())
+    from usr._main import create_application
+    application = create_application()
+    application.run()
+    yield application, server
+    application.ai_manager.stop_chat()
+    application.ai_manager.stop_standby()
+    application.ai_manager.protocol.disconnect()
+    server.stop()
+
+
+@pytest.fixture
+def chat(app):
+    """app 中有一段进行中且已连接的对话, 前面的测试结束了对话时按唤醒键重新开始; 返回 (app, server)"""
+    application, server = app
+    ai = application.ai_manager
+    if ai.chat_thread is None or not ai.chat_thread.is_running():
+        simulator.press()
+    assert wait_until(lambda: ai.chat_thread.is_running() and ai.protocol.is_connected() and server.connections > 0)
+    return application, server
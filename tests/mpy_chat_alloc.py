@@ -0,0 +1,255 @@
+"""chat 循环稳态迭代分配检查, 由 test_chat_alloc.py 在子进程中运行(也可直接运行)
+
+    micropython tests/mpy_chat_alloc.py [iterations] [default]
+
+构造真实的 AIManager 与 realtime 连接(websocket 为空实现), 每次迭代调用 AIManager.capture_step 读入
+一块音频写入采集环形缓冲, 再调用 AIManager.uplink_step, 并按写线程的方式取出并发送该帧; 语音与静音块交替,
+覆盖门限放行、静音缓存、padding 补发与保活各分支。采集按固件支持 read_v3 处理, 与启动时检测的结果相同;
+默认开启 UPLINK_FRAME_BUILDER 检查零分配, 传入 default 时保持默认配置, 统计逐帧 ujson.dumps 的分配量。
+_thread 换成单线程替身, 写线程由本脚本在同一线程内驱动(含生产者等待帧槽时), 结果不受线程调度影响。
+预热一个周期后统计 iterations 次迭代:
+MicroPython 下关闭 GC 后取 gc.mem_alloc() 差值, 输出 "alloc <字节数>" 与统计区间内发出的帧数 "frames <帧数>";
+CPython 下小整数以外的 int 同样会分配, 只做泄漏检查, 输出源自 src/ 且存活数随迭代增长的位置数 "retained <个数>"。
+"""
+import sys
+import gc
+
+try:
+    ROOT
+except NameError:
+    ROOT = __file__.rsplit("/", 2)[0] if "/" in __file__ else ".."
+try:
+    ARGV
+except NameError:
+    ARGV = sys.argv[1:]
+sys.path.append(ROOT + "/tools")
+
+import hoststub  # noqa: E402
+
+SPEECH_CHUNKS = 20  # 语音 / 静音各持续的块数
+
+
+class _Lock(object):
+    """单线程 _thread 锁: 已持有时不能再阻塞获取"""
+
+    def __init__(self):
+        self.__held = False
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.__held:
+            if blocking and timeout < 0:
+                raise RuntimeError("deadlock on single-threaded lock")
+            return False
+        self.__held = True
+        return True
+
+    def release(self):
+        self.__held = False
+
+    def locked(self):
+        return self.__held
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _start_new_thread(target, args):
+    # 线程不运行; 接收线程与写线程由脚本代为驱动
+    return 1
+
+
+class _NullClient(object):
+    """websocket 空实现: send 直接丢弃"""
+
+    def send(self, data):
+        pass
+
+    def recv(self, size):
+        return None
+
+    def close(self):
+        pass
+
+
+class _Client(object):
+
+    @staticmethod
+    def connect(url, headers=None, debug=False):
+        return _NullClient()
+
+
+class _ExtInt(object):
+    GPIO41 = 41
+    IRQ_FALLING = 1
+    PULL_PU = 1
+
+    def __init__(self, *args):
+        pass
+
+    def enable(self):
+        pass
+
+
+class _IdleAudio(object):
+    """没有下行播放的 AudioManager"""
+
+    def playback_headroom_ms(self):
+        return -1
+
+
+class _Capture(object):
+    """采集替身: g711_readinto 把 frame 写入调用方缓冲; 缓冲内容与 frame 相同时不再拷贝"""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.frame = None
+        self.__last = None
+
+    def g711_readinto(self, buf):
+        frame = self.frame
+        if frame is not self.__last:
+            for i in range(len(buf)):
+                buf[i] = frame[i]
+            self.__last = frame
+        return len(buf)
+
+
+def _install_host_modules():
+    """AIManager 导入所需的设备模块替身"""
+    hoststub.install(ROOT)
+    hoststub.module("_thread", allocate_lock=_Lock, get_ident=lambda: 1, start_new_thread=_start_new_thread,
+                    stack_size=lambda size=0: 0, threadIsRunning=lambda ident: False)
+    hoststub.ensure("usocket", "socket")
+    hoststub.module("uwebsocket", Client=_Client)
+    hoststub.module("net", csqQueryPoll=lambda: 31)
+    hoststub.module("pm")
+    hoststub.module("machine", ExtInt=_ExtInt)
+
+
+def _private(obj, cls, name):
+    # MicroPython 不改写双下划线属性名
+    if sys.implementation.name == "micropython":
+        return getattr(obj, name)
+    return getattr(obj, "_{}{}".format(cls, name))
+
+
+def _frames(chunk):
+    from usr.libs.alaw import MAGNITUDE
+    loud = 0
+    for a in range(256):
+        if MAGNITUDE[a] > MAGNITUDE[loud]:
+            loud = a
+    quiet = 0
+    for a in range(256):
+        if MAGNITUDE[a] < MAGNITUDE[quiet]:
+            quiet = a
+    return bytes([loud]) * chunk, bytes([quiet]) * chunk
+
+
+def _writer(scheduler):
+    """与 OutboundScheduler 写线程一次循环相同的取出、发送与记录"""
+    import utime
+    next_event = _private(scheduler, "OutboundScheduler", "__next")
+    send = _private(scheduler, "OutboundScheduler", "__send")
+    lock = _private(scheduler, "OutboundScheduler", "__lock")
+
+    def drain():
+        while True:
+            lane = next_event()
+            if lane is None:
+                return
+            payload = _private(scheduler, "OutboundScheduler", "__payload")
+            ticks = _private(scheduler, "OutboundScheduler", "__ticks")
+            start = utime.ticks_ms()
+            send(payload)
+            end = utime.ticks_ms()
+            with lock:
+                lane.record(utime.ticks_diff(end, ticks), utime.ticks_diff(end, start), True)
+    return drain
+
+
+def _yield_to_writer(drain):
+    """生产者等待帧槽时的 utime.sleep_ms 改为运行一轮写线程, 与设备上写线程在此期间发送的效果相同"""
+    import utime
+    from usr.components import protocol
+    protocol.utime = hoststub.Stub("utime", sleep_ms=lambda ms: drain(), ticks_ms=utime.ticks_ms,
+                                   ticks_us=utime.ticks_us, ticks_diff=utime.ticks_diff, mktime=utime.mktime,
+                                   localtime=utime.localtime)
+
+
+def _run(capture, capture_step, step, frames, drain, iterations, start=0):
+    buf = capture.buf
+    for i in range(start, start + iterations):
+        capture.frame = frames[(i // SPEECH_CHUNKS) & 1]
+        capture_step(capture, buf)
+        step()
+        drain()
+
+
+def main():
+    iterations = int(ARGV[0]) if ARGV else 1000
+    default = len(ARGV) > 1 and ARGV[1] == "default"
+    if sys.implementation.name == "micropython":
+        # 全程不回收, 1MB 堆足够; WASI 版 MicroPython 的 GC 在深层调用中回收会破坏存活对象
+        gc.disable()
+    _install_host_modules()
+    from usr.configure import settings
+    if not default:
+        settings.UPLINK_FRAME_BUILDER = True
+    from usr.components.ai_manager import AIManager
+    from usr.components.protocol import TokenCache
+
+    ai = AIManager()
+    # HeapMonitor 照常采样但不主动回收, 否则 mem_alloc 差值不再是分配量
+    ai.heap.collect_bytes = 1 << 30
+    ai.protocol.token_cache = TokenCache(
+        fetch=lambda: {"url": "ws://127.0.0.1", "path": "/null", "ephemeralToken": "null", "expireAt": 4102444800}
+    )
+    ai.protocol.connect()
+    ai.bind_uplink(_IdleAudio())
+    scheduler = _private(ai.protocol, "OpenAIRealTimeConnection", "__scheduler")
+    drain = _writer(scheduler)
+    _yield_to_writer(drain)
+    frames = _frames(ai.uplink_chunk)
+    capture = _Capture(ai.capture_view)
+    # 在统计区间外取绑定方法
+    capture_step = ai.capture_step
+    step = ai.uplink_step
+    # 预热一个完整的语音/静音周期, 完成各处的首次缓存
+    _run(capture, capture_step, step, frames, drain, SPEECH_CHUNKS * 2)
+
+    if sys.implementation.name == "micropython":
+        sent = scheduler.stats()["audio"]["sent"]
+        before = gc.mem_alloc()
+        _run(capture, capture_step, step, frames, drain, iterations, SPEECH_CHUNKS * 2)
+        used = gc.mem_alloc() - before
+        print("alloc {}".format(used))
+        print("frames {}".format(scheduler.stats()["audio"]["sent"] - sent))
+    else:
+        import tracemalloc
+        src = ROOT + "/src/"
+        tracemalloc.start()
+        # 先跑一轮让计数类属性越过小整数缓存, 再比较第二轮前后的存活对象; 同一行保存到属性上的 int
+        # 新值替换旧值, 至多存活一个, 因此只有存活数增加超过 1 的位置才算增长
+        _run(capture, capture_step, step, frames, drain, iterations, SPEECH_CHUNKS * 2)
+        before = tracemalloc.take_snapshot()
+        _run(capture, capture_step, step, frames, drain, iterations, SPEECH_CHUNKS * 2 + iterations)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        retained = [
+            s for s in after.compare_to(before, "lineno")
+            if s.count_diff > 1 and s.traceback[0].filename.startswith(src)
+        ]
+        for s in retained:
+            print("  {}".format(s))
+        print("retained {}".format(len(retained)))
+    print("iterations {}".format(iterations))
+    print("uplink {}".format(ai.uplink_gate.stats() if ai.uplink_gate is not None else {}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import ubinascii
+
+from usr.libs import b64
+
+
+def _encode(data, offset=0):
+    dst = bytearray(offset + b64.encoded_length(len(data)))
+    end = b64.encode_into(data, len(data), dst, offset)
+    assert end == len(dst)
+    return bytes(dst[offset:])
+
+
+def test_encode_matches_ubinascii():
+    # 覆盖不补齐、补一个与补两个 "=" 的长度
+    for n in range(0, 64):
+        data = bytes((i * 37 + n) & 0xFF for i in range(n))
+        assert _encode(data) == ubinascii.b2a_base64(data)[:-1], n
+        assert _encode(data, offset=5) == ubinascii.b2a_base64(data)[:-1], n
+
+
+def test_encode_prefix_of_longer_buffer():
+    data = bytes(range(256))
+    for length in (1, 2, 3, 100, 255):
+        assert _encode(memoryview(data)[:length]) == ubinascii.b2a_base64(data[:length])[:-1]
+        dst = bytearray(b64.encoded_length(length))
+        b64.encode_into(data, length, dst)
+        assert bytes(dst) == ubinascii.b2a_base64(data[:length])[:-1]
+
+
+def test_decode_round_trip_str_and_bytes():
+    for n in range(0, 64):
+        data = bytes((i * 91 + 7) & 0xFF for i in range(n))
+        text = ubinascii.b2a_base64(data)[:-1]
+        for src in (text, text.decode()):
+            dst = bytearray(3 + b64.decoded_length(len(src)))
+            end = b64.decode_into(src, 0, len(src), dst, 3)
+            assert bytes(dst[3:end]) == data, n
+
+
+def test_decode_span_inside_json():
+    data = bytes(range(50))
+    text = '{"delta":"' + ubinascii.b2a_base64(data)[:-1].decode() + '"}'
+    start = text.index(":") + 2
+    end = text.rindex('"')
+    dst = bytearray(b64.decoded_length(end - start))
+    assert bytes(dst[:b64.decode_into(text, start, end, dst)]) == data
@@ -0,0 +1,72 @@
+"""chat 循环稳态迭代分配检查: 在子进程中运行 mpy_chat_alloc.py
+
+MicroPython 下开启 UPLINK_FRAME_BUILDER 时要求 1000 次迭代零分配; 默认配置仍逐帧 ujson.dumps, 按上传的帧
+统计分配量, 不得超过记录值; 采集都按固件支持 read_v3 处理。优先用 PATH 中的 unix micropython, 否则用
+micropython-wasm(WASI 版 MicroPython, pip install micropython-wasm), 都没有时跳过。这是主机上的 MicroPython
+解释器, 模组上的分配与帧率未在此覆盖。CPython 下只做泄漏检查。
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+GUEST = os.path.join(HERE, "mpy_chat_alloc.py")
+
+# 仓库根目录只读挂载为 /input, 脚本参数以 ARGV 传入; 解释器退出时 wasmtime 可能异常终止, 输出后直接退出
+_WASM_RUNNER = """
+import os, sys, micropython_wasm
+code = 'ROOT = "/input"\\nARGV = {!r}\\n'.format(sys.argv[3:]) + open(sys.argv[1]).read()
+result = micropython_wasm.run(code, fuel=20000000000, wall_timeout_seconds=None, readonly_dir=sys.argv[2])
+sys.stdout.write(result.stdout)
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+# 默认配置下每个上传的 640 字节(80ms)帧的分配量: micropython-wasm 实测 1904 字节, 留约 5% 余量
+DEFAULT_FRAME_ALLOC = 2000
+
+
+def _value(output, key):
+    for line in output.splitlines():
+        if line.startswith(key + " "):
+            return int(line.split()[1])
+    raise AssertionError("no \"{}\" in output:\n{}".format(key, output))
+
+
+def _run(cmd):
+    proc = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                          timeout=180)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    return proc.stdout
+
+
+def _run_micropython(*args):
+    binary = shutil.which("micropython")
+    if binary is not None:
+        return _run([binary, GUEST] + list(args))
+    pytest.importorskip("micropython_wasm")
+    return _run([sys.executable, "-c", _WASM_RUNNER, GUEST, ROOT] + list(args))
+
+
+def test_chat_loop_zero_alloc_micropython():
+    output = _run_micropython()
+    assert _value(output, "iterations") == 1000
+    assert _value(output, "alloc") == 0, output
+
+
+def test_chat_loop_default_config_alloc_micropython():
+    # GC 关闭, 迭代数受 1MB 堆限制
+    output = _run_micropython("200", "default")
+    frames = _value(output, "frames")
+    assert frames > 0
+    assert _value(output, "alloc") // frames <= DEFAULT_FRAME_ALLOC, output
+
+
+def test_chat_loop_retains_nothing():
+    output = _run([sys.executable, GUEST])
+    assert _value(output, "retained") == 0, output
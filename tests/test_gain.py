@@ -0,0 +1,41 @@
+from usr.libs.gain import GainStage
+
+
+def test_set_gain_rounds_to_nearest_step():
+    stage = GainStage(step_db=3, min_db=-12, max_db=18)
+    for db, expected in ((4, 3), (-4, -3), (5, 6), (-5, -6), (-1, 0), (-2, -3), (-6, -6)):
+        stage.set_gain(db)
+        assert stage.gain_db == expected, db
+
+
+def test_set_gain_symmetric_for_negative_db():
+    stage = GainStage(step_db=2, min_db=-12, max_db=12)
+    for db in range(1, 13):
+        stage.set_gain(db)
+        up = stage.gain_db
+        stage.set_gain(-db)
+        assert stage.gain_db == -up, db
+
+
+def test_set_gain_clamps_negative_range():
+    stage = GainStage(step_db=2, min_db=-12, max_db=18)
+    stage.set_gain(-40)
+    assert stage.gain_db == -12
+    stage.set_gain(40)
+    assert stage.gain_db == 18
+
+
+def test_set_gain_builds_table_before_process():
+    stage = GainStage(step_db=2, min_db=-12, max_db=18)
+    stage.set_gain(6)
+    table = stage._GainStage__tables[3 - stage.min_step]
+    assert table is not None
+    buf = bytearray(range(256))
+    stage.process(buf, len(buf))
+    assert bytes(buf) == table
+
+
+def test_agc_builds_every_table_up_front():
+    stage = GainStage(step_db=2, min_db=-12, max_db=18, agc=True)
+    tables = stage._GainStage__tables
+    assert all(t is not None for i, t in enumerate(tables) if i + stage.min_step)
@@ -0,0 +1,158 @@
+import base64
+import random
+import threading
+import time
+
+from usr.components.audio_manager import JitterBuffer, G711_BYTES_PER_MS
+from usr.configure import settings
+
+
+def _audio(ms):
+    return bytes(ms * G711_BYTES_PER_MS)
+
+
+def _buffer():
+    # 每块 100ms
+    return JitterBuffer(2000, block_size=100 * G711_BYTES_PER_MS, target_ms=200, min_ms=100, max_ms=400, step_ms=100,
+                        underrun_wait_ms=10)
+
+
+def test_flush_releases_queued_blocks():
+    jb = _buffer()
+    assert jb.put(_audio(300))
+    first = jb.next_item()
+    assert first is not None
+    jb.end_stream()
+    jb.flush()
+    assert jb.pool.in_use() == 1  # 已交给播放方, 由其归还
+    first.release()
+    assert jb.pool.in_use() == 0
+    assert not jb.pending() and not jb.draining
+    assert jb.stats()["depth_ms"] == 0 and jb.stats()["flushes"] == 1
+    # flush 后重新预缓冲
+    jb.put(_audio(100))
+    assert jb.next_item() is None
+
+
+def test_underrun_raises_target_and_rebuffers():
+    jb = _buffer()
+    jb.put(_audio(100))
+    assert jb.next_item() is None  # 未达到 200ms 目标深度
+    jb.put(_audio(100))
+    for _ in range(2):
+        item = jb.next_item()
+        assert item.length == 100 * G711_BYTES_PER_MS
+        item.release()
+    # 播放中读空且本段未结束: underrun, 目标深度上调一级
+    assert jb.next_item() is None
+    assert jb.underruns == 1 and jb.target_ms == 300 and not jb.playing
+    jb.put(_audio(200))
+    assert jb.next_item() is None  # 需按新的目标深度重新预缓冲
+    jb.put(_audio(100))
+    assert jb.next_item() is not None
+
+
+def test_clean_stream_lowers_target():
+    jb = _buffer()
+    jb.put(_audio(100))
+    jb.end_stream()
+    assert jb.next_item() is not None  # 本段已全部到达, 不必等满目标深度
+    assert jb.next_item() is None
+    assert jb.underruns == 0 and jb.target_ms == 100 and not jb.draining
+
+
+def test_small_deltas_share_blocks_per_item():
+    jb = _buffer()
+    for _ in range(5):
+        jb.put(_audio(20), tag="item_1")
+    jb.put(_audio(20), tag="item_2")
+    assert jb.pool.in_use() == 2
+    jb.end_stream()
+    first, second = jb.next_item(), jb.next_item()
+    assert (first.tag, first.length) == ("item_1", 100 * G711_BYTES_PER_MS)
+    assert (second.tag, second.length) == ("item_2", 20 * G711_BYTES_PER_MS)
+
+
+def test_b64_deltas_decode_into_blocks():
+    jb = JitterBuffer(1000, block_size=100, target_ms=100, min_ms=100, max_ms=400)
+    first, second = bytes(range(150)), bytes(range(60, 130))
+    for data, tag in ((first, "item_1"), (second, "item_1"), (second, "item_2")):
+        delta = base64.b64encode(data).decode()
+        assert jb.put_b64('{"delta": "' + delta + '"}', 11, 11 + len(delta), tag)
+    jb.end_stream()
+    played = []
+    while True:
+        item = jb.next_item()
+        if item is None:
+            break
+        played.append((item.tag, bytes(item.data())))
+        item.release()
+    # 每块只装整组解码结果(99 字节), 同一 item 的 delta 接着写进队尾块
+    assert [len(data) for _, data in played] == [99, 99, 22, 70]
+    assert b"".join(data for tag, data in played if tag == "item_1") == first + second
+    assert played[-1] == ("item_2", second)
+    assert jb.pool.in_use() == 0
+
+
+def _play_burst(jb, total_ms, burst, speedup=20):
+    """接收线程按 burst 倍实时送入 20-100ms 的 delta, 播放线程按实时节奏取出; 时间整体加快 speedup 倍,
+    返回送入与播出的数据及单次 put 的最长耗时"""
+    rng = random.Random(1)
+    deltas = []
+    remaining = total_ms
+    while remaining > 0:
+        ms = min(remaining, rng.randint(20, 100))
+        deltas.append(bytes(rng.getrandbits(8) for _ in range(ms * G711_BYTES_PER_MS)))
+        remaining -= ms
+    played = []
+    done = threading.Event()
+
+    def playback():
+        while True:
+            item = jb.next_item()
+            if item is None:
+                if done.is_set() and not jb.pending():
+                    return
+                continue
+            played.append(bytes(item.data()))
+            time.sleep(item.length / G711_BYTES_PER_MS / 1000 / speedup)
+            item.release()
+
+    player = threading.Thread(target=playback)
+    player.start()
+    put_max = 0
+    for delta in deltas:
+        start = time.monotonic()
+        jb.put(delta, tag="item_1")
+        put_max = max(put_max, time.monotonic() - start)
+        time.sleep(len(delta) / G711_BYTES_PER_MS / 1000 / speedup / burst)
+    jb.end_stream()
+    done.set()
+    player.join(30)
+    assert not player.is_alive()
+    return b"".join(deltas), b"".join(played), put_max
+
+
+def test_default_capacity_absorbs_server_burst():
+    jb = JitterBuffer(settings.PLAYBACK_BUFFER_MS, block_size=settings.PLAYBACK_BLOCK_SIZE,
+                      target_ms=settings.PLAYBACK_TARGET_MS, underrun_wait_ms=5)
+    # 4 倍实时下发的 6s 回复最多领先 4.5s
+    sent, played, _ = _play_burst(jb, 6000, burst=4)
+    assert played == sent
+    assert jb.overruns == 0
+
+
+def test_burst_beyond_capacity_drops_without_blocking():
+    jb = JitterBuffer(1000, block_size=settings.PLAYBACK_BLOCK_SIZE, underrun_wait_ms=5)
+    sent, played, put_max = _play_burst(jb, 5000, burst=8)
+    # 接收线程从不等待播放归还块
+    assert put_max < 0.05
+    assert jb.overruns > 0
+    assert len(played) + jb.dropped_bytes == len(sent)
+
+
+def test_put_on_full_buffer_returns_immediately():
+    jb = _buffer()
+    assert jb.put(_audio(2000), tag="item_1")
+    assert not jb.put(_audio(300), tag="item_1")
+    assert jb.overruns == 1 and jb.stats()["dropped_ms"] == 200
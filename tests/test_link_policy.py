@@ -0,0 +1,20 @@
+import pytest
+
+from usr.libs.link_policy import LinkPolicy, WEAK, NORMAL, STRONG
+
+
+def test_rejects_codec_capture_cannot_produce():
+    with pytest.raises(ValueError):
+        LinkPolicy(lambda: 20, codecs=("g711_alaw", "g711_alaw", "pcm16"))
+    with pytest.raises(ValueError):
+        LinkPolicy(lambda: 20, codecs=("g711_alaw",))
+
+
+def test_selects_frame_by_level():
+    csq = [5]
+    policy = LinkPolicy(lambda: csq[0], frame_ms=(160, 80, 240))
+    expected = ((5, WEAK, 240), (15, NORMAL, 160), (25, STRONG, 80))
+    for value, level, frame_ms in expected:
+        csq[0] = value
+        profile = policy.select()
+        assert (profile.level, profile.frame_ms, profile.codec) == (level, frame_ms, "g711_alaw")
@@ -0,0 +1,52 @@
+import pytest
+
+from usr.libs import media_cache
+from usr.libs.media_cache import MediaCache, CacheWriter
+
+
+@pytest.fixture
+def free(monkeypatch):
+    """文件系统剩余字节数, 由测试设置"""
+    state = {"bytes": 1024 * 1024}
+    monkeypatch.setattr(media_cache.uos, "statvfs", lambda path: (1, 1, 0, 0, state["bytes"], 0, 0, 0, 0, 255))
+    return state
+
+
+def _cache(name):
+    cache = MediaCache("/usr/test_{}".format(name), max_bytes=1024 * 512, reserve_bytes=1024 * 64)
+    cache.clear()
+    return cache
+
+
+def test_begin_checks_free_space_for_unknown_size(free):
+    cache = _cache("unknown")
+    free["bytes"] = 1024 * 32
+    assert cache.begin("http://example/a.mp3") is None
+    free["bytes"] = 1024 * 128
+    writer = cache.begin("http://example/a.mp3")
+    assert writer is not None
+    writer.abort()
+
+
+def test_unknown_size_write_aborts_below_reserve(free):
+    cache = _cache("shrink")
+    writer = cache.begin("http://example/b.mp3")
+    chunk = bytes(1024)
+    for _ in range(CacheWriter.FREE_CHECK_BYTES // len(chunk)):
+        assert writer.write(chunk)
+    # 下载过程中其他写入耗尽空间, 下一次检查时放弃
+    free["bytes"] = 1024 * 16
+    results = [writer.write(chunk) for _ in range(CacheWriter.FREE_CHECK_BYTES // len(chunk))]
+    assert all(results[:-1]) and not results[-1]
+    assert not writer.commit()
+    assert cache.lookup("http://example/b.mp3") is None
+
+
+def test_known_size_reserved_up_front(free):
+    cache = _cache("known")
+    free["bytes"] = 1024 * 128
+    assert cache.begin("http://example/c.mp3", size=1024 * 100) is None
+    writer = cache.begin("http://example/c.mp3", size=1024 * 32)
+    assert writer.write(bytes(1024 * 32))
+    assert writer.commit()
+    assert cache.lookup("http://example/c.mp3")["size"] == 1024 * 32
@@ -0,0 +1,57 @@
+import base64
+import threading
+
+from conftest import wait_until
+from usr.components.audio_manager import PlaybackPosition, G711_BYTES_PER_MS
+
+
+def test_played_ms_counts_bytes_per_item():
+    position = PlaybackPosition(slots=2)
+    position.advance("a", 800)
+    position.advance("a", 1024)
+    position.advance("b", 160)
+    position.advance(None, 4096)  # 没有 item id 的音频(如提示音)不计入
+    assert position.played_ms("a") == 1824 // G711_BYTES_PER_MS
+    assert position.played_ms("b") == 160 // G711_BYTES_PER_MS
+    assert position.played_ms("unknown") == 0
+
+    # 槽位用尽时覆盖最早的 item
+    position.advance("c", 8)
+    assert position.played_ms("a") == 0
+    assert position.played_ms("b") == 20
+    assert position.played_ms("c") == 1
+
+
+def test_interrupt_truncates_at_written_audio(chat, monkeypatch):
+    app, server = chat
+    ai = app.ai_manager
+    audio_manager = app.audio_manager
+    item_id = "item_truncate_test"
+    written = []
+    in_flight = threading.Event()
+    finish = threading.Event()
+
+    def g711_write(data):
+        written.append(len(data))
+        if len(written) == 2:
+            # 第二块停在写出中, 模拟打断时 PCM 设备正在播放的一块
+            in_flight.set()
+            finish.wait(5)
+
+    monkeypatch.setattr(audio_manager, "g711_write", g711_write)
+    delta = base64.b64encode(b"\xd5" * 4 * audio_manager.jitter_buffer.block_size)
+    assert audio_manager.enqueue_playback(delta, tag=item_id)
+    audio_manager.end_playback_stream()
+    assert in_flight.wait(5)
+
+    ai.response_item_id = item_id
+    try:
+        ai.input_audio_buffer_speech_started({"type": "input_audio_buffer.speech_started"})
+    finally:
+        finish.set()
+    assert wait_until(lambda: any(t[0] == item_id for t in server.truncates))
+
+    # 截断位置等于已写出的字节数, 包含打断时正在写出的一块; 之后的块已被丢弃
+    assert len(written) == 2
+    assert [t for t in server.truncates if t[0] == item_id] == [(item_id, sum(written) // G711_BYTES_PER_MS)]
+    assert not audio_manager.playback_pending()
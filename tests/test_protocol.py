@@ -0,0 +1,177 @@
+import base64
+import json
+import threading
+import time
+
+from usr.components.protocol import OpenAIRealTimeConnection, OutboundScheduler, CLOSE_NORMAL, CLOSE_ERROR
+
+
+class _GatedClient(object):
+    """websocket 替身: 首次 send 阻塞到 release, 制造出站积压; 记录发出的 event type"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.types = []
+
+    def send(self, data):
+        self.gate.wait(5)
+        if not isinstance(data, str):
+            data = bytes(data).decode()
+        self.types.append(json.loads(data)["type"])
+
+    def release(self, delay=0.1):
+        threading.Timer(delay, self.gate.set).start()
+
+
+def _connection(frame_builder):
+    conn = OpenAIRealTimeConnection(frame_builder=frame_builder, max_audio_size=160, audio_slots=4)
+    client = _GatedClient()
+    setattr(conn, "__client__", client)
+    conn._OpenAIRealTimeConnection__scheduler.start()
+    return conn, client
+
+
+def _wait_sent(conn, timeout=5):
+    deadline = time.monotonic() + timeout
+    while conn.outbound_pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _check_commit_after_appends(frame_builder):
+    conn, client = _connection(frame_builder)
+    try:
+        for _ in range(4):
+            assert conn.input_audio_buffer_append(bytes(160)) is not False
+        # 积压中说话结束: commit 与 response.create 须排在所有 append 之后, cancel 仍可插队
+        client.release()
+        conn.response_cancel()
+        conn.input_audio_buffer_commit()
+        conn.response_create(OutboundScheduler.AUDIO)
+        _wait_sent(conn)
+    finally:
+        conn._OpenAIRealTimeConnection__scheduler.stop()
+    types = client.types
+    assert types.count("input_audio_buffer.append") == 4
+    last_append = len(types) - 1 - types[::-1].index("input_audio_buffer.append")
+    assert types.index("input_audio_buffer.commit") > last_append
+    assert types.index("response.create") > types.index("input_audio_buffer.commit")
+    assert types.index("response.cancel") < last_append
+
+
+def test_commit_follows_queued_appends():
+    _check_commit_after_appends(frame_builder=True)
+
+
+def test_commit_follows_queued_appends_legacy_frames():
+    _check_commit_after_appends(frame_builder=False)
+
+
+def test_scheduler_control_lane_first_and_fifo_per_lane():
+    client = _GatedClient()
+    scheduler = OutboundScheduler(client.send)
+    scheduler.start()
+    try:
+        scheduler.submit({"type": "a0"}, OutboundScheduler.AUDIO)
+        # 等写线程取走 a0 并阻塞在 send 上, 其余 event 都在通道中积压
+        deadline = time.monotonic() + 5
+        while scheduler.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for name in ("a1", "c0", "a2", "c1", "c2"):
+            lane = OutboundScheduler.CONTROL if name[0] == "c" else OutboundScheduler.AUDIO
+            assert scheduler.submit({"type": name}, lane)
+        client.release(0)
+        deadline = time.monotonic() + 5
+        while len(client.types) < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+    assert client.types == ["a0", "c0", "c1", "c2", "a1", "a2"]
+    stats = scheduler.stats()
+    assert stats["control"]["sent"] == 3 and stats["audio"]["sent"] == 3
+
+
+class _ScriptedClient(object):
+    """websocket 替身: recv 依次返回给定的帧, 读完后返回 end"""
+
+    def __init__(self, frames, end=None):
+        self.frames = list(frames)
+        self.end = end
+
+    def recv(self, size=None):
+        return self.frames.pop(0) if self.frames else self.end
+
+
+def _receive(frames, end=None, **kwargs):
+    """在当前线程运行接收循环直到其退出, 返回连接与收到的 event"""
+    events = []
+    conn = OpenAIRealTimeConnection(event_cb=events.append, **kwargs)
+    setattr(conn, "__client__", _ScriptedClient(frames, end))
+    conn._OpenAIRealTimeConnection__recv_thread_worker()
+    return conn, events
+
+
+def test_oversize_frame_dropped_and_counted():
+    big = json.dumps({"type": "response.text.delta", "delta": "x" * 300})
+    small = json.dumps({"type": "response.text.done"})
+    conn, events = _receive([big, small], max_frame_size=256)
+    assert [e["type"] for e in events] == ["response.text.done"]
+    assert conn.recv_stats()["oversize_frames"] == 1
+
+
+def test_close_frame_is_orderly_close_and_empty_read_is_drop():
+    frame = json.dumps({"type": "response.text.done"})
+    conn, events = _receive([frame], end=None)
+    assert conn.close_reason == CLOSE_NORMAL and len(events) == 1
+    conn, events = _receive([frame], end="")
+    assert conn.close_reason == CLOSE_ERROR and len(events) == 1
+
+
+def test_type_sniff_ignores_nested_type():
+    created = []
+    handlers = {"conversation.item.created": created.append, "message": None}
+    frame = '{"item": {"type": "message", "id": "item_1"}, "note": "say \\"type\\"", "type": "conversation.item.created"}'
+    conn, events = _receive([frame], handlers=handlers)
+    assert [e["item"]["id"] for e in created] == ["item_1"] and events == []
+
+
+def test_output_audio_delta_takes_decode_path():
+    audio = []
+
+    def on_audio(event, raw, start, end):
+        audio.append((event["type"], base64.b64decode(raw[start:end])))
+
+    handlers = {"response.output_audio.delta": lambda event: None}
+    frame = json.dumps({"type": "response.output_audio.delta", "item_id": "item_2", "delta": "AQID"})
+    _receive([frame], handlers=handlers, audio_cb=on_audio)
+    assert audio == [("response.output_audio.delta", b"\x01\x02\x03")]
+
+
+def test_wake_after_prefetch_window_fetches_in_background(monkeypatch):
+    from usr.components import protocol
+    clock = [1000]
+    monkeypatch.setattr(protocol, "_now", lambda: clock[0])
+    fetched = []
+
+    def fetch():
+        time.sleep(0.2)
+        fetched.append(clock[0])
+        return {"url": "ws://mock", "path": "/rt", "ephemeralToken": "t{}".format(len(fetched)), "expireAt": clock[0] + 60}
+
+    cache = protocol.TokenCache(fetch=fetch, margin=10, refresh_ahead=30)
+    cache.start_refresh(window=1)
+    try:
+        assert cache.get()[1] == "t1"
+        # 休眠远超预取窗口与 token 有效期, 预取线程已退出
+        clock[0] += 3600
+        deadline = time.monotonic() + 5
+        while cache._TokenCache__refreshing and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not cache._TokenCache__refreshing
+        # 唤醒: 预取线程立即获取, 随后的 get 等待其结果而不另发请求
+        cache.start_refresh(window=1)
+        assert cache.get()[1] == "t2"
+    finally:
+        cache.stop_refresh()
+    assert len(fetched) == 2
+    stats = cache.stats()
+    assert stats["misses"] == 0 and stats["hits"] == 2 and stats["waits"] == 2
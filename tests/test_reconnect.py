@@ -0,0 +1,44 @@
+from conftest import wait_until
+
+
+def test_drop_mid_chat_reconnects_and_resumes_upload(chat):
+    app, server = chat
+    ai = app.ai_manager
+    index = server.connections - 1
+    assert wait_until(lambda: server.appends[index] > 0)
+    before = dict(ai.reconnect_stats)
+
+    # 不发关闭帧直接断开 TCP: 接收线程读到空串, chat 循环退避后重连
+    server.drop_connections()
+    assert wait_until(lambda: server.connections == index + 2, timeout=15)
+    # 上行音频在新连接上继续发送, 对话没有结束
+    assert wait_until(lambda: server.appends[index + 1] > 0)
+    assert ai.chat_thread.is_running() and ai.protocol.is_connected()
+    stats = ai.reconnect_stats
+    assert stats["drops"] == before["drops"] + 1
+    assert stats["reconnects"] == before["reconnects"] + 1
+    assert stats["attempts"] >= before["attempts"] + 1
+    assert stats["give_ups"] == before["give_ups"]
+    assert stats["downtime_ms"] > before["downtime_ms"]
+    assert stats["max_downtime_ms"] > 0
+
+
+def test_reconnect_gives_up_when_budget_runs_out(chat, monkeypatch):
+    app, server = chat
+    ai = app.ai_manager
+    before = dict(ai.reconnect_stats)
+    monkeypatch.setattr(ai.reconnect_backoff, "budget_ms", 1500)
+    monkeypatch.setattr(server, "refuse", True)
+    connections = server.connections
+
+    server.drop_connections()
+    # 重连都被拒绝, 预算耗尽后放弃并结束对话
+    assert wait_until(lambda: not ai.chat_thread.is_running(), timeout=15)
+    stats = ai.reconnect_stats
+    assert stats["drops"] == before["drops"] + 1
+    assert stats["give_ups"] == before["give_ups"] + 1
+    assert stats["reconnects"] == before["reconnects"]
+    assert stats["attempts"] > before["attempts"]
+    assert 0 < stats["downtime_ms"] - before["downtime_ms"] <= 1500 + 1000
+    assert server.connections == connections
+    assert not ai.protocol.is_connected()
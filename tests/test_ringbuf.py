@@ -0,0 +1,79 @@
+from usr.libs.ringbuf import RingBuffer
+
+
+def _chunk(value, size=4):
+    return bytes([value]) * size
+
+
+def test_wraparound_keeps_order():
+    ring = RingBuffer(10)
+    buf = bytearray(10)
+    assert ring.write(b"abcdefgh") == 8
+    assert ring.readinto(buf, timeout=0) == 8
+    # 写入跨越缓冲区末尾
+    assert ring.write(b"0123456") == 7
+    n = ring.readinto(buf, timeout=0)
+    assert bytes(buf[:n]) == b"0123456"
+
+
+def test_drop_oldest_overrun_keeps_newest():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    buf = bytearray(8)
+    n = ring.readinto(buf, timeout=0)
+    assert bytes(buf[:n]) == b"cdefghij"
+    assert ring.overruns == 1
+    assert ring.dropped_bytes == 2
+
+
+def test_drop_newest_and_oversize_write():
+    ring = RingBuffer(8, policy=RingBuffer.DROP_NEWEST)
+    ring.write(b"abcdef")
+    assert ring.write(b"ghij") == 2
+    ring.clear()
+    # 单次写入超过容量, 只保留最新的 size 字节
+    assert ring.write(b"0123456789") == 8
+    buf = bytearray(8)
+    ring.readinto(buf, timeout=0)
+    assert bytes(buf) == b"23456789"
+
+
+def test_peek_consume_chunks_across_wrap():
+    ring = RingBuffer(12, chunk=4)
+    for value in (1, 2, 3):
+        ring.write(_chunk(value))
+    for value in (1, 2):
+        assert bytes(ring.peek()) == _chunk(value)
+        assert ring.consume(4) == 4
+    ring.write(_chunk(4))
+    ring.write(_chunk(5))
+    for value in (3, 4, 5):
+        assert bytes(ring.peek()) == _chunk(value)
+        ring.consume(4)
+    assert ring.peek() is None
+
+
+def test_consume_after_overrun_keeps_unsent_chunk():
+    ring = RingBuffer(12, chunk=4)
+    for value in (1, 2, 3):
+        ring.write(_chunk(value))
+    assert bytes(ring.peek()) == _chunk(1)
+    # 处理块 1 期间采集端溢出, 块 1 已被丢弃; consume 不能再丢掉尚未处理的块 2
+    ring.write(_chunk(4))
+    assert ring.overruns == 1
+    assert ring.consume(4) == 0
+    for value in (2, 3, 4):
+        assert bytes(ring.peek()) == _chunk(value)
+        assert ring.consume(4) == 4
+    assert ring.peek() is None
+
+
+def test_consume_after_clear_keeps_new_data():
+    ring = RingBuffer(8, chunk=4)
+    ring.write(_chunk(1))
+    assert ring.peek() is not None
+    ring.clear()
+    ring.write(_chunk(2))
+    assert ring.consume(4) == 0
+    assert bytes(ring.peek()) == _chunk(2)
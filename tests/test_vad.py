@@ -0,0 +1,157 @@
+from machine import ExtInt
+from usr.components.ai_manager import AIManager
+from usr.components.protocol import LOCAL_VAD, OutboundScheduler
+from usr.configure import settings
+from usr.libs import timeline as tl
+from usr.libs.alaw import MAGNITUDE
+from usr.libs.metrics import registry
+from usr.libs.vad import EnergyVAD, UplinkGate, TurnDetector
+
+CHUNK = 640  # 80ms
+
+
+def _frames(chunk):
+    """与 mpy_chat_alloc.py 相同: 幅度最大与最小的 A-law 码各自填满一帧"""
+    loud = max(range(256), key=lambda a: MAGNITUDE[a])
+    quiet = min(range(256), key=lambda a: MAGNITUDE[a])
+    return bytes([loud]) * chunk, bytes([quiet]) * chunk
+
+
+LOUD, QUIET = _frames(CHUNK)
+
+
+def _feed(gate, frames):
+    """依次送入各帧, 返回 [(帧序号, 上传的数据)]"""
+    sent = []
+    for i, frame in enumerate(frames):
+        gate.process(memoryview(bytearray(frame)), len(frame), lambda buf, n: sent.append((i, bytes(buf[:n]))))
+    return sent
+
+
+def test_gate_withholds_silence_and_sends_padding_at_onset():
+    gate = UplinkGate(EnergyVAD(threshold=300, hangover_ms=160), CHUNK, padding_bytes=300 * 8, keepalive_ms=1000)
+    sent = _feed(gate, [QUIET] * 5 + [LOUD] * 2 + [QUIET] * 4)
+
+    # 前 5 帧静音不上传; 语音首帧前先补发最近的静音作为前导, 300ms 按块向上取整为 4 帧
+    padding = 4 * CHUNK
+    assert [i for i, _ in sent if i < 5] == []
+    onset = [data for i, data in sent if i == 5]
+    assert b"".join(onset[:-1]) == QUIET[:1] * padding
+    assert onset[-1] == LOUD
+    # 语音帧照常上传, hangover 160ms 覆盖其后两帧静音, 之后的静音再次被扣留
+    assert [(i, data) for i, data in sent if i > 5] == [(6, LOUD), (7, QUIET), (8, QUIET)]
+    stats = gate.stats()
+    assert stats["padding_sent_bytes"] == padding
+    assert stats["sent_bytes"] == padding + 4 * CHUNK
+    assert stats["saved_bytes"] == 7 * CHUNK - padding
+    assert stats["keepalives"] == 0
+
+
+def test_gate_sends_keepalive_during_silence():
+    gate = UplinkGate(EnergyVAD(threshold=300, hangover_ms=0), CHUNK, keepalive_ms=400)
+    sent = _feed(gate, [QUIET] * 15 + [LOUD] + [QUIET] * 5)
+
+    # 静音累计满 400ms(5 帧)放行一帧; 语音帧重新开始计时
+    assert [i for i, _ in sent] == [4, 9, 14, 15, 20]
+    assert sent[3] == (15, LOUD)
+    assert gate.stats()["keepalives"] == 4
+
+
+def test_gate_reset_drops_padding():
+    gate = UplinkGate(EnergyVAD(threshold=300, hangover_ms=0), CHUNK, padding_bytes=300 * 8)
+    _feed(gate, [QUIET] * 3)
+    gate.reset()
+    # 上一段对话缓存的静音不会补发到下一段
+    assert _feed(gate, [LOUD]) == [(0, LOUD)]
+    assert gate.stats()["padding_sent_bytes"] == 0
+
+
+class _Mic(object):
+    """采集替身: 把当前帧读入调用方缓冲, 没有下行播放"""
+
+    def __init__(self):
+        self.frame = None
+
+    def g711_readinto(self, buf):
+        buf[:len(self.frame)] = self.frame
+        return len(self.frame)
+
+    def playback_headroom_ms(self):
+        return -1
+
+
+def _local_vad_chat(monkeypatch):
+    """local_vad 模式的 AIManager, 上行与各控制事件记录为 [(帧序号, 事件)] 而不发出"""
+    monkeypatch.setattr(settings, "get_turn_detection", lambda: LOCAL_VAD)
+    with monkeypatch.context() as m:
+        # 不替换测试进程中应用已登记的 gauge 与唤醒键回调
+        m.setattr(registry, "gauge", lambda name, fn=None: None)
+        m.setattr(ExtInt, "registry", {})
+        ai = AIManager()
+    assert ai.turn_detector is not None and ai.uplink_chunk == CHUNK
+    events = []
+    current = [0]
+    monkeypatch.setattr(ai.protocol, "input_audio_buffer_append",
+                        lambda buf, n=None: events.append((current[0], bytes(buf[:n]))))
+    monkeypatch.setattr(ai.protocol, "input_audio_buffer_commit", lambda: events.append((current[0], "commit")))
+    monkeypatch.setattr(ai.protocol, "response_create",
+                        lambda lane=OutboundScheduler.CONTROL: events.append((current[0], ("response.create", lane))))
+    monkeypatch.setattr(ai.protocol, "response_cancel", lambda: events.append((current[0], "response.cancel")))
+    mic = _Mic()
+    ai.bind_uplink(mic)
+
+    def run(frames):
+        # 与 chat 循环相同: 采集一块写入环形缓冲, 再取出经门限与轮次检测上传
+        for i, frame in enumerate(frames):
+            current[0] = i
+            mic.frame = frame
+            ai.capture_step(mic, ai.capture_view)
+            assert ai.uplink_step() == CHUNK
+        return events
+
+    return ai, run
+
+
+def _ceil_frames(ms):
+    return -(-ms // (CHUNK // 8))
+
+
+def test_local_vad_commits_when_hangover_ends(app, monkeypatch):
+    ai, run = _local_vad_chat(monkeypatch)
+    events = run([QUIET] * 5 + [LOUD] * 5 + [QUIET] * 10)
+    padding = _ceil_frames(settings.VAD_PADDING_MS)
+    hangover = _ceil_frames(settings.LOCAL_VAD_SILENCE_MS)
+    stopped = 10 + hangover
+
+    sent = [(i, data) for i, data in events if isinstance(data, bytes)]
+    # 静音不上传; 第 5 帧起说话, 先补发 padding 再逐帧上传, hangover 内的静音仍上传
+    assert [i for i, _ in sent] == [5] * (padding + 1) + list(range(6, stopped))
+    assert [data for i, data in sent if 5 < i < 10] == [LOUD] * 4
+    assert all(data == QUIET for i, data in sent if i >= 10)
+    # hangover 结束的那一帧不再上传, 同一帧内依次发出 commit 与排在音频之后的 response.create
+    control = [(i, e) for i, e in events if not isinstance(e, bytes)]
+    assert control == [(stopped, "commit"), (stopped, ("response.create", OutboundScheduler.AUDIO))]
+    assert events[-2:] == control
+    assert ai.turn_detector.stats() == {"turns": 1, "discarded": 0}
+    assert ai.timeline.has(tl.SPEECH_STARTED) and ai.timeline.has(tl.SPEECH_STOPPED)
+
+
+def test_local_vad_ignores_short_noise(app, monkeypatch):
+    ai, run = _local_vad_chat(monkeypatch)
+    short = _ceil_frames(settings.LOCAL_VAD_MIN_SPEECH_MS) - 1
+    events = run([LOUD] * short + [QUIET] * 10)
+
+    # 不足 LOCAL_VAD_MIN_SPEECH_MS 的声音照常上传, 但不算一轮, 不提交
+    assert all(isinstance(data, bytes) for _, data in events)
+    assert ai.turn_detector.stats() == {"turns": 0, "discarded": 1}
+
+
+def test_turn_detector_reports_start_after_min_speech():
+    vad = EnergyVAD(threshold=300, hangover_ms=160)
+    detector = TurnDetector(min_speech_ms=200)
+    results = []
+    for frame in [LOUD] * 4 + [QUIET] * 4:
+        vad.update(frame, CHUNK, 80)
+        results.append(detector.feed(vad, 80))
+    # 第 3 帧累计 240ms 语音时开始; hangover 160ms 覆盖两帧静音, 第三帧静音时结束
+    assert results == [None, None, TurnDetector.SPEECH_STARTED, None, None, None, TurnDetector.SPEECH_STOPPED, None]
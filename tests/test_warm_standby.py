@@ -0,0 +1,31 @@
+import simulator
+from conftest import wait_until
+from usr.configure import Settings, settings
+
+
+def test_wake_reuses_warm_connection(chat, monkeypatch):
+    app, server = chat
+    ai = app.ai_manager
+    # 默认不开空闲超时, 对话不会自行结束
+    assert settings.CHAT_IDLE_TIMEOUT == 0 and settings.WARM_STANDBY_IDLE > 0
+    watchdog = app.power_manager.check_standby_thread
+    assert watchdog is None or not watchdog.is_running()
+    cold, warm, connections = ai.standby_stats["cold"], ai.standby_stats["warm"], server.connections
+
+    ai.stop_chat()
+    assert ai.protocol.is_connected()
+    assert ai.standby_thread is not None
+
+    # 热备期间唤醒直接复用该连接, 不再取 token 与建连
+    monkeypatch.setattr(Settings, "CHAT_IDLE_TIMEOUT", 1)
+    simulator.press()
+    assert wait_until(lambda: ai.standby_stats["warm"] == warm + 1)
+    assert ai.standby_stats["cold"] == cold
+    assert ai.standby_stats["saved_ms"] > 0
+    assert server.connections == connections
+
+    # 开启空闲超时后对话由空闲检测自行结束, 连接再次转入热备
+    assert wait_until(lambda: not ai.chat_thread.is_running())
+    assert ai.protocol.is_connected()
+    assert ai.standby_thread is not None
+    assert server.connections == connections
@@ -0,0 +1,110 @@
+"""input_audio_buffer.append 上行帧构造基准（主机侧）
+
+对比逐帧 dict + ujson.dumps 旧路径与 AppendFrameBuilder 预序列化路径的每帧分配与帧率。
+
+    python tools/bench_append_frame.py [frames] [audio_size]
+
+unix MicroPython 下关闭 GC 后取 gc.mem_alloc() 差值，即每帧精确分配字节数；
+CPython 下按引用计数即时释放，只能取 tracemalloc 的峰值瞬时占用作为参考。
+"""
+import sys
+import gc
+import time
+
+import hoststub
+
+
+ROOT = __file__.rsplit("/", 2)[0] if "/" in __file__ else ".."
+
+
+def _install_host_modules():
+    """协议模块导入所需的最小设备模块替身，仅供 import，不参与被测路径"""
+    hoststub.install(ROOT)
+    hoststub.module("usocket")
+    hoststub.module("uwebsocket")
+    hoststub.module("net")
+
+
+def _now():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us() / 1e6
+    return time.perf_counter()
+
+
+def _alloc_probe():
+    if sys.implementation.name == "micropython":
+        gc.disable()
+        return gc.mem_alloc, "bytes allocated/frame"
+    import tracemalloc
+    tracemalloc.start()
+    return lambda: tracemalloc.get_traced_memory()[1], "peak transient bytes"
+
+
+def _legacy_path(audio_size):
+    """与 frame_builder=False 时 input_audio_buffer_append 相同的逐帧序列化"""
+    import base64
+    import ujson
+    from usr.components.protocol import EventIDGenerator
+    gen = EventIDGenerator()
+
+    def build(audio):
+        return ujson.dumps(
+            {
+                "audio": base64.b64encode(audio),
+                "event_id": "event_{}".format(gen.get()),
+                "type": "input_audio_buffer.append"
+            }
+        )
+    return build
+
+
+def _builder_path(audio_size):
+    from usr.components.protocol import AppendFrameBuilder, EventIDGenerator
+    gen = EventIDGenerator()
+    builder = AppendFrameBuilder(audio_size)
+
+    def build(audio):
+        return builder.build(gen.get(), audio)
+    return build
+
+
+def run(name, factory, frames, audio_size):
+    build = factory(audio_size)
+    audio = bytes(range(256)) * (audio_size // 256 + 1)
+    audio = audio[:audio_size]
+    wire_bytes = len(build(audio))  # 预热
+    gc.collect()
+    probe, unit = _alloc_probe()
+    before = probe()
+    start = _now()
+    for _ in range(frames):
+        build(audio)
+    elapsed = _now() - start
+    used = probe() - before
+    if sys.implementation.name == "micropython":
+        used /= frames
+        gc.enable()
+    else:
+        import tracemalloc
+        tracemalloc.stop()
+    return {
+        "path": name,
+        "frames_per_s": frames / elapsed if elapsed else 0,
+        "alloc": used,
+        "alloc_unit": unit,
+        "wire_bytes_per_frame": wire_bytes,
+    }
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    audio_size = int(sys.argv[2]) if len(sys.argv) > 2 else 320
+    _install_host_modules()
+    for name, factory in (("ujson.dumps", _legacy_path), ("frame_builder", _builder_path)):
+        r = run(name, factory, frames, audio_size)
+        print("{:<14} {:>10.0f} frames/s  {:>10.1f} {}  {} wire bytes/frame".format(
+            r["path"], r["frames_per_s"], r["alloc"], r["alloc_unit"], r["wire_bytes_per_frame"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""主机侧运行 src/ 模块所需的设备模块替身
+
+tools/ 下的基准与 tests/ 下的 MicroPython 分配检查共用; 同时支持 CPython 与 unix MicroPython。
+"""
+import sys
+import time
+
+
+class Stub(object):
+    """替身模块; MicroPython 不能实例化 module 类型, 以普通对象登记到 sys.modules"""
+
+    def __init__(self, name, **attrs):
+        self.__name__ = name
+        self.__spec__ = None  # CPython 导入子模块时读取父包的 __spec__
+        for k, v in attrs.items():
+            setattr(self, k, v)
+
+
+def module(name, **attrs):
+    mod = Stub(name, **attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+def package(name, path):
+    # 包的搜索路径: MicroPython 为字符串, CPython 为列表
+    return module(name, __path__=path if sys.implementation.name == "micropython" else [path])
+
+
+def ensure(name, fallback=None, **attrs):
+    """固件模块在主机上存在则直接使用, 否则注册替身"""
+    # WASI 版 MicroPython 在只读目录中找不到模块时抛出 OSError
+    try:
+        __import__(name)
+        return
+    except (ImportError, OSError):
+        pass
+    if fallback is not None:
+        try:
+            sys.modules[name] = __import__(fallback)
+            return
+        except (ImportError, OSError):
+            pass
+    module(name, **attrs)
+
+
+def install(root):
+    """登记 utime/ujson 等基础模块, 并把 root/src 挂为 usr 包(跳过 components/__init__.py, 不实例化硬件组件)"""
+    if sys.implementation.name != "micropython":
+        import json
+
+        def dumps(obj):
+            return json.dumps(obj, default=lambda o: bytes(o).decode())
+
+        module("utime", sleep_ms=lambda ms: time.sleep(ms / 1000), sleep=time.sleep,
+               ticks_ms=lambda: int(time.monotonic() * 1000) & 0x3FFFFFFF,
+               ticks_us=lambda: int(time.monotonic() * 1000000) & 0x3FFFFFFF,
+               ticks_diff=lambda a, b: ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000,
+               time=lambda: int(time.time()), mktime=lambda t: int(time.mktime(t)), localtime=time.localtime,
+               getTimeZone=lambda: 0)
+        module("ujson", dumps=dumps, loads=json.loads)
+    ensure("ubinascii", "binascii")
+    # 固件内置 base64, unix MicroPython 需另装 micropython-lib; 缺失时以 ubinascii 代替
+    import ubinascii
+    ensure("base64", b64encode=lambda data: ubinascii.b2a_base64(data)[:-1], b64decode=ubinascii.a2b_base64)
+    ensure("uhashlib", "hashlib")
+    ensure("uio", "io")
+    import uio
+    if not hasattr(uio, "TextIOWrapper"):
+        # logging 据 uio.TextIOWrapper 判断是否 flush, unix MicroPython 的 io 没有该类型
+        module("uio", StringIO=uio.StringIO, BytesIO=uio.BytesIO, TextIOWrapper=Stub)
+    ensure("urandom", "random")
+    module("request")
+    module("osTimer")
+    module("sim")
+    module("modem", getDevImei=lambda: "000000000000000")
+    module("misc", Power=object)
+    module("ql_fs", path_exists=lambda path: True, read_json=lambda path: {}, touch=lambda path, data: None)
+    package("usr", root + "/src")
+    package("usr.components", root + "/src/components")